@@ -2,46 +2,169 @@
 import os
 
 import aws_cdk as cdk
+from aws_cdk import aws_ecs, aws_elasticloadbalancingv2
 
 from yeastregulatorydbstack import (
     ALBStack,
+    CDNStack,
+    CeleryWorkerServiceStack,
     DjangoServiceStack,
+    FlowerServiceStack,
     LogGroupStack,
+    ObservabilityStack,
     RDSStack,
     RedisStack,
     RolesStack,
     SecurityGroupStack,
+    StorageStack,
     TargetGroupStack,
     VPCStack,
 )
+from yeastregulatorydbstack.DjangoServiceStack import gunicorn_concurrency
+from yeastregulatorydbstack.connection_budget import (
+    celery_connection_demands,
+    connection_demand,
+)
+from yeastregulatorydbstack.guardrails import PerformanceGuardrails, suppress
+from yeastregulatorydbstack.profiles import context_value, profile_from_context
 
 app = cdk.App()
 
+# the sizes of the stacks, eg `cdk synth -c profile=prod`. See profiles.py
+profile = profile_from_context(app.node)
+
 common_kwargs = {
     "app_tag_name": "app",
     "app_tag_value": "yeastregulatorydb",
 }
 
-ssl_arn = "arn:aws:acm:us-east-2:040367161929:certificate/63b33893-d593-4ae0-8f34-c09b2ee96cad"
+# the values below may be set in the context, per profile under
+# `deployments`, eg to deploy the load-test profile to another account. See
+# profiles.context_value
+account = context_value(app.node, profile, "account")
+region = context_value(app.node, profile, "region")
+if account is not None or region is not None:
+    common_kwargs["env"] = cdk.Environment(account=account, region=region)
+
+ssl_arn = context_value(
+    app.node,
+    profile,
+    "ssl_certificate_arn",
+    "arn:aws:acm:us-east-2:040367161929:certificate/63b33893-d593-4ae0-8f34-c09b2ee96cad",
+)
+
+django_image_uri = context_value(
+    app.node,
+    profile,
+    "django_image_uri",
+    "040367161929.dkr.ecr.us-east-2.amazonaws.com/django-stack:latest",
+)
+
+# the CloudFront distribution is only created with a domain and a us-east-1
+# certificate for it, eg `-c cdn_domain_names='["yeastregulatorydb.org"]'
+# -c cdn_certificate_arn=arn:aws:acm:us-east-1:...`. The Host header is
+# forwarded to the load balancer, so ssl_arn must cover the domain as well
+cdn_domain_names = context_value(app.node, profile, "cdn_domain_names")
+cdn_certificate_arn = context_value(app.node, profile, "cdn_certificate_arn")
+cdn_enabled = bool(cdn_domain_names and cdn_certificate_arn)
+
+# the existing buckets of the django static and media files, adopted into the
+# StorageStack with `cdk import`, see the README. Bucket names are global, so
+# a prefixed profile, eg load-test, gets new buckets with generated names
+static_bucket_name = context_value(
+    app.node,
+    profile,
+    "static_bucket_name",
+    None if profile.stack_prefix else "yeastregulatorydb-strides-test",
+)
+media_bucket_name = context_value(
+    app.node,
+    profile,
+    "media_bucket_name",
+    None if profile.stack_prefix else "yeastregulatorydb-strides-tmp",
+)
+
+# probed by the load balancer. Switch to a view which returns 200 without
+# rendering templates or querying the database, eg /healthz/, once the app
+# serves one, and enable the django container health check with it
+django_health_check_path = "/"
 
-django_image_uri = "040367161929.dkr.ecr.us-east-2.amazonaws.com/django-stack:latest"
+# the django DEBUG, task size and capacity. The minimum capacity always runs on
+# demand, bursts are split with Spot
+django_scaling_kwargs = profile.django_kwargs()
 
-vpc_stack = VPCStack(app, "VPCStack", **common_kwargs)
+# gunicorn workers and threads per django task, derived from its size
+django_concurrency = gunicorn_concurrency(
+    django_scaling_kwargs["cpu"], django_scaling_kwargs["memory_limit_mib"]
+)
+
+# the profile may override the capacity of each pool
+celery_worker_pools = profile.celery_worker_pools(
+    {
+        "default": {"queues": ["celery"]},
+        "ingest": {
+            "queues": ["ingest"],
+            "concurrency": 1,
+            "cpu": 1024,
+            "memory_limit_mib": 4096,
+            "min_capacity": 0,
+            "max_capacity": 8,
+            "spot_weight": 3,
+        },
+        "rankresponse": {
+            "queues": ["rankresponse"],
+            "concurrency": 2,
+            "cpu": 1024,
+            "memory_limit_mib": 2048,
+            "min_capacity": 0,
+            "max_capacity": 8,
+            "spot_weight": 3,
+        },
+    }
+)
+
+# database connections each service holds at full scale. RDSStack fails synth
+# if these exceed what the database instance can hold
+connection_demands = {
+    "django": connection_demand(
+        django_scaling_kwargs["max_capacity"],
+        django_concurrency["web_concurrency"],
+        django_concurrency["threads"],
+    ),
+    **celery_connection_demands(celery_worker_pools),
+}
+
+vpc_stack = VPCStack(
+    app,
+    profile.prefixed("VPCStack"),
+    interface_endpoints=True,
+    **profile.vpc_kwargs(),
+    **common_kwargs
+)
 
 securitygroup_stack = SecurityGroupStack(
-    app, "SecurityGroupStack", vpc_stack.vpc, **common_kwargs
+    app, profile.prefixed("SecurityGroupStack"), vpc_stack.vpc, **common_kwargs
 )
 
 
-roles_stack = RolesStack(app, "RolesStack", **common_kwargs)
+roles_stack = RolesStack(app, profile.prefixed("RolesStack"), **common_kwargs)
 
 targetgroup_stack = TargetGroupStack(
-    app, "TargetGroupStack", vpc_stack.vpc, **common_kwargs
+    app,
+    profile.prefixed("TargetGroupStack"),
+    vpc_stack.vpc,
+    # slow genomic queries should not pile up behind each other on one task
+    load_balancing_algorithm=(
+        aws_elasticloadbalancingv2.TargetGroupLoadBalancingAlgorithmType.LEAST_OUTSTANDING_REQUESTS
+    ),
+    deregistration_delay=60,
+    health_check_path=django_health_check_path,
+    **common_kwargs
 )
 
 alb_stack = ALBStack(
     app,
-    "ALBStack",
+    profile.prefixed("ALBStack"),
     vpc_stack.vpc,
     ssl_arn,
     targetgroup_stack.django_target_group,
@@ -50,35 +173,163 @@ alb_stack = ALBStack(
     **common_kwargs
 )  # os.environ["SSL_CERTIFICATE_ARN", ssl_arn]
 
+# the CDN serves the static files only. Uploaded files stay private behind
+# presigned S3 URLs
+storage_stack = StorageStack(
+    app,
+    profile.prefixed("StorageStack"),
+    static_bucket_name=static_bucket_name,
+    media_bucket_name=media_bucket_name,
+    cdn_served_buckets=["static"] if cdn_enabled else [],
+    **common_kwargs
+)
+
+cdn_stack = None
+if cdn_enabled:
+    cdn_stack = CDNStack(
+        app,
+        profile.prefixed("CDNStack"),
+        alb_stack.alb,
+        static_bucket=storage_stack.static_bucket,
+        origin_access_control=storage_stack.origin_access_control,
+        domain_names=cdn_domain_names,
+        certificate_arn=cdn_certificate_arn,
+        **common_kwargs
+    )
+
 redis_stack = RedisStack(
-    app, "RedisStack", vpc_stack.vpc, securitygroup_stack.redis_sg, **common_kwargs
+    app,
+    profile.prefixed("RedisStack"),
+    vpc_stack.vpc,
+    securitygroup_stack.redis_sg,
+    separate_broker=True,
+    **profile.redis_kwargs(),
+    **common_kwargs
 )
 
 rds_stack = RDSStack(
-    app, "RDSStack", vpc_stack.vpc, securitygroup_stack.postgres_sg, **common_kwargs
+    app,
+    profile.prefixed("RDSStack"),
+    vpc_stack.vpc,
+    securitygroup_stack.postgres_sg,
+    connection_demands=connection_demands,
+    db_proxy_name=profile.prefixed("mydbproxy"),
+    **profile.rds_kwargs(),
+    **common_kwargs
 )
 
 log_group_stack = LogGroupStack(
-    app, "DjangoLogGroupStack", "DjangoLogGroupStack", **common_kwargs
+    app,
+    profile.prefixed("DjangoLogGroupStack"),
+    profile.prefixed("DjangoLogGroupStack"),
+    access_log_metrics=True,
+    **common_kwargs
 )
 
 django_service_stack = DjangoServiceStack(
     app,
-    "DjangoServiceStack",
+    profile.prefixed("DjangoServiceStack"),
     vpc_stack.vpc,
     django_image_uri,
     "yeastregulatorydb",
     roles_stack.execution_role,
     roles_stack.task_role,
-    redis_stack.cache_cluster,
+    redis_stack.redis_instance,
     rds_stack.db_proxy,
     rds_stack.db_secret,
     log_group_stack.log_group,
     securitygroup_stack.django_sg,
-    alb_stack.https_listener,
+    targetgroup_stack.django_target_group,
+    redis_broker_instance=redis_stack.broker_instance,
+    db_read_hosts=rds_stack.db_read_hosts,
+    static_bucket_name=storage_stack.static_bucket.bucket_name,
+    media_bucket_name=storage_stack.media_bucket.bucket_name,
+    cdn_domain_name=cdn_domain_names[0] if cdn_enabled else None,
+    health_check_path=django_health_check_path,
+    cluster_name=profile.prefixed("DjangoAppCluster"),
+    container_insights=True,
+    tracing=True,
+    log_mode=aws_ecs.AwsLogDriverMode.NON_BLOCKING,
+    placement="private-spread",
     s3_bucket="yeastregulatorydb-strides-tmp",
     env_filename=".env",
+    **django_scaling_kwargs,
+    **common_kwargs
+)
+
+celery_worker_service_stack = CeleryWorkerServiceStack(
+    app,
+    profile.prefixed("CeleryWorkerServiceStack"),
+    vpc_stack.vpc,
+    django_service_stack.cluster,
+    django_image_uri,
+    roles_stack.execution_role,
+    roles_stack.task_role,
+    django_service_stack.django_secrets,
+    django_service_stack.django_env_vars,
+    log_group_stack.log_group,
+    securitygroup_stack.django_sg,
+    environment_files=django_service_stack.environment_file,
+    placement="private-spread",
+    worker_pools=celery_worker_pools,
     **common_kwargs
 )
 
+flower_service_stack = FlowerServiceStack(
+    app,
+    profile.prefixed("FlowerServiceStack"),
+    vpc_stack.vpc,
+    django_service_stack.cluster,
+    django_image_uri,
+    roles_stack.execution_role,
+    roles_stack.task_role,
+    django_service_stack.django_secrets,
+    django_service_stack.django_env_vars,
+    log_group_stack.log_group,
+    securitygroup_stack.django_sg,
+    targetgroup_stack.flower_target_group,
+    environment_files=django_service_stack.environment_file,
+    placement="private-spread",
+    **profile.flower_kwargs(),
+    **common_kwargs
+)
+
+# the app serves no lightweight health check view yet
+suppress(
+    targetgroup_stack.django_target_group,
+    "root-health-check",
+    "The django app does not serve a health check view yet.",
+)
+
+# Flower is an admin dashboard, one task is enough
+suppress(
+    flower_service_stack.service,
+    "single-task-service",
+    "Flower is an admin dashboard.",
+)
+
+observability_stack = ObservabilityStack(
+    app,
+    profile.prefixed("ObservabilityStack"),
+    alb_stack.alb,
+    targetgroup_stack.django_target_group,
+    {
+        "django": django_service_stack.service,
+        "flower": flower_service_stack.service,
+        **{
+            "celery-" + name: service
+            for name, service in celery_worker_service_stack.services.items()
+        },
+    },
+    rds_stack.db_instance or rds_stack.db_cluster,
+    rds_stack.db_proxy,
+    {"cache": redis_stack.redis_instance, "broker": redis_stack.broker_instance},
+    db_connections_threshold=rds_stack.connection_budget["available_connections"],
+    **common_kwargs
+)
+
+# report settings known to hurt throughput, as errors in production sized
+# profiles. See guardrails.py
+cdk.Aspects.of(app).add(PerformanceGuardrails(errors=profile.guardrail_errors))
+
 app.synth()
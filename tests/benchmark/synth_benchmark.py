@@ -0,0 +1,239 @@
+"""Benchmark the synthesis of app.py
+
+Synthesizes the full topology of app.py in a fresh process and records the
+wall time, the peak memory of the largest process (python or the jsii node
+runtime), and the template size and resource count of each stack. The
+results are compared with `baseline.json`, and a value which grows beyond its
+threshold is a regression.
+
+The template sizes and resource counts are deterministic. The time and
+memory depend on the machine, so `pytest` only checks them with
+SYNTH_BENCHMARK=1, on a machine comparable to the one which recorded the
+baseline. The peak memory is only measured where `os.wait4` exists, ie not on
+Windows.
+
+Usage, from the root of the repository:
+
+    python -m tests.benchmark.synth_benchmark            # compare
+    python -m tests.benchmark.synth_benchmark --update   # record a baseline
+
+The thresholds are fractions of the baseline values. Override them with the
+environment variables SYNTH_BENCHMARK_SYNTH_SECONDS,
+SYNTH_BENCHMARK_PEAK_MEMORY_MIB, SYNTH_BENCHMARK_TEMPLATE_BYTES and
+SYNTH_BENCHMARK_RESOURCES, eg when the CI runner is slower than the machine
+which recorded the baseline.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+APP_PATH = REPO_ROOT / "app.py"
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+# The fixed environment of the synthesis. app.py makes no context lookups,
+# so these only keep any account or region tokens stable and offline. The
+# context enables the optional CDNStack, so that every stack is measured
+SYNTH_ENV = {
+    "CDK_DEFAULT_ACCOUNT": "123456789012",
+    "CDK_DEFAULT_REGION": "us-east-2",
+    "CDK_CONTEXT_JSON": json.dumps(
+        {
+            "cdn_domain_names": ["yeastregulatorydb.org"],
+            "cdn_certificate_arn": (
+                "arn:aws:acm:us-east-1:123456789012:certificate/benchmark"
+            ),
+        }
+    ),
+    "JSII_SILENCE_WARNING_DEPRECATED_NODE_VERSION": "1",
+}
+
+DEFAULT_THRESHOLDS = {
+    "synth_seconds": 0.5,
+    "peak_memory_mib": 0.25,
+    "template_bytes": 0.1,
+    "resources": 0.1,
+}
+
+
+def thresholds_from_env() -> Dict[str, float]:
+    """Get the thresholds, overridden by the SYNTH_BENCHMARK_* variables
+
+    :return: The allowed growth of each measure, as a fraction.
+    :rtype: Dict[str, float]
+    """
+    return {
+        name: float(os.environ.get("SYNTH_BENCHMARK_" + name.upper(), default))
+        for name, default in DEFAULT_THRESHOLDS.items()
+    }
+
+
+def measure_synth(app_path: Path = APP_PATH) -> dict:
+    """Synthesize an app in a new process and measure it
+
+    :param app_path: The CDK app. Default is app.py.
+    :type app_path: Path
+
+    :return: A dictionary with `synth_seconds`, `peak_memory_mib` and
+        `stacks`, which maps each stack name to its `template_bytes` and
+        `resources`. `peak_memory_mib` is None without `os.wait4`.
+    :rtype: dict
+
+    :raises RuntimeError: If the synthesis fails.
+    """
+    with tempfile.TemporaryDirectory() as outdir:
+        env = {**os.environ, **SYNTH_ENV, "CDK_OUTDIR": outdir}
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, str(app_path)],
+            cwd=app_path.parent,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        peak_memory = None
+        if hasattr(os, "wait4"):
+            # Read stderr before waiting, so that a full pipe cannot block the
+            # app. wait4 reports the largest peak RSS of the process and of
+            # the children it waited for, ie the jsii node runtime, not their
+            # sum
+            stderr = process.stderr.read()
+            _, status, rusage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in KiB on Linux and in bytes on macOS
+            peak_memory = rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        else:
+            _, stderr = process.communicate()
+        synth_seconds = time.perf_counter() - start
+        if process.returncode != 0:
+            raise RuntimeError(f"{app_path} failed to synthesize:\n{stderr.decode()}")
+
+        manifest = json.loads((Path(outdir) / "manifest.json").read_text())
+        stacks = {}
+        for name, artifact in manifest["artifacts"].items():
+            if artifact["type"] != "aws:cloudformation:stack":
+                continue
+            template_path = Path(outdir) / artifact["properties"]["templateFile"]
+            template = json.loads(template_path.read_text())
+            stacks[name] = {
+                "template_bytes": template_path.stat().st_size,
+                "resources": len(template.get("Resources", {})),
+            }
+
+    return {
+        "synth_seconds": round(synth_seconds, 2),
+        "peak_memory_mib": (
+            None if peak_memory is None else round(peak_memory / 2**20, 1)
+        ),
+        "stacks": dict(sorted(stacks.items())),
+    }
+
+
+def compare(
+    result: dict,
+    baseline: dict,
+    thresholds: Dict[str, float] = None,
+    performance: bool = True,
+) -> List[str]:
+    """Find the measures of a result which regressed from a baseline
+
+    :param result: The output of `measure_synth`.
+    :type result: dict
+    :param baseline: An earlier output of `measure_synth`.
+    :type baseline: dict
+    :param thresholds: The allowed growth of each measure, as a fraction.
+        Default is `DEFAULT_THRESHOLDS`.
+    :type thresholds: Dict[str, float]
+    :param performance: Whether to compare the synth time and peak memory,
+        which depend on the machine. A peak memory of None, ie not measured,
+        is not compared. Default is True.
+    :type performance: bool
+
+    :return: A description of each regression. Empty if there is none.
+    :rtype: List[str]
+    """
+    thresholds = thresholds or DEFAULT_THRESHOLDS
+    regressions = []
+
+    def check(label, name, current, previous):
+        limit = previous * (1 + thresholds[name])
+        if current > limit:
+            regressions.append(
+                f"{label} {name} is {current}, above {limit:.1f} "
+                f"(baseline {previous} + {thresholds[name]:.0%})"
+            )
+
+    if performance:
+        for name in ["synth_seconds", "peak_memory_mib"]:
+            if result[name] is not None and baseline[name] is not None:
+                check("app", name, result[name], baseline[name])
+    for stack_name, stack in result["stacks"].items():
+        if stack_name not in baseline["stacks"]:
+            regressions.append(
+                f"{stack_name} is not in the baseline. Record a new baseline."
+            )
+            continue
+        for name in ["template_bytes", "resources"]:
+            check(stack_name, name, stack[name], baseline["stacks"][stack_name][name])
+    for stack_name in baseline["stacks"].keys() - result["stacks"].keys():
+        regressions.append(f"{stack_name} is in the baseline but was not synthesized.")
+    return regressions
+
+
+def format_report(result: dict) -> str:
+    """Format a result as a table
+
+    :param result: The output of `measure_synth`.
+    :type result: dict
+
+    :return: The report.
+    :rtype: str
+    """
+    lines = [
+        f"synth time: {result['synth_seconds']} s",
+        (
+            "peak memory: not measured"
+            if result["peak_memory_mib"] is None
+            else f"peak memory: {result['peak_memory_mib']} MiB"
+        ),
+        f"{'stack':<28}{'resources':>10}{'bytes':>10}",
+    ]
+    for stack_name, stack in result["stacks"].items():
+        lines.append(
+            f"{stack_name:<28}{stack['resources']:>10}{stack['template_bytes']:>10}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Write the result to the baseline instead of comparing with it.",
+    )
+    args = parser.parse_args(argv)
+
+    result = measure_synth()
+    print(format_report(result))
+    if args.update:
+        BASELINE_PATH.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"Wrote {BASELINE_PATH}")
+        return 0
+    regressions = compare(
+        result, json.loads(BASELINE_PATH.read_text()), thresholds_from_env()
+    )
+    for regression in regressions:
+        print("REGRESSION: " + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import json
+import os
+
+import pytest
+
+from .synth_benchmark import BASELINE_PATH, compare, measure_synth, thresholds_from_env
+
+
+@pytest.fixture(scope="module")
+def result():
+    return measure_synth()
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    return json.loads(BASELINE_PATH.read_text())
+
+
+def test_app_synthesizes_every_stack(result, baseline):
+    assert set(result["stacks"]) == set(baseline["stacks"])
+    assert all(stack["resources"] > 0 for stack in result["stacks"].values())
+
+
+def test_no_template_regressions(result, baseline):
+    assert compare(result, baseline, thresholds_from_env(), performance=False) == []
+
+
+@pytest.mark.skipif(
+    os.environ.get("SYNTH_BENCHMARK") != "1",
+    reason="set SYNTH_BENCHMARK=1 to compare the machine dependent measures",
+)
+def test_no_synth_time_or_memory_regressions(result, baseline):
+    assert compare(result, baseline, thresholds_from_env()) == []
+
+
+def test_compare_reports_growth_beyond_threshold(baseline):
+    stack_name = next(iter(baseline["stacks"]))
+    grown = json.loads(json.dumps(baseline))
+    grown["synth_seconds"] = baseline["synth_seconds"] * 2 + 1
+    grown["stacks"][stack_name]["resources"] += 1000
+    regressions = compare(grown, baseline)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("app synth_seconds")
+    assert regressions[1].startswith(stack_name + " resources")
+    assert compare(baseline, baseline) == []
+    assert compare(grown, baseline, performance=False) == regressions[1:]
+
+
+def test_peak_memory_not_measured_without_wait4(monkeypatch, baseline):
+    monkeypatch.delattr(os, "wait4", raising=False)
+    result = measure_synth()
+    assert result["peak_memory_mib"] is None
+    assert set(result["stacks"]) == set(baseline["stacks"])
+    assert not any(
+        regression.startswith("app peak_memory_mib")
+        for regression in compare(result, baseline)
+    )
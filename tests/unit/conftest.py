@@ -0,0 +1,187 @@
+from types import SimpleNamespace
+
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+import pytest
+
+from yeastregulatorydbstack import (
+    ALBStack,
+    CDNStack,
+    CeleryWorkerServiceStack,
+    DjangoServiceStack,
+    FlowerServiceStack,
+    LogGroupStack,
+    ObservabilityStack,
+    RDSStack,
+    RedisStack,
+    RolesStack,
+    SecurityGroupStack,
+    StorageStack,
+    TargetGroupStack,
+    VPCStack,
+)
+
+ENV = core.Environment(account="123456789012", region="us-east-2")
+SSL_ARN = "arn:aws:acm:us-east-2:123456789012:certificate/test"
+IMAGE_URI = "123456789012.dkr.ecr.us-east-2.amazonaws.com/django-stack:latest"
+CDN_CERTIFICATE_ARN = "arn:aws:acm:us-east-1:123456789012:certificate/test"
+
+
+def build_stacks(**overrides):
+    """Build the app.py topology in a fresh app.
+
+    Each keyword argument is named after a stack attribute below (eg
+    `django_service_stack`) and holds extra kwargs for that stack's
+    constructor.
+    """
+    app = core.App()
+    common_kwargs = {
+        "app_tag_name": "app",
+        "app_tag_value": "yeastregulatorydb",
+        "env": ENV,
+    }
+
+    def kw(name):
+        return {**common_kwargs, **overrides.get(name, {})}
+
+    stacks = SimpleNamespace(app=app)
+    stacks.vpc_stack = VPCStack(app, "VPCStack", **kw("vpc_stack"))
+    stacks.securitygroup_stack = SecurityGroupStack(
+        app, "SecurityGroupStack", stacks.vpc_stack.vpc, **kw("securitygroup_stack")
+    )
+    stacks.roles_stack = RolesStack(app, "RolesStack", **kw("roles_stack"))
+    stacks.targetgroup_stack = TargetGroupStack(
+        app, "TargetGroupStack", stacks.vpc_stack.vpc, **kw("targetgroup_stack")
+    )
+    stacks.alb_stack = ALBStack(
+        app,
+        "ALBStack",
+        stacks.vpc_stack.vpc,
+        SSL_ARN,
+        stacks.targetgroup_stack.django_target_group,
+        stacks.targetgroup_stack.flower_target_group,
+        alb_security_groups=stacks.securitygroup_stack.alb_security_group,
+        **kw("alb_stack")
+    )
+    stacks.storage_stack = StorageStack(
+        app, "StorageStack", **{"cdn_served_buckets": ["static"], **kw("storage_stack")}
+    )
+    stacks.cdn_stack = CDNStack(
+        app,
+        "CDNStack",
+        stacks.alb_stack.alb,
+        **{
+            "static_bucket": stacks.storage_stack.static_bucket,
+            "origin_access_control": stacks.storage_stack.origin_access_control,
+            "domain_names": ["yeastregulatorydb.org"],
+            "certificate_arn": CDN_CERTIFICATE_ARN,
+            **kw("cdn_stack"),
+        }
+    )
+    stacks.redis_stack = RedisStack(
+        app,
+        "RedisStack",
+        stacks.vpc_stack.vpc,
+        stacks.securitygroup_stack.redis_sg,
+        **kw("redis_stack")
+    )
+    stacks.rds_stack = RDSStack(
+        app,
+        "RDSStack",
+        stacks.vpc_stack.vpc,
+        stacks.securitygroup_stack.postgres_sg,
+        **kw("rds_stack")
+    )
+    stacks.log_group_stack = LogGroupStack(
+        app, "DjangoLogGroupStack", "DjangoLogGroupStack", **kw("log_group_stack")
+    )
+    stacks.django_service_stack = DjangoServiceStack(
+        app,
+        "DjangoServiceStack",
+        stacks.vpc_stack.vpc,
+        IMAGE_URI,
+        "yeastregulatorydb",
+        stacks.roles_stack.execution_role,
+        stacks.roles_stack.task_role,
+        stacks.redis_stack.redis_instance,
+        stacks.rds_stack.db_proxy,
+        stacks.rds_stack.db_secret,
+        stacks.log_group_stack.log_group,
+        stacks.securitygroup_stack.django_sg,
+        stacks.targetgroup_stack.django_target_group,
+        redis_broker_instance=stacks.redis_stack.broker_instance,
+        db_read_hosts=stacks.rds_stack.db_read_hosts,
+        static_bucket_name=stacks.storage_stack.static_bucket.bucket_name,
+        media_bucket_name=stacks.storage_stack.media_bucket.bucket_name,
+        cdn_domain_name="yeastregulatorydb.org",
+        **kw("django_service_stack")
+    )
+    stacks.celery_worker_service_stack = CeleryWorkerServiceStack(
+        app,
+        "CeleryWorkerServiceStack",
+        stacks.vpc_stack.vpc,
+        stacks.django_service_stack.cluster,
+        IMAGE_URI,
+        stacks.roles_stack.execution_role,
+        stacks.roles_stack.task_role,
+        stacks.django_service_stack.django_secrets,
+        stacks.django_service_stack.django_env_vars,
+        stacks.log_group_stack.log_group,
+        stacks.securitygroup_stack.django_sg,
+        **kw("celery_worker_service_stack")
+    )
+    stacks.flower_service_stack = FlowerServiceStack(
+        app,
+        "FlowerServiceStack",
+        stacks.vpc_stack.vpc,
+        stacks.django_service_stack.cluster,
+        IMAGE_URI,
+        stacks.roles_stack.execution_role,
+        stacks.roles_stack.task_role,
+        stacks.django_service_stack.django_secrets,
+        stacks.django_service_stack.django_env_vars,
+        stacks.log_group_stack.log_group,
+        stacks.securitygroup_stack.django_sg,
+        stacks.targetgroup_stack.flower_target_group,
+        **kw("flower_service_stack")
+    )
+    stacks.observability_stack = ObservabilityStack(
+        app,
+        "ObservabilityStack",
+        stacks.alb_stack.alb,
+        stacks.targetgroup_stack.django_target_group,
+        {
+            "django": stacks.django_service_stack.service,
+            "flower": stacks.flower_service_stack.service,
+            **{
+                "celery-" + name: service
+                for name, service in stacks.celery_worker_service_stack.services.items()
+            },
+        },
+        stacks.rds_stack.db_instance or stacks.rds_stack.db_cluster,
+        stacks.rds_stack.db_proxy,
+        {
+            "cache": stacks.redis_stack.redis_instance,
+            "broker": stacks.redis_stack.broker_instance,
+        },
+        **kw("observability_stack")
+    )
+    return stacks
+
+
+def container_environment(stack, container_name="django"):
+    """Get the environment variables of a container in a synthesized stack"""
+    template = assertions.Template.from_stack(stack)
+    for task_definition in template.find_resources("AWS::ECS::TaskDefinition").values():
+        for container in task_definition["Properties"]["ContainerDefinitions"]:
+            if container["Name"] == container_name:
+                return {
+                    variable["Name"]: variable["Value"]
+                    for variable in container.get("Environment", [])
+                }
+    raise KeyError(container_name)
+
+
+@pytest.fixture(scope="module")
+def default_stacks():
+    return build_stacks()
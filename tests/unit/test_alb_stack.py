@@ -0,0 +1,62 @@
+import aws_cdk.assertions as assertions
+
+from .conftest import build_stacks
+
+
+def test_alb_idle_timeout_and_http2():
+    stacks = build_stacks(alb_stack={"idle_timeout": 120, "http2_enabled": False})
+    template = assertions.Template.from_stack(stacks.alb_stack)
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::LoadBalancer",
+        {
+            "LoadBalancerAttributes": assertions.Match.array_with(
+                [
+                    {"Key": "routing.http2.enabled", "Value": "false"},
+                    {"Key": "idle_timeout.timeout_seconds", "Value": "120"},
+                ]
+            )
+        },
+    )
+
+
+def test_no_alb_access_logs_by_default(default_stacks):
+    template = assertions.Template.from_stack(default_stacks.alb_stack)
+    template.resource_count_is("AWS::S3::Bucket", 0)
+    template.resource_count_is("AWS::Glue::Table", 0)
+
+
+def test_alb_access_logs_and_athena_table():
+    stacks = build_stacks(alb_stack={"access_logs": True, "access_logs_expiration": 14})
+    template = assertions.Template.from_stack(stacks.alb_stack)
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::LoadBalancer",
+        {
+            "LoadBalancerAttributes": assertions.Match.array_with(
+                [{"Key": "access_logs.s3.enabled", "Value": "true"}]
+            )
+        },
+    )
+    template.has_resource_properties(
+        "AWS::S3::Bucket",
+        {
+            "LifecycleConfiguration": {
+                "Rules": [assertions.Match.object_like({"ExpirationInDays": 14})]
+            }
+        },
+    )
+    template.has_resource_properties(
+        "AWS::Glue::Database",
+        {"DatabaseInput": {"Name": "albstack_access_logs"}},
+    )
+    (table,) = template.find_resources("AWS::Glue::Table").values()
+    table_input = table["Properties"]["TableInput"]
+    assert table_input["PartitionKeys"] == [{"Name": "day", "Type": "string"}]
+    assert table_input["Parameters"]["projection.day.range"] == "NOW-14DAYS,NOW"
+    columns = [column["Name"] for column in table_input["StorageDescriptor"]["Columns"]]
+    assert "target_processing_time" in columns
+    template.resource_count_is("AWS::Athena::NamedQuery", 3)
+    assert set(stacks.alb_stack.access_logs_queries) == {
+        "SlowestPaths",
+        "RequestRatePerTarget",
+        "CacheCandidates",
+    }
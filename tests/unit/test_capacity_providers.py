@@ -0,0 +1,58 @@
+import aws_cdk.assertions as assertions
+import pytest
+
+from yeastregulatorydbstack.capacity_providers import capacity_provider_strategies
+
+from .conftest import build_stacks
+
+
+def test_on_demand_only_by_default():
+    (strategy,) = capacity_provider_strategies()
+    assert strategy.capacity_provider == "FARGATE"
+    assert strategy.weight == 1
+    assert strategy.base is None
+
+
+def test_base_and_spot_mix():
+    on_demand, spot = capacity_provider_strategies(2, 1, 3)
+    assert (on_demand.capacity_provider, on_demand.base, on_demand.weight) == (
+        "FARGATE",
+        2,
+        1,
+    )
+    assert (spot.capacity_provider, spot.base, spot.weight) == ("FARGATE_SPOT", None, 3)
+
+
+@pytest.mark.parametrize("args", [(-1, 1, 0), (0, 0, 0), (0, 1, -1)])
+def test_invalid_mix(args):
+    with pytest.raises(ValueError):
+        capacity_provider_strategies(*args)
+
+
+def test_services_use_the_mix():
+    stacks = build_stacks(
+        django_service_stack={"on_demand_base": 1, "spot_weight": 2},
+        celery_worker_service_stack={
+            "worker_pools": {"default": {"on_demand_weight": 0, "spot_weight": 1}}
+        },
+    )
+    assertions.Template.from_stack(stacks.django_service_stack).has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "CapacityProviderStrategy": [
+                {"CapacityProvider": "FARGATE", "Base": 1, "Weight": 1},
+                {"CapacityProvider": "FARGATE_SPOT", "Weight": 2},
+            ]
+        },
+    )
+    assertions.Template.from_stack(
+        stacks.celery_worker_service_stack
+    ).has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "CapacityProviderStrategy": [
+                {"CapacityProvider": "FARGATE", "Weight": 0},
+                {"CapacityProvider": "FARGATE_SPOT", "Weight": 1},
+            ]
+        },
+    )
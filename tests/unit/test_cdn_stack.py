@@ -0,0 +1,212 @@
+import aws_cdk.assertions as assertions
+import pytest
+
+from yeastregulatorydbstack import CDNStack
+
+from .conftest import CDN_CERTIFICATE_ARN, ENV, build_stacks
+
+MEDIA_PUBLIC_KEY = """-----BEGIN PUBLIC KEY-----
+MIIBIjANBgkqhkiG9w0BAQEFAAOCAQ8AMIIBCgKCAQEAtest
+-----END PUBLIC KEY-----"""
+
+
+@pytest.fixture(scope="module")
+def template(default_stacks):
+    return assertions.Template.from_stack(default_stacks.cdn_stack)
+
+
+def build_media_cdn_stack(**kwargs):
+    """Build a second distribution which serves the media bucket"""
+    stacks = build_stacks(storage_stack={"cdn_served_buckets": ["static", "media"]})
+    return CDNStack(
+        stacks.app,
+        "MediaCDNStack",
+        stacks.alb_stack.alb,
+        **{
+            "media_bucket": stacks.storage_stack.media_bucket,
+            "media_public_key": MEDIA_PUBLIC_KEY,
+            "origin_access_control": stacks.storage_stack.origin_access_control,
+            "domain_names": ["media.yeastregulatorydb.org"],
+            "certificate_arn": CDN_CERTIFICATE_ARN,
+            "env": ENV,
+            **kwargs,
+        },
+    )
+
+
+@pytest.fixture(scope="module")
+def media_template():
+    return assertions.Template.from_stack(build_media_cdn_stack())
+
+
+def distribution_config(template):
+    (distribution,) = template.find_resources("AWS::CloudFront::Distribution").values()
+    return distribution["Properties"]["DistributionConfig"]
+
+
+def test_origins_with_origin_shield(template, media_template):
+    alb_origin, static_origin = distribution_config(template)["Origins"]
+    _, media_origin = distribution_config(media_template)["Origins"]
+    assert alb_origin["CustomOriginConfig"]["OriginProtocolPolicy"] == "https-only"
+    for origin in [static_origin, media_origin]:
+        assert origin["S3OriginConfig"] == {"OriginAccessIdentity": ""}
+        assert "OriginAccessControlId" in origin
+    for origin in [alb_origin, static_origin, media_origin]:
+        assert origin["OriginShield"]["Enabled"] is True
+
+
+def test_static_served_by_alb_without_bucket():
+    stacks = build_stacks(
+        storage_stack={"cdn_served_buckets": []},
+        cdn_stack={"static_bucket": None, "origin_access_control": None},
+    )
+    template = assertions.Template.from_stack(stacks.cdn_stack)
+    (origin,) = distribution_config(template)["Origins"]
+    assert "CustomOriginConfig" in origin
+    assert "/media/*" not in [
+        behavior["PathPattern"]
+        for behavior in distribution_config(template)["CacheBehaviors"]
+    ]
+
+
+def test_cache_behaviors_in_order(template):
+    behaviors = distribution_config(template)["CacheBehaviors"]
+    assert [behavior["PathPattern"] for behavior in behaviors] == [
+        "/admin/*",
+        "/accounts/*",
+        "/api/auth/*",
+        "/static/*",
+        "/api/*",
+    ]
+    # managed CachingDisabled policy
+    assert behaviors[0]["CachePolicyId"] == "4135ea2d-6df8-44a3-9df3-4b5a84be39ad"
+    assert (
+        distribution_config(template)["DefaultCacheBehavior"]["CachePolicyId"]
+        == "4135ea2d-6df8-44a3-9df3-4b5a84be39ad"
+    )
+
+
+def test_media_requires_signed_urls(media_template):
+    behaviors = distribution_config(media_template)["CacheBehaviors"]
+    assert [behavior["PathPattern"] for behavior in behaviors] == [
+        "/admin/*",
+        "/accounts/*",
+        "/api/auth/*",
+        "/static/*",
+        "/media/*",
+        "/api/*",
+    ]
+    (media_behavior,) = [
+        behavior for behavior in behaviors if behavior["PathPattern"] == "/media/*"
+    ]
+    # media files are mostly compressed already
+    assert media_behavior["Compress"] is False
+    assert len(media_behavior["TrustedKeyGroups"]) == 1
+    media_template.resource_count_is("AWS::CloudFront::PublicKey", 1)
+
+
+def test_media_requires_public_key():
+    with pytest.raises(ValueError):
+        build_media_cdn_stack(media_public_key=None)
+
+
+def test_only_the_distribution_reads_the_buckets(template):
+    template.resource_count_is("AWS::S3::BucketPolicy", 1)
+    (bucket_policy,) = template.find_resources("AWS::S3::BucketPolicy").values()
+    deny_insecure, read = bucket_policy["Properties"]["PolicyDocument"]["Statement"]
+    assert deny_insecure["Effect"] == "Deny"
+    assert deny_insecure["Condition"] == {"Bool": {"aws:SecureTransport": "false"}}
+    assert read["Action"] == "s3:GetObject"
+    assert read["Principal"] == {"Service": "cloudfront.amazonaws.com"}
+    source_arn = read["Condition"]["StringEquals"]["AWS:SourceArn"]
+    assert "distribution/" in str(source_arn)
+    assert "DjangoDistribution" in str(source_arn)
+
+
+def test_bucket_with_policy_rejected():
+    with pytest.raises(ValueError):
+        build_stacks(storage_stack={"cdn_served_buckets": []})
+
+
+def test_cache_policies(template):
+    template.has_resource_properties(
+        "AWS::CloudFront::CachePolicy",
+        {
+            "CachePolicyConfig": assertions.Match.object_like(
+                {
+                    "DefaultTTL": 86400 * 30,
+                    "ParametersInCacheKeyAndForwardedToOrigin": assertions.Match.object_like(
+                        {
+                            "EnableAcceptEncodingBrotli": True,
+                            "EnableAcceptEncodingGzip": True,
+                            "QueryStringsConfig": {"QueryStringBehavior": "none"},
+                        }
+                    ),
+                }
+            )
+        },
+    )
+    template.has_resource_properties(
+        "AWS::CloudFront::CachePolicy",
+        {
+            "CachePolicyConfig": assertions.Match.object_like(
+                {
+                    "DefaultTTL": 60,
+                    "ParametersInCacheKeyAndForwardedToOrigin": assertions.Match.object_like(
+                        {
+                            "QueryStringsConfig": {"QueryStringBehavior": "all"},
+                            "HeadersConfig": {
+                                "HeaderBehavior": "whitelist",
+                                "Headers": ["Authorization"],
+                            },
+                            "CookiesConfig": {
+                                "CookieBehavior": "whitelist",
+                                "Cookies": ["sessionid"],
+                            },
+                        }
+                    ),
+                }
+            )
+        },
+    )
+
+
+def test_api_writes_forward_csrf_token(template):
+    template.has_resource_properties(
+        "AWS::CloudFront::OriginRequestPolicy",
+        {
+            "OriginRequestPolicyConfig": assertions.Match.object_like(
+                {
+                    "HeadersConfig": {
+                        "HeaderBehavior": "whitelist",
+                        "Headers": ["Host"],
+                    },
+                    "CookiesConfig": {
+                        "CookieBehavior": "whitelist",
+                        "Cookies": ["csrftoken"],
+                    },
+                }
+            )
+        },
+    )
+
+
+def test_viewers_use_the_domain_names(template):
+    config = distribution_config(template)
+    assert config["Aliases"] == ["yeastregulatorydb.org"]
+    assert config["ViewerCertificate"]["AcmCertificateArn"].startswith(
+        "arn:aws:acm:us-east-1:"
+    )
+
+
+@pytest.mark.parametrize(
+    "cdn_stack", [{"domain_names": None}, {"certificate_arn": None}]
+)
+def test_domain_names_and_certificate_required(cdn_stack):
+    with pytest.raises(ValueError):
+        build_stacks(cdn_stack=cdn_stack)
+
+
+def test_bucket_requires_origin_access_control():
+    with pytest.raises(ValueError):
+        build_stacks(cdn_stack={"origin_access_control": None})
@@ -0,0 +1,213 @@
+import aws_cdk.assertions as assertions
+import pytest
+
+from .conftest import build_stacks
+
+
+@pytest.fixture(scope="module")
+def stacks():
+    return build_stacks(
+        celery_worker_service_stack={
+            "worker_pools": {
+                "default": {},
+                "ingest": {
+                    "queues": ["ingest", "ingest-priority"],
+                    "concurrency": 1,
+                    "prefetch_multiplier": 4,
+                    "cpu": 1024,
+                    "memory_limit_mib": 4096,
+                    "min_capacity": 0,
+                    "max_capacity": 8,
+                },
+            }
+        }
+    )
+
+
+@pytest.fixture(scope="module")
+def template(stacks):
+    return assertions.Template.from_stack(stacks.celery_worker_service_stack)
+
+
+def test_one_service_per_pool(template):
+    # plus the backlog publisher
+    template.resource_count_is("AWS::ECS::Service", 3)
+    template.resource_count_is("AWS::ECS::TaskDefinition", 3)
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition", {"Cpu": "1024", "Memory": "4096"}
+    )
+    template.has_resource_properties("AWS::ECS::Service", {"DesiredCount": 0})
+
+
+def test_worker_command_uses_pool_settings(template):
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "ContainerDefinitions": [
+                assertions.Match.object_like(
+                    {
+                        "Command": [
+                            "celery",
+                            "-A",
+                            "config.celery_app",
+                            "worker",
+                            "-l",
+                            "INFO",
+                            "-n",
+                            "ingest@%h",
+                            "-Q",
+                            "ingest,ingest-priority",
+                            "--concurrency",
+                            "1",
+                            "--prefetch-multiplier",
+                            "4",
+                        ],
+                        "Environment": assertions.Match.array_with(
+                            [{"Name": "CELERY_WORKER_POOL", "Value": "ingest"}]
+                        ),
+                    }
+                )
+            ]
+        },
+    )
+
+
+def test_pools_scale_on_queue_backlog(template):
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalableTarget",
+        {"MinCapacity": 0, "MaxCapacity": 8},
+    )
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "MetricName": "QueueBacklog",
+            "Namespace": "YeastRegulatoryDB/Celery",
+            "Dimensions": [{"Name": "Queue", "Value": "celery"}],
+        },
+    )
+    # the ingest pool consumes two queues so its backlog is a metric math sum
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "Metrics": assertions.Match.array_with(
+                [assertions.Match.object_like({"Expression": "q0+q1"})]
+            )
+        },
+    )
+
+
+def test_pools_scale_in_after_an_empty_backlog_for_minutes(template):
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "ComparisonOperator": "LessThanOrEqualToThreshold",
+            "Threshold": 0,
+            "EvaluationPeriods": 15,
+        },
+    )
+    # scale out does not remove tasks
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "ComparisonOperator": "GreaterThanOrEqualToThreshold",
+            "Threshold": 1,
+            "EvaluationPeriods": 1,
+        },
+    )
+    template.resource_count_is("AWS::CloudWatch::Alarm", 4)
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalingPolicy",
+        {
+            "StepScalingPolicyConfiguration": assertions.Match.object_like(
+                {
+                    "Cooldown": 300,
+                    "StepAdjustments": [
+                        {"MetricIntervalUpperBound": 0, "ScalingAdjustment": -1}
+                    ],
+                }
+            )
+        },
+    )
+
+
+def test_workers_finish_running_tasks_on_stop(template):
+    containers = [
+        container
+        for task_definition in template.find_resources(
+            "AWS::ECS::TaskDefinition"
+        ).values()
+        for container in task_definition["Properties"]["ContainerDefinitions"]
+        if container["Name"] == "celeryworker"
+    ]
+    assert len(containers) == 2
+    assert all(container["StopTimeout"] == 120 for container in containers)
+
+
+def test_publisher_reports_backlog_of_every_queue(template):
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "ContainerDefinitions": [
+                assertions.Match.object_like(
+                    {
+                        "Name": "backlogpublisher",
+                        "Command": [
+                            "python",
+                            "-c",
+                            assertions.Match.string_like_regexp("QueueBacklog"),
+                        ],
+                        "Environment": assertions.Match.array_with(
+                            [
+                                {
+                                    "Name": "CELERY_BACKLOG_QUEUES",
+                                    "Value": "celery,ingest,ingest-priority",
+                                }
+                            ]
+                        ),
+                    }
+                )
+            ]
+        },
+    )
+    template.has_resource_properties("AWS::ECS::Service", {"DesiredCount": 1})
+
+
+def test_publisher_can_be_disabled():
+    stacks = build_stacks(celery_worker_service_stack={"backlog_publisher": False})
+    assert stacks.celery_worker_service_stack.backlog_publisher is None
+    template = assertions.Template.from_stack(stacks.celery_worker_service_stack)
+    template.resource_count_is("AWS::ECS::Service", 1)
+
+
+def test_stop_timeout_above_fargate_limit_raises():
+    with pytest.raises(ValueError):
+        build_stacks(
+            celery_worker_service_stack={
+                "worker_pools": {"default": {"stop_timeout": 300}}
+            }
+        )
+
+
+def test_task_role_can_publish_backlog_metric(stacks):
+    template = assertions.Template.from_stack(stacks.roles_stack)
+    template.has_resource_properties(
+        "AWS::IAM::Policy",
+        {
+            "PolicyDocument": {
+                "Statement": assertions.Match.array_with(
+                    [
+                        assertions.Match.object_like(
+                            {"Action": "cloudwatch:PutMetricData"}
+                        )
+                    ]
+                )
+            }
+        },
+    )
+
+
+def test_unknown_pool_setting_raises():
+    with pytest.raises(ValueError):
+        build_stacks(
+            celery_worker_service_stack={"worker_pools": {"default": {"threads": 4}}}
+        )
@@ -0,0 +1,59 @@
+import aws_cdk.assertions as assertions
+import pytest
+
+from yeastregulatorydbstack.connection_budget import (
+    celery_connection_demands,
+    connection_demand,
+    proxy_pool_settings,
+)
+
+from .conftest import build_stacks
+
+
+def test_connection_demand():
+    assert connection_demand(4) == 4
+    assert connection_demand(4, processes=3, threads=2) == 24
+
+
+def test_celery_connection_demands_use_pool_defaults():
+    assert celery_connection_demands(
+        {"default": {}, "ingest": {"max_capacity": 8, "concurrency": 1}}
+    ) == {"celery-default": 8, "celery-ingest": 8}
+
+
+def test_proxy_pool_settings():
+    settings = proxy_pool_settings(112, {"django": 40, "celery": 40})
+    assert settings == {
+        "max_connections_percent": 90,
+        "max_idle_connections_percent": 45,
+        "available_connections": 100,
+        "required_connections": 80,
+    }
+
+
+def test_budget_exceeded_raises():
+    with pytest.raises(ValueError, match="django: 96"):
+        proxy_pool_settings(112, {"django": 96}, reserved_connections_percent=20)
+
+
+def test_proxy_configured_from_budget():
+    stacks = build_stacks(
+        rds_stack={"connection_demands": {"django": 16}, "borrow_timeout": 10}
+    )
+    template = assertions.Template.from_stack(stacks.rds_stack)
+    template.has_resource_properties(
+        "AWS::RDS::DBProxyTargetGroup",
+        {
+            "ConnectionPoolConfigurationInfo": {
+                "MaxConnectionsPercent": 90,
+                "MaxIdleConnectionsPercent": 45,
+                "ConnectionBorrowTimeout": 10,
+                "SessionPinningFilters": ["EXCLUDE_VARIABLE_SETS"],
+            }
+        },
+    )
+
+
+def test_synth_fails_when_budget_exceeds_instance():
+    with pytest.raises(ValueError, match="database connections"):
+        build_stacks(rds_stack={"connection_demands": {"django": 4 * 8 * 4}})
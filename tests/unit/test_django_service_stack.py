@@ -0,0 +1,265 @@
+import aws_cdk.assertions as assertions
+import pytest
+from aws_cdk import aws_ecs
+
+from yeastregulatorydbstack.DjangoServiceStack import gunicorn_concurrency
+
+from .conftest import build_stacks, container_environment
+
+
+@pytest.fixture(scope="module")
+def template(default_stacks):
+    return assertions.Template.from_stack(default_stacks.django_service_stack)
+
+
+def test_scalable_target_uses_default_capacity(template):
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalableTarget",
+        {
+            "MinCapacity": 1,
+            "MaxCapacity": 4,
+            "ScalableDimension": "ecs:service:DesiredCount",
+        },
+    )
+    template.has_resource_properties("AWS::ECS::Service", {"DesiredCount": 1})
+
+
+def test_target_tracking_policies(template):
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalingPolicy", 3)
+    for metric_type, target in [
+        ("ECSServiceAverageCPUUtilization", 70),
+        ("ECSServiceAverageMemoryUtilization", 75),
+        ("ALBRequestCountPerTarget", 500),
+    ]:
+        template.has_resource_properties(
+            "AWS::ApplicationAutoScaling::ScalingPolicy",
+            {
+                "PolicyType": "TargetTrackingScaling",
+                "TargetTrackingScalingPolicyConfiguration": {
+                    "PredefinedMetricSpecification": {
+                        "PredefinedMetricType": metric_type
+                    },
+                    "TargetValue": target,
+                    "ScaleInCooldown": 300,
+                    "ScaleOutCooldown": 60,
+                },
+            },
+        )
+
+
+def test_scaling_kwargs():
+    stacks = build_stacks(
+        django_service_stack={
+            "min_capacity": 2,
+            "max_capacity": 10,
+            "requests_per_target": None,
+            "scale_in_cooldown": 120,
+        }
+    )
+    template = assertions.Template.from_stack(stacks.django_service_stack)
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalableTarget",
+        {"MinCapacity": 2, "MaxCapacity": 10},
+    )
+    template.has_resource_properties("AWS::ECS::Service", {"DesiredCount": 2})
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalingPolicy", 2)
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalingPolicy",
+        {
+            "TargetTrackingScalingPolicyConfiguration": assertions.Match.object_like(
+                {"ScaleInCooldown": 120}
+            )
+        },
+    )
+
+
+def test_invalid_capacity_raises():
+    with pytest.raises(ValueError):
+        build_stacks(django_service_stack={"min_capacity": 5, "max_capacity": 2})
+
+
+@pytest.mark.parametrize(
+    "cpu, memory_limit_mib, web_concurrency",
+    [(256, 512, 1), (512, 1024, 2), (1024, 2048, 3), (2048, 4096, 5), (4096, 1024, 4)],
+)
+def test_gunicorn_concurrency(cpu, memory_limit_mib, web_concurrency):
+    assert gunicorn_concurrency(cpu, memory_limit_mib) == {
+        "web_concurrency": web_concurrency,
+        "threads": 2,
+    }
+
+
+def test_task_size_and_graviton():
+    stacks = build_stacks(
+        django_service_stack={
+            "cpu": 2048,
+            "memory_limit_mib": 4096,
+            "ephemeral_storage_gib": 50,
+            "cpu_architecture": aws_ecs.CpuArchitecture.ARM64,
+        }
+    )
+    template = assertions.Template.from_stack(stacks.django_service_stack)
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "Cpu": "2048",
+            "Memory": "4096",
+            "EphemeralStorage": {"SizeInGiB": 50},
+            "RuntimePlatform": {
+                "CpuArchitecture": "ARM64",
+                "OperatingSystemFamily": "LINUX",
+            },
+        },
+    )
+    environment = container_environment(stacks.django_service_stack)
+    assert environment["WEB_CONCURRENCY"] == "5"
+    assert environment["GUNICORN_CMD_ARGS"] == "--threads 2 --keep-alive 65"
+
+
+def test_explicit_concurrency_wins():
+    stacks = build_stacks(django_service_stack={"web_concurrency": 2, "threads": 4})
+    environment = container_environment(stacks.django_service_stack)
+    assert environment["WEB_CONCURRENCY"] == "2"
+    assert environment["GUNICORN_CMD_ARGS"] == "--threads 4 --keep-alive 65"
+
+
+def test_container_health_check_and_grace_period():
+    stacks = build_stacks(
+        django_service_stack={
+            "container_health_check": True,
+            "health_check_host": "yeastregulatorydb.org",
+        }
+    )
+    template = assertions.Template.from_stack(stacks.django_service_stack)
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "ContainerDefinitions": [
+                assertions.Match.object_like(
+                    {
+                        "Name": "django",
+                        "HealthCheck": {
+                            "Command": [
+                                "CMD-SHELL",
+                                'python -c "import urllib.request; '
+                                "urllib.request.urlopen(urllib.request.Request("
+                                "'http://localhost:5000/', "
+                                "headers={'Host': 'yeastregulatorydb.org'}), "
+                                'timeout=5)" || exit 1',
+                            ],
+                            "Interval": 30,
+                            "Timeout": 5,
+                            "Retries": 3,
+                            "StartPeriod": 60,
+                        },
+                    }
+                )
+            ]
+        },
+    )
+    template.has_resource_properties(
+        "AWS::ECS::Service", {"HealthCheckGracePeriodSeconds": 60}
+    )
+
+
+def test_no_container_health_check_by_default(template):
+    (task_definition,) = template.find_resources("AWS::ECS::TaskDefinition").values()
+    (container,) = task_definition["Properties"]["ContainerDefinitions"]
+    assert "HealthCheck" not in container
+
+
+def test_no_tracing_by_default(default_stacks, template):
+    assert default_stacks.django_service_stack.otel_collector is None
+    (task_definition,) = template.find_resources("AWS::ECS::TaskDefinition").values()
+    assert len(task_definition["Properties"]["ContainerDefinitions"]) == 1
+
+
+def test_container_insights_and_tracing():
+    stacks = build_stacks(
+        django_service_stack={
+            "container_insights": True,
+            "tracing": True,
+            "tracing_sample_rate": 0.1,
+        }
+    )
+    template = assertions.Template.from_stack(stacks.django_service_stack)
+    template.has_resource_properties(
+        "AWS::ECS::Cluster",
+        {"ClusterSettings": [{"Name": "containerInsights", "Value": "enabled"}]},
+    )
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "ContainerDefinitions": assertions.Match.array_with(
+                [
+                    assertions.Match.object_like(
+                        {
+                            "Name": "django",
+                            "DependsOn": [
+                                {
+                                    "Condition": "START",
+                                    "ContainerName": "aws-otel-collector",
+                                }
+                            ],
+                        }
+                    ),
+                    assertions.Match.object_like(
+                        {"Name": "aws-otel-collector", "Essential": False}
+                    ),
+                ]
+            )
+        },
+    )
+    environment = container_environment(stacks.django_service_stack)
+    assert environment["OTEL_EXPORTER_OTLP_ENDPOINT"] == "http://localhost:4317"
+    assert environment["OTEL_TRACES_SAMPLER_ARG"] == "0.1"
+    # the celery workers have no collector
+    assert "OTEL_SERVICE_NAME" not in container_environment(
+        stacks.celery_worker_service_stack, "celeryworker"
+    )
+    assertions.Template.from_stack(stacks.roles_stack).has_resource_properties(
+        "AWS::IAM::Policy",
+        {
+            "PolicyDocument": {
+                "Statement": assertions.Match.array_with(
+                    [
+                        assertions.Match.object_like(
+                            {
+                                "Action": assertions.Match.array_with(
+                                    ["xray:PutTraceSegments"]
+                                )
+                            }
+                        )
+                    ]
+                )
+            }
+        },
+    )
+
+
+def test_non_blocking_log_driver():
+    stacks = build_stacks(
+        django_service_stack={
+            "log_mode": aws_ecs.AwsLogDriverMode.NON_BLOCKING,
+            "log_max_buffer_size_mib": 8,
+        }
+    )
+    template = assertions.Template.from_stack(stacks.django_service_stack)
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "ContainerDefinitions": [
+                assertions.Match.object_like(
+                    {
+                        "Name": "django",
+                        "LogConfiguration": {
+                            "LogDriver": "awslogs",
+                            "Options": assertions.Match.object_like(
+                                {"mode": "non-blocking", "max-buffer-size": "8388608b"}
+                            ),
+                        },
+                    }
+                )
+            ]
+        },
+    )
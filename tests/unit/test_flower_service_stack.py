@@ -0,0 +1,75 @@
+import aws_cdk.assertions as assertions
+import pytest
+
+
+@pytest.fixture(scope="module")
+def template(default_stacks):
+    return assertions.Template.from_stack(default_stacks.flower_service_stack)
+
+
+def test_flower_is_sized_separately(template):
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "Cpu": "256",
+            "Memory": "512",
+            "ContainerDefinitions": [
+                assertions.Match.object_like(
+                    {
+                        "Name": "flower",
+                        "Command": ["/start-flower"],
+                        "PortMappings": [{"ContainerPort": 5555, "Protocol": "tcp"}],
+                    }
+                )
+            ],
+        },
+    )
+
+
+def test_flower_registered_to_flower_target_group(template):
+    template.has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "LoadBalancers": [
+                assertions.Match.object_like(
+                    {
+                        "ContainerName": "flower",
+                        "ContainerPort": 5555,
+                        "TargetGroupArn": assertions.Match.any_value(),
+                    }
+                )
+            ]
+        },
+    )
+
+
+def test_flower_reads_the_same_broker(template):
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "ContainerDefinitions": [
+                assertions.Match.object_like(
+                    {
+                        "Environment": assertions.Match.array_with(
+                            [assertions.Match.object_like({"Name": "REDIS_HOST"})]
+                        )
+                    }
+                )
+            ]
+        },
+    )
+
+
+def test_flower_health_check_avoids_basic_auth(default_stacks):
+    template = assertions.Template.from_stack(default_stacks.targetgroup_stack)
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup",
+        {"Port": 5555, "HealthCheckPath": "/healthcheck"},
+    )
+
+
+def test_alb_can_reach_flower(default_stacks):
+    template = assertions.Template.from_stack(default_stacks.securitygroup_stack)
+    template.has_resource_properties(
+        "AWS::EC2::SecurityGroupIngress", {"FromPort": 5555, "ToPort": 5555}
+    )
@@ -0,0 +1,90 @@
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+import pytest
+
+from yeastregulatorydbstack.guardrails import PerformanceGuardrails, suppress
+
+from .conftest import build_stacks
+
+
+def guarded_stacks(errors=False, **overrides):
+    stacks = build_stacks(**overrides)
+    core.Aspects.of(stacks.app).add(PerformanceGuardrails(errors=errors))
+    return stacks
+
+
+def rule(name):
+    return assertions.Match.string_like_regexp(f"\\[{name}\\]")
+
+
+def test_default_stacks_warnings():
+    stacks = guarded_stacks()
+    annotations = assertions.Annotations.from_stack
+    annotations(stacks.django_service_stack).has_warning(
+        "/DjangoServiceStack/DjangoTaskDefinition/Resource", rule("django-debug")
+    )
+    annotations(stacks.django_service_stack).has_warning(
+        "/DjangoServiceStack/DjangoService/Service", rule("single-subnet")
+    )
+    annotations(stacks.rds_stack).has_warning("*", rule("burstable-instance"))
+    annotations(stacks.redis_stack).has_warning("*", rule("burstable-instance"))
+    annotations(stacks.targetgroup_stack).has_warning("*", rule("root-health-check"))
+    annotations(stacks.flower_service_stack).has_warning(
+        "*", rule("single-task-service")
+    )
+    # django scales, so one task is fine
+    annotations(stacks.django_service_stack).has_no_warning(
+        "*", rule("single-task-service")
+    )
+    annotations(stacks.django_service_stack).has_no_error(
+        "*", assertions.Match.any_value()
+    )
+
+
+def test_errors():
+    stacks = guarded_stacks(errors=True)
+    assertions.Annotations.from_stack(stacks.rds_stack).has_error(
+        "*", rule("burstable-instance")
+    )
+
+
+def test_compliant_settings():
+    stacks = guarded_stacks(
+        django_service_stack={"debug": False, "placement": "private-spread"},
+        targetgroup_stack={"health_check_path": "/healthz/"},
+        rds_stack={
+            "instance_class": core.aws_ec2.InstanceClass.MEMORY6_GRAVITON,
+            "instance_size": core.aws_ec2.InstanceSize.LARGE,
+        },
+    )
+    for stack in [
+        stacks.django_service_stack,
+        stacks.targetgroup_stack,
+        stacks.rds_stack,
+    ]:
+        assertions.Annotations.from_stack(stack).has_no_warning(
+            "*", assertions.Match.string_like_regexp("Suppress with guardrails")
+        )
+
+
+def test_suppress():
+    stacks = build_stacks()
+    suppress(stacks.flower_service_stack, "single-task-service", "admin dashboard")
+    suppress(stacks.rds_stack.db_instance, "burstable-instance", "dev database")
+    core.Aspects.of(stacks.app).add(PerformanceGuardrails())
+    assertions.Annotations.from_stack(stacks.flower_service_stack).has_no_warning(
+        "*", rule("single-task-service")
+    )
+    assertions.Annotations.from_stack(stacks.rds_stack).has_no_warning(
+        "*", rule("burstable-instance")
+    )
+    # other rules still apply
+    assertions.Annotations.from_stack(stacks.flower_service_stack).has_warning(
+        "*", rule("single-subnet")
+    )
+
+
+def test_suppress_unknown_rule():
+    stacks = build_stacks()
+    with pytest.raises(ValueError):
+        suppress(stacks.rds_stack, "slow-queries", "unknown")
@@ -0,0 +1,51 @@
+import aws_cdk.assertions as assertions
+import pytest
+
+from .conftest import build_stacks
+
+
+def test_no_metric_filters_by_default(default_stacks):
+    template = assertions.Template.from_stack(default_stacks.log_group_stack)
+    template.resource_count_is("AWS::Logs::MetricFilter", 0)
+    with pytest.raises(ValueError):
+        default_stacks.log_group_stack.request_duration_metric("home")
+
+
+def test_access_log_metric_filters():
+    stacks = build_stacks(log_group_stack={"access_log_metrics": True})
+    template = assertions.Template.from_stack(stacks.log_group_stack)
+    template.has_resource_properties(
+        "AWS::Logs::MetricFilter",
+        {
+            "FilterPattern": assertions.Match.string_like_regexp("duration_ms >= 0"),
+            "MetricTransformations": [
+                {
+                    "MetricNamespace": "Django",
+                    "MetricName": "RequestDuration",
+                    "MetricValue": "$.duration_ms",
+                    "Dimensions": [{"Key": "View", "Value": "$.view"}],
+                    "Unit": "Milliseconds",
+                }
+            ],
+        },
+    )
+    template.has_resource_properties(
+        "AWS::Logs::MetricFilter",
+        {
+            "MetricTransformations": [
+                assertions.Match.object_like(
+                    {
+                        "MetricName": "RequestCount",
+                        "MetricValue": "1",
+                        "Dimensions": [
+                            {"Key": "View", "Value": "$.view"},
+                            {"Key": "Status", "Value": "$.status"},
+                        ],
+                    }
+                )
+            ],
+        },
+    )
+    metric = stacks.log_group_stack.request_duration_metric("home", "p95")
+    assert metric.statistic == "p95"
+    assert metric.dimensions == {"View": "home"}
@@ -0,0 +1,82 @@
+import aws_cdk.assertions as assertions
+import pytest
+
+from yeastregulatorydbstack.RedisStack import redis_node_ids
+
+from .conftest import build_stacks
+
+
+@pytest.fixture(scope="module")
+def template(default_stacks):
+    return assertions.Template.from_stack(default_stacks.observability_stack)
+
+
+def test_dashboard_and_alarms(default_stacks, template):
+    template.resource_count_is("AWS::CloudWatch::Dashboard", 1)
+    # 2 load balancer, 3 services x 2, 2 database, 1 proxy and 2 for the
+    # shared Redis node, which is only monitored once
+    assert len(default_stacks.observability_stack.alarms) == 13
+    template.resource_count_is("AWS::CloudWatch::Alarm", 13)
+    template.all_resources_properties(
+        "AWS::CloudWatch::Alarm",
+        {"AlarmActions": [{"Ref": assertions.Match.string_like_regexp("AlarmTopic")}]},
+    )
+
+
+def test_latency_percentile_alarm(template):
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "Namespace": "AWS/ApplicationELB",
+            "MetricName": "TargetResponseTime",
+            "ExtendedStatistic": "p99",
+            "Threshold": 2,
+        },
+    )
+
+
+def test_error_rate_alarm(template):
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "Metrics": assertions.Match.array_with(
+                [
+                    assertions.Match.object_like(
+                        {
+                            "Expression": "100 * (FILL(target5xx, 0) + FILL(elb5xx, 0)) / requests"
+                        }
+                    )
+                ]
+            ),
+            "Threshold": 1,
+        },
+    )
+
+
+def test_proxy_borrow_latency_in_microseconds(template):
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "MetricName": "DatabaseConnectionsBorrowLatency",
+            "Threshold": 100000,
+        },
+    )
+
+
+def test_connections_alarm_and_separate_broker():
+    stacks = build_stacks(
+        redis_stack={"separate_broker": True},
+        observability_stack={"db_connections_threshold": 90},
+    )
+    alarms = stacks.observability_stack.alarms
+    assert "DatabaseConnectionsAlarm" in alarms
+    assert {"RedisCache1CpuAlarm", "RedisBroker1CpuAlarm"} <= set(alarms)
+
+
+def test_redis_node_ids():
+    stacks = build_stacks(
+        redis_stack={"replication_group": True, "num_replicas": 2, "num_shards": 2}
+    )
+    node_ids = redis_node_ids(stacks.redis_stack.redis_instance)
+    assert len(node_ids) == 6
+    assert node_ids[-1].endswith("-0002-003")
@@ -0,0 +1,81 @@
+import aws_cdk.assertions as assertions
+import pytest
+
+from yeastregulatorydbstack.placement import SUBNET_COUNT_METADATA
+
+from .conftest import build_stacks
+
+
+def network_configuration(stack):
+    template = assertions.Template.from_stack(stack)
+    (service,) = template.find_resources("AWS::ECS::Service").values()
+    return (
+        service["Properties"]["NetworkConfiguration"]["AwsvpcConfiguration"],
+        service["Properties"].get("AvailabilityZoneRebalancing"),
+    )
+
+
+def subnet_count(service):
+    (entry,) = [
+        entry for entry in service.node.metadata if entry.type == SUBNET_COUNT_METADATA
+    ]
+    return entry.data
+
+
+def test_public_subnet_placement_is_default(default_stacks):
+    configuration, rebalancing = network_configuration(
+        default_stacks.django_service_stack
+    )
+    assert configuration["AssignPublicIp"] == "ENABLED"
+    assert len(configuration["Subnets"]) == 1
+    assert rebalancing is None
+    assert subnet_count(default_stacks.django_service_stack.service) == 1
+
+
+def test_private_spread_placement():
+    stacks = build_stacks(
+        django_service_stack={"placement": "private-spread"},
+        flower_service_stack={"placement": "private-spread"},
+    )
+    for stack in [stacks.django_service_stack, stacks.flower_service_stack]:
+        configuration, rebalancing = network_configuration(stack)
+        assert configuration["AssignPublicIp"] == "DISABLED"
+        assert len(configuration["Subnets"]) == len(
+            stacks.vpc_stack.vpc.private_subnets
+        )
+        assert rebalancing == "ENABLED"
+    # read by the guardrails
+    assert subnet_count(stacks.django_service_stack.service) == len(
+        stacks.vpc_stack.vpc.private_subnets
+    )
+
+
+def test_writer_az_placement():
+    stacks = build_stacks(
+        rds_stack={"availability_zone": "dummy1b"},
+        django_service_stack={
+            "placement": "writer-az",
+            "db_writer_availability_zone": "dummy1b",
+        },
+    )
+    assert stacks.rds_stack.db_writer_availability_zone == "dummy1b"
+    assertions.Template.from_stack(stacks.rds_stack).has_resource_properties(
+        "AWS::RDS::DBInstance", {"AvailabilityZone": "dummy1b"}
+    )
+    configuration, _ = network_configuration(stacks.django_service_stack)
+    # the second private subnet is in the second AZ
+    assert len(configuration["Subnets"]) == 1
+    assert "PrivateSubnet2" in str(configuration["Subnets"])
+
+
+@pytest.mark.parametrize(
+    "django_kwargs",
+    [
+        {"placement": "everywhere"},
+        {"placement": "writer-az"},
+        {"placement": "writer-az", "db_writer_availability_zone": "us-west-1a"},
+    ],
+)
+def test_invalid_placement(django_kwargs):
+    with pytest.raises(ValueError):
+        build_stacks(django_service_stack=django_kwargs)
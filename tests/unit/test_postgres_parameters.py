@@ -0,0 +1,57 @@
+import pytest
+
+from yeastregulatorydbstack.postgres_parameters import (
+    instance_resources,
+    postgres_parameters,
+)
+
+
+def test_instance_resources():
+    assert instance_resources("t3.micro") == (2, 1)
+    assert instance_resources("db.r6g.xlarge") == (4, 32)
+    assert instance_resources("m6g.2xlarge") == (8, 32)
+    with pytest.raises(ValueError):
+        instance_resources("x2g.large")
+
+
+def test_oltp_profile_on_micro():
+    parameters = postgres_parameters("t3.micro")
+    assert parameters == {
+        # 1 GiB / 9531392 bytes, as RDS would default to
+        "max_connections": "112",
+        # 256 MiB in 8kB pages
+        "shared_buffers": "32768",
+        "effective_cache_size": "98304",
+        "work_mem": "4096",
+        "maintenance_work_mem": "65536",
+        "random_page_cost": "1.1",
+        "max_parallel_workers_per_gather": "1",
+    }
+
+
+def test_analytics_profile_trades_connections_for_memory():
+    oltp = postgres_parameters("r6g.xlarge", "oltp")
+    analytics = postgres_parameters("r6g.xlarge", "analytics")
+    assert int(analytics["max_connections"]) < int(oltp["max_connections"])
+    assert int(analytics["work_mem"]) > int(oltp["work_mem"])
+    # maintenance_work_mem is capped at 2 GiB
+    assert analytics["maintenance_work_mem"] == str(2 * 1024 * 1024)
+
+
+def test_overrides_and_explicit_resources():
+    parameters = postgres_parameters(
+        profile="analytics",
+        vcpus=16,
+        memory_gib=128,
+        overrides={"max_connections": 100, "random_page_cost": 1.5},
+    )
+    assert parameters["max_connections"] == "100"
+    assert parameters["random_page_cost"] == "1.5"
+    assert parameters["max_parallel_workers_per_gather"] == "8"
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        postgres_parameters("t3.micro", profile="olap")
+    with pytest.raises(ValueError):
+        postgres_parameters(memory_gib=4)
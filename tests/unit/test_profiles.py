@@ -0,0 +1,150 @@
+import dataclasses
+
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+import pytest
+from aws_cdk import aws_ec2
+
+from yeastregulatorydbstack.profiles import (
+    DEV,
+    PROD,
+    PROFILES,
+    check_fargate_size,
+    context_value,
+    profile_from_context,
+)
+
+from .conftest import build_stacks
+
+
+def test_profiles():
+    assert set(PROFILES) == {"dev", "staging", "prod", "load-test"}
+    assert PROFILES["load-test"].django_kwargs() == PROD.django_kwargs()
+    assert PROFILES["load-test"].rds_kwargs() == PROD.rds_kwargs()
+
+
+@pytest.mark.parametrize("cpu,memory", [(256, 512), (1024, 8192), (8192, 20480)])
+def test_valid_fargate_sizes(cpu, memory):
+    check_fargate_size(cpu, memory, "test")
+
+
+@pytest.mark.parametrize("cpu,memory", [(256, 4096), (1024, 1024), (300, 512)])
+def test_invalid_fargate_sizes(cpu, memory):
+    with pytest.raises(ValueError):
+        check_fargate_size(cpu, memory, "test")
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"django_memory_limit_mib": 1024},
+        {"django_min_capacity": 5},
+        {"django_on_demand_base": 2},
+        {"db_max_allocated_storage": 10},
+        {"cache_multi_az": True},
+        {"db_num_read_replicas": 1},
+        {"celery_pool_overrides": {"default": {"replicas": 2}}},
+    ],
+)
+def test_inconsistent_profiles(changes):
+    with pytest.raises(ValueError):
+        dataclasses.replace(DEV, **changes)
+
+
+def test_celery_worker_pools():
+    pools = PROD.celery_worker_pools(
+        {
+            "default": {"queues": ["celery"]},
+            "ingest": {"queues": ["ingest"]},
+            "rankresponse": {"queues": ["rankresponse"]},
+        }
+    )
+    assert pools["default"] == {
+        "queues": ["celery"],
+        "min_capacity": 2,
+        "max_capacity": 6,
+    }
+    with pytest.raises(ValueError):
+        # the profile overrides the rankresponse pool
+        PROD.celery_worker_pools({"default": {"queues": ["celery"]}})
+    with pytest.raises(ValueError):
+        DEV.celery_worker_pools({"default": {"cpu": 512, "memory_limit_mib": 512}})
+
+
+def test_profile_from_context():
+    assert profile_from_context(core.App().node) == DEV
+    app = core.App(
+        context={
+            "profile": "load-test",
+            "capacity_profiles": {
+                "load-test": {
+                    "django_max_capacity": 20,
+                    "db_instance_class": "MEMORY7_GRAVITON",
+                }
+            },
+        }
+    )
+    profile = profile_from_context(app.node)
+    assert profile.name == "load-test"
+    assert profile.django_max_capacity == 20
+    assert profile.db_instance_class == aws_ec2.InstanceClass.MEMORY7_GRAVITON
+    assert profile.cache_node_type == PROD.cache_node_type
+
+
+def test_load_test_names_apart_from_prod():
+    assert PROD.prefixed("VPCStack") == "VPCStack"
+    assert PROFILES["load-test"].prefixed("VPCStack") == "LoadTest-VPCStack"
+
+
+def test_context_value():
+    app = core.App(
+        context={
+            "django_image_uri": "image:latest",
+            "deployments": {"load-test": {"account": "111111111111"}},
+        }
+    )
+    load_test = PROFILES["load-test"]
+    assert context_value(app.node, load_test, "account") == "111111111111"
+    assert context_value(app.node, PROD, "account") is None
+    assert context_value(app.node, PROD, "region", "us-east-2") == "us-east-2"
+    assert context_value(app.node, load_test, "django_image_uri") == "image:latest"
+
+
+@pytest.mark.parametrize(
+    "context",
+    [
+        {"profile": "huge"},
+        {"capacity_profiles": {"dev": {"django_replicas": 2}}},
+        {"capacity_profiles": {"dev": {"db_instance_size": "ENORMOUS"}}},
+        {"capacity_profiles": {"dev": {"django_min_capacity": 0}}},
+    ],
+)
+def test_invalid_context(context):
+    with pytest.raises(ValueError):
+        profile_from_context(core.App(context=context).node)
+
+
+def test_prod_profile_sizes_the_stacks():
+    stacks = build_stacks(
+        vpc_stack=PROD.vpc_kwargs(),
+        rds_stack=PROD.rds_kwargs(),
+        redis_stack=PROD.redis_kwargs(),
+    )
+    assertions.Template.from_stack(stacks.vpc_stack).resource_count_is(
+        "AWS::EC2::NatGateway", 3
+    )
+    assertions.Template.from_stack(stacks.rds_stack).has_resource_properties(
+        "AWS::RDS::DBInstance",
+        {"DBInstanceClass": "db.r6g.large", "StorageType": "gp3"},
+    )
+    assertions.Template.from_stack(stacks.redis_stack).has_resource_properties(
+        "AWS::ElastiCache::ReplicationGroup",
+        {"CacheNodeType": "cache.m6g.large", "MultiAZEnabled": True},
+    )
+
+
+def test_guardrails_fail_production_sized_profiles():
+    assert not DEV.guardrail_errors and DEV.django_kwargs()["debug"]
+    for name in ["prod", "load-test"]:
+        assert PROFILES[name].guardrail_errors
+        assert not PROFILES[name].django_kwargs()["debug"]
@@ -0,0 +1,182 @@
+import aws_cdk.assertions as assertions
+from aws_cdk import aws_ec2, aws_rds
+import pytest
+
+from .conftest import build_stacks, container_environment
+
+
+def test_reads_use_the_proxy_without_replicas(default_stacks):
+    template = assertions.Template.from_stack(default_stacks.rds_stack)
+    template.resource_count_is("AWS::RDS::DBInstance", 1)
+    environment = container_environment(default_stacks.django_service_stack)
+    assert environment["POSTGRES_READ_HOST"] == environment["POSTGRES_HOST"]
+
+
+@pytest.fixture(scope="module")
+def replica_stacks():
+    return build_stacks(rds_stack={"num_read_replicas": 2})
+
+
+def test_read_replicas(replica_stacks):
+    template = assertions.Template.from_stack(replica_stacks.rds_stack)
+    template.resource_count_is("AWS::RDS::DBInstance", 3)
+    template.has_resource_properties(
+        "AWS::RDS::DBInstance",
+        {"SourceDBInstanceIdentifier": assertions.Match.any_value()},
+    )
+    assert len(replica_stacks.rds_stack.db_read_hosts) == 2
+
+
+def test_read_host_injected(replica_stacks):
+    environment = container_environment(replica_stacks.django_service_stack)
+    assert "MyDBReadReplica1" in str(environment["POSTGRES_READ_HOST"])
+    assert "MyDBReadReplica2" in str(environment["POSTGRES_READ_HOSTS"])
+    assert environment["POSTGRES_READ_HOST"] != environment["POSTGRES_HOST"]
+
+
+def test_parameter_group_derived_from_instance_class(default_stacks):
+    template = assertions.Template.from_stack(default_stacks.rds_stack)
+    template.has_resource_properties(
+        "AWS::RDS::DBParameterGroup",
+        {
+            "Parameters": assertions.Match.object_like(
+                {"max_connections": "112", "shared_buffers": "32768"}
+            )
+        },
+    )
+
+
+def test_parameter_profile_and_overrides():
+    stacks = build_stacks(
+        rds_stack={
+            "parameter_profile": "analytics",
+            "max_connections": "50",
+            "parameter_overrides": {"random_page_cost": "1.2"},
+        }
+    )
+    template = assertions.Template.from_stack(stacks.rds_stack)
+    template.has_resource_properties(
+        "AWS::RDS::DBParameterGroup",
+        {
+            "Parameters": assertions.Match.object_like(
+                {"max_connections": "50", "random_page_cost": "1.2"}
+            )
+        },
+    )
+
+
+def test_default_storage(default_stacks):
+    template = assertions.Template.from_stack(default_stacks.rds_stack)
+    template.has_resource_properties(
+        "AWS::RDS::DBInstance",
+        {
+            "DBInstanceClass": "db.t3.micro",
+            "AllocatedStorage": "20",
+            "StorageType": "gp2",
+            "EnablePerformanceInsights": False,
+            "MonitoringInterval": assertions.Match.absent(),
+        },
+    )
+
+
+def test_performance_options():
+    stacks = build_stacks(
+        rds_stack={
+            "instance_class": aws_ec2.InstanceClass.MEMORY6_GRAVITON,
+            "instance_size": aws_ec2.InstanceSize.XLARGE,
+            "allocated_storage": 500,
+            "storage_type": aws_rds.StorageType.GP3,
+            "iops": 12000,
+            "storage_throughput": 500,
+            "max_allocated_storage": 1000,
+            "enable_performance_insights": True,
+            "performance_insights_retention": aws_rds.PerformanceInsightRetention.MONTHS_1,
+            "monitoring_interval": 15,
+        }
+    )
+    template = assertions.Template.from_stack(stacks.rds_stack)
+    template.has_resource_properties(
+        "AWS::RDS::DBInstance",
+        {
+            "DBInstanceClass": "db.r6g.xlarge",
+            "AllocatedStorage": "500",
+            "StorageType": "gp3",
+            "Iops": 12000,
+            "StorageThroughput": 500,
+            "MaxAllocatedStorage": 1000,
+            "EnablePerformanceInsights": True,
+            "PerformanceInsightsRetentionPeriod": 31,
+            "MonitoringInterval": 15,
+        },
+    )
+    # the parameter profile follows the instance class
+    template.has_resource_properties(
+        "AWS::RDS::DBParameterGroup",
+        {"Parameters": assertions.Match.object_like({"max_connections": "3604"})},
+    )
+
+
+@pytest.mark.parametrize(
+    "rds_kwargs",
+    [
+        {"iops": 3000},
+        {"storage_throughput": 250},
+        {"storage_type": aws_rds.StorageType.GP3, "iops": 3000},
+        {"storage_type": aws_rds.StorageType.GP3, "storage_throughput": 250},
+        {"max_allocated_storage": 10},
+        {"monitoring_interval": 20},
+    ],
+)
+def test_invalid_performance_options_raise(rds_kwargs):
+    with pytest.raises(ValueError):
+        build_stacks(rds_stack=rds_kwargs)
+
+
+@pytest.fixture(scope="module")
+def aurora_stacks():
+    return build_stacks(
+        rds_stack={
+            "engine_mode": "aurora-serverless-v2",
+            "serverless_v2_min_capacity": 1,
+            "serverless_v2_max_capacity": 16,
+            "num_read_replicas": 1,
+        }
+    )
+
+
+def test_aurora_serverless_v2_cluster(aurora_stacks):
+    template = assertions.Template.from_stack(aurora_stacks.rds_stack)
+    template.has_resource_properties(
+        "AWS::RDS::DBCluster",
+        {
+            "Engine": "aurora-postgresql",
+            "ServerlessV2ScalingConfiguration": {"MinCapacity": 1, "MaxCapacity": 16},
+        },
+    )
+    template.resource_count_is("AWS::RDS::DBInstance", 2)
+    template.has_resource_properties(
+        "AWS::RDS::DBInstance", {"DBInstanceClass": "db.serverless"}
+    )
+    # Aurora manages the buffer cache as the capacity changes
+    (parameter_group,) = template.find_resources(
+        "AWS::RDS::DBClusterParameterGroup"
+    ).values()
+    assert "shared_buffers" not in parameter_group["Properties"]["Parameters"]
+    # 16 ACUs are 32 GiB
+    assert parameter_group["Properties"]["Parameters"]["max_connections"] == "3604"
+
+
+def test_aurora_read_only_proxy_endpoint(aurora_stacks):
+    template = assertions.Template.from_stack(aurora_stacks.rds_stack)
+    template.has_resource_properties(
+        "AWS::RDS::DBProxyEndpoint", {"TargetRole": "READ_ONLY"}
+    )
+    environment = container_environment(aurora_stacks.django_service_stack)
+    assert "MyDBProxyReadOnlyEndpoint" in str(environment["POSTGRES_READ_HOST"])
+    assert "MyDBProxy" in str(environment["POSTGRES_HOST"])
+    assert aurora_stacks.rds_stack.db_secret is not None
+
+
+def test_unknown_engine_mode_raises():
+    with pytest.raises(ValueError):
+        build_stacks(rds_stack={"engine_mode": "aurora-serverless-v1"})
@@ -0,0 +1,173 @@
+import aws_cdk.assertions as assertions
+import pytest
+
+from .conftest import build_stacks, container_environment
+
+
+def test_single_node_cache_cluster_by_default(default_stacks):
+    template = assertions.Template.from_stack(default_stacks.redis_stack)
+    template.resource_count_is("AWS::ElastiCache::CacheCluster", 1)
+    template.resource_count_is("AWS::ElastiCache::ReplicationGroup", 0)
+    template.has_resource_properties(
+        "AWS::ElastiCache::CacheCluster",
+        {"CacheNodeType": "cache.t2.micro", "NumCacheNodes": 1},
+    )
+
+
+def test_replication_group_with_replicas():
+    stacks = build_stacks(
+        redis_stack={
+            "replication_group": True,
+            "cache_node_type": "cache.r7g.large",
+            "num_replicas": 2,
+            "multi_az": True,
+        }
+    )
+    template = assertions.Template.from_stack(stacks.redis_stack)
+    template.resource_count_is("AWS::ElastiCache::CacheCluster", 0)
+    template.has_resource_properties(
+        "AWS::ElastiCache::ReplicationGroup",
+        {
+            "CacheNodeType": "cache.r7g.large",
+            "ClusterMode": "disabled",
+            "NumCacheClusters": 3,
+            "AutomaticFailoverEnabled": True,
+            "MultiAZEnabled": True,
+        },
+    )
+
+    # the reader endpoint is injected into the django service
+    service_template = assertions.Template.from_stack(stacks.django_service_stack)
+    service_template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "ContainerDefinitions": [
+                assertions.Match.object_like(
+                    {
+                        "Environment": assertions.Match.array_with(
+                            [
+                                {
+                                    "Name": "REDIS_READ_HOST",
+                                    "Value": {
+                                        "Fn::ImportValue": assertions.Match.string_like_regexp(
+                                            "ReaderEndPoint"
+                                        )
+                                    },
+                                }
+                            ]
+                        )
+                    }
+                )
+            ]
+        },
+    )
+
+
+def test_cluster_mode_replication_group():
+    stacks = build_stacks(
+        redis_stack={"replication_group": True, "num_shards": 3, "num_replicas": 1}
+    )
+    template = assertions.Template.from_stack(stacks.redis_stack)
+    template.has_resource_properties(
+        "AWS::ElastiCache::ReplicationGroup",
+        {
+            "ClusterMode": "enabled",
+            "NumNodeGroups": 3,
+            "ReplicasPerNodeGroup": 1,
+        },
+    )
+    template.has_resource_properties(
+        "AWS::ElastiCache::ParameterGroup",
+        {
+            "CacheParameterGroupFamily": "redis7",
+            "Properties": assertions.Match.object_like({"cluster-enabled": "yes"}),
+        },
+    )
+
+
+def test_multi_az_without_replicas_raises():
+    with pytest.raises(ValueError):
+        build_stacks(
+            redis_stack={"replication_group": True, "num_replicas": 0, "multi_az": True}
+        )
+
+
+def test_shared_instance_keeps_default_parameters(default_stacks):
+    template = assertions.Template.from_stack(default_stacks.redis_stack)
+    template.resource_count_is("AWS::ElastiCache::ParameterGroup", 0)
+    template.has_resource_properties(
+        "AWS::ElastiCache::CacheCluster",
+        {
+            "EngineVersion": assertions.Match.absent(),
+            "CacheParameterGroupName": assertions.Match.absent(),
+        },
+    )
+    assert (
+        default_stacks.redis_stack.broker_instance
+        is default_stacks.redis_stack.redis_instance
+    )
+
+
+def test_shared_instance_parameters_only_evict_keys_with_ttl():
+    stacks = build_stacks(redis_stack={"cache_parameters": {"timeout": "120"}})
+    template = assertions.Template.from_stack(stacks.redis_stack)
+    template.has_resource_properties(
+        "AWS::ElastiCache::ParameterGroup",
+        {
+            "CacheParameterGroupFamily": "redis7",
+            "Properties": {
+                "maxmemory-policy": "volatile-lru",
+                "timeout": "120",
+                "tcp-keepalive": "60",
+            },
+        },
+    )
+    template.has_resource_properties(
+        "AWS::ElastiCache::CacheCluster", {"EngineVersion": "7.1"}
+    )
+
+
+def test_separate_broker():
+    stacks = build_stacks(
+        redis_stack={
+            "separate_broker": True,
+            "cache_parameters": {"timeout": "120"},
+            "broker_options": {"cache_node_type": "cache.m7g.large"},
+        }
+    )
+    template = assertions.Template.from_stack(stacks.redis_stack)
+    template.resource_count_is("AWS::ElastiCache::CacheCluster", 2)
+    template.has_resource_properties(
+        "AWS::ElastiCache::CacheCluster", {"CacheNodeType": "cache.m7g.large"}
+    )
+    template.has_resource_properties(
+        "AWS::ElastiCache::ParameterGroup",
+        {
+            "Properties": {
+                "maxmemory-policy": "allkeys-lru",
+                "timeout": "120",
+                "tcp-keepalive": "60",
+            }
+        },
+    )
+    template.has_resource_properties(
+        "AWS::ElastiCache::ParameterGroup",
+        {
+            "Properties": {
+                "maxmemory-policy": "noeviction",
+                "timeout": "0",
+                "tcp-keepalive": "60",
+            }
+        },
+    )
+
+    variables = container_environment(stacks.django_service_stack)
+    assert "MyElastiCacheRedisBroker" in str(variables["CELERY_BROKER_URL"])
+    assert "MyElastiCacheRedisBroker" not in str(variables["CACHE_URL"])
+
+
+def test_broker_cluster_mode_raises():
+    with pytest.raises(ValueError):
+        build_stacks(
+            redis_stack={"separate_broker": True, "broker_options": {"num_shards": 2}}
+        )
@@ -0,0 +1,88 @@
+import aws_cdk.assertions as assertions
+import pytest
+
+from .conftest import build_stacks, container_environment
+
+
+@pytest.fixture(scope="module")
+def template(default_stacks):
+    return assertions.Template.from_stack(default_stacks.storage_stack)
+
+
+def test_buckets_block_public_access(template):
+    template.resource_count_is("AWS::S3::Bucket", 2)
+    template.all_resources_properties(
+        "AWS::S3::Bucket",
+        {
+            "PublicAccessBlockConfiguration": {
+                "BlockPublicAcls": True,
+                "BlockPublicPolicy": True,
+                "IgnorePublicAcls": True,
+                "RestrictPublicBuckets": True,
+            }
+        },
+    )
+
+
+def test_media_bucket_intelligent_tiering(template):
+    template.has_resource_properties(
+        "AWS::S3::Bucket",
+        {
+            "LifecycleConfiguration": {
+                "Rules": assertions.Match.array_with(
+                    [
+                        assertions.Match.object_like(
+                            {
+                                "Id": "IntelligentTiering",
+                                "ObjectSizeGreaterThan": 128 * 1024,
+                                "Transitions": [
+                                    {
+                                        "StorageClass": "INTELLIGENT_TIERING",
+                                        "TransitionInDays": 0,
+                                    }
+                                ],
+                            }
+                        )
+                    ]
+                )
+            }
+        },
+    )
+
+
+def test_cdn_served_buckets_left_to_cdn_stack(template):
+    template.resource_count_is("AWS::CloudFront::OriginAccessControl", 1)
+    # the media bucket only enforces SSL, the static bucket policy is in
+    # CDNStack
+    template.resource_count_is("AWS::S3::BucketPolicy", 1)
+    template.has_resource_properties(
+        "AWS::S3::BucketPolicy",
+        {
+            "PolicyDocument": {
+                "Statement": [
+                    assertions.Match.object_like(
+                        {
+                            "Effect": "Deny",
+                            "Condition": {"Bool": {"aws:SecureTransport": "false"}},
+                        }
+                    )
+                ],
+                "Version": "2012-10-17",
+            }
+        },
+    )
+
+
+def test_unknown_cdn_served_bucket():
+    with pytest.raises(ValueError):
+        build_stacks(storage_stack={"cdn_served_buckets": ["logs"]})
+
+
+def test_django_env_uses_managed_buckets_and_cdn(default_stacks):
+    environment = container_environment(default_stacks.django_service_stack)
+    for name in ["AWS_STORAGE_BUCKET_NAME", "DJANGO_AWS_STORAGE_BUCKET_NAME"]:
+        assert "Fn::ImportValue" in environment[name]
+    # media files keep presigned S3 URLs
+    assert environment["DJANGO_STATIC_CUSTOM_DOMAIN"] == "yeastregulatorydb.org"
+    assert "DJANGO_AWS_S3_CUSTOM_DOMAIN" not in environment
+    assert "yeastregulatorydb-strides-tmp" not in str(environment)
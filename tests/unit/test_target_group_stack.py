@@ -0,0 +1,104 @@
+import aws_cdk.assertions as assertions
+import pytest
+from aws_cdk import aws_elasticloadbalancingv2
+
+from .conftest import build_stacks
+
+LEAST_OUTSTANDING_REQUESTS = (
+    aws_elasticloadbalancingv2.TargetGroupLoadBalancingAlgorithmType.LEAST_OUTSTANDING_REQUESTS
+)
+
+
+def target_group_attributes(template, port):
+    for target_group in template.find_resources(
+        "AWS::ElasticLoadBalancingV2::TargetGroup"
+    ).values():
+        properties = target_group["Properties"]
+        if properties["Port"] == port:
+            return properties, {
+                attribute["Key"]: attribute["Value"]
+                for attribute in properties.get("TargetGroupAttributes", [])
+            }
+    raise KeyError(port)
+
+
+def test_django_target_group_tuning():
+    stacks = build_stacks(
+        targetgroup_stack={
+            "load_balancing_algorithm": LEAST_OUTSTANDING_REQUESTS,
+            "deregistration_delay": 30,
+            "stickiness_cookie_duration": 3600,
+            "health_check_interval": 10,
+            "healthy_threshold_count": 2,
+            "unhealthy_threshold_count": 3,
+        }
+    )
+    template = assertions.Template.from_stack(stacks.targetgroup_stack)
+    properties, attributes = target_group_attributes(template, 5000)
+    assert attributes["load_balancing.algorithm.type"] == "least_outstanding_requests"
+    assert attributes["deregistration_delay.timeout_seconds"] == "30"
+    assert attributes["stickiness.enabled"] == "true"
+    assert attributes["stickiness.lb_cookie.duration_seconds"] == "3600"
+    assert properties["HealthCheckIntervalSeconds"] == 10
+    assert properties["HealthyThresholdCount"] == 2
+    assert properties["UnhealthyThresholdCount"] == 3
+
+
+def test_slow_start():
+    stacks = build_stacks(targetgroup_stack={"slow_start": 60})
+    template = assertions.Template.from_stack(stacks.targetgroup_stack)
+    _, attributes = target_group_attributes(template, 5000)
+    assert attributes["slow_start.duration_seconds"] == "60"
+
+
+def test_slow_start_requires_round_robin():
+    with pytest.raises(ValueError):
+        build_stacks(
+            targetgroup_stack={
+                "load_balancing_algorithm": LEAST_OUTSTANDING_REQUESTS,
+                "slow_start": 60,
+            }
+        )
+
+
+def test_django_service_uses_the_shared_target_group(default_stacks):
+    # the service registers with TargetGroupStack.django_target_group rather
+    # than adding a second target group and listener rule
+    template = assertions.Template.from_stack(default_stacks.django_service_stack)
+    template.resource_count_is("AWS::ElasticLoadBalancingV2::TargetGroup", 0)
+    template.resource_count_is("AWS::ElasticLoadBalancingV2::ListenerRule", 0)
+    template.has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "LoadBalancers": [
+                assertions.Match.object_like(
+                    {"ContainerName": "django", "ContainerPort": 5000}
+                )
+            ]
+        },
+    )
+
+
+
+def test_django_health_check_settings():
+    stacks = build_stacks(
+        targetgroup_stack={
+            "health_check_path": "/healthz/",
+            "health_check_interval": 15,
+            "health_check_timeout": 3,
+            "health_check_matcher": "200-299",
+        }
+    )
+    template = assertions.Template.from_stack(stacks.targetgroup_stack)
+    properties, _ = target_group_attributes(template, 5000)
+    assert properties["HealthCheckPath"] == "/healthz/"
+    assert properties["HealthCheckIntervalSeconds"] == 15
+    assert properties["HealthCheckTimeoutSeconds"] == 3
+    assert properties["Matcher"] == {"HttpCode": "200-299"}
+
+
+def test_health_check_timeout_below_interval():
+    with pytest.raises(ValueError):
+        build_stacks(
+            targetgroup_stack={"health_check_interval": 5, "health_check_timeout": 5}
+        )
@@ -0,0 +1,44 @@
+import aws_cdk.assertions as assertions
+import pytest
+
+from yeastregulatorydbstack.VPCStack import INTERFACE_ENDPOINTS
+
+from .conftest import build_stacks
+
+
+@pytest.fixture(scope="module")
+def template(default_stacks):
+    return assertions.Template.from_stack(default_stacks.vpc_stack)
+
+
+def test_single_nat_gateway_and_s3_gateway_endpoint(template):
+    template.resource_count_is("AWS::EC2::NatGateway", 1)
+    template.has_resource_properties(
+        "AWS::EC2::VPCEndpoint",
+        {
+            "VpcEndpointType": "Gateway",
+            "ServiceName": assertions.Match.object_like(
+                {"Fn::Join": ["", ["com.amazonaws.", {"Ref": "AWS::Region"}, ".s3"]]}
+            ),
+        },
+    )
+    template.resource_count_is("AWS::EC2::VPCEndpoint", 1)
+
+
+def test_nat_gateway_per_az_and_interface_endpoints():
+    stacks = build_stacks(
+        vpc_stack={"nat_gateway_per_az": True, "interface_endpoints": True}
+    )
+    template = assertions.Template.from_stack(stacks.vpc_stack)
+    template.resource_count_is(
+        "AWS::EC2::NatGateway", len(stacks.vpc_stack.vpc.availability_zones)
+    )
+    template.resource_count_is("AWS::EC2::VPCEndpoint", len(INTERFACE_ENDPOINTS) + 1)
+    template.has_resource_properties(
+        "AWS::EC2::VPCEndpoint",
+        {
+            "VpcEndpointType": "Interface",
+            "ServiceName": "com.amazonaws.us-east-2.ecr.dkr",
+            "PrivateDnsEnabled": True,
+        },
+    )
@@ -1,6 +1,106 @@
-from aws_cdk import CfnOutput, Stack, Tags, aws_ec2, aws_elasticloadbalancingv2
+from aws_cdk import (CfnOutput, Duration, RemovalPolicy, Stack, Tags,
+                     aws_athena, aws_ec2, aws_elasticloadbalancingv2, aws_glue,
+                     aws_s3)
 from constructs import Construct
 
+# The columns and regex of the ALB access log format, see
+# https://docs.aws.amazon.com/athena/latest/ug/application-load-balancer-logs.html
+# Fields added to the format later are ignored by the final group
+ACCESS_LOG_COLUMNS = [
+    ("type", "string"),
+    ("time", "string"),
+    ("elb", "string"),
+    ("client_ip", "string"),
+    ("client_port", "int"),
+    ("target_ip", "string"),
+    ("target_port", "int"),
+    ("request_processing_time", "double"),
+    ("target_processing_time", "double"),
+    ("response_processing_time", "double"),
+    ("elb_status_code", "int"),
+    ("target_status_code", "string"),
+    ("received_bytes", "bigint"),
+    ("sent_bytes", "bigint"),
+    ("request_verb", "string"),
+    ("request_url", "string"),
+    ("request_proto", "string"),
+    ("user_agent", "string"),
+    ("ssl_cipher", "string"),
+    ("ssl_protocol", "string"),
+    ("target_group_arn", "string"),
+    ("trace_id", "string"),
+    ("domain_name", "string"),
+    ("chosen_cert_arn", "string"),
+    ("matched_rule_priority", "string"),
+    ("request_creation_time", "string"),
+    ("actions_executed", "string"),
+    ("redirect_url", "string"),
+    ("lambda_error_reason", "string"),
+    ("target_port_list", "string"),
+    ("target_status_code_list", "string"),
+    ("classification", "string"),
+    ("classification_reason", "string"),
+    ("conn_trace_id", "string"),
+]
+ACCESS_LOG_REGEX = (
+    r'([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*):([0-9]*) ([^ ]*)[:-]([0-9]*) ([-.0-9]*) '
+    r'([-.0-9]*) ([-.0-9]*) (|[-0-9]*) (-|[-0-9]*) ([-0-9]*) ([-0-9]*) '
+    r'"([^ ]*) (.*) (- |[^ ]*)" "([^"]*)" ([A-Z0-9-_]+) ([A-Za-z0-9.-]*) '
+    r'([^ ]*) "([^"]*)" "([^"]*)" "([^"]*)" ([-.0-9]*) ([^ ]*) "([^"]*)" '
+    r'"([^"]*)" "([^ ]*)" "([^\s]+?)" "([^\s]+)" "([^ ]*)" "([^ ]*)" '
+    r'?([^ ]*)?(?: .*)?'
+)
+
+# Saved queries over the access log table. {table} is replaced with the
+# table name. The day partition is projected, so every query must filter on
+# it to avoid reading the whole bucket. target_processing_time is -1 when
+# the target did not respond
+ACCESS_LOG_QUERIES = {
+    "SlowestPaths": (
+        "Paths with the highest p99 target processing time in the last day",
+        """SELECT request_verb,
+       url_extract_path(request_url) AS path,
+       count(*) AS requests,
+       approx_percentile(target_processing_time, 0.5) AS p50_seconds,
+       approx_percentile(target_processing_time, 0.99) AS p99_seconds,
+       sum(target_processing_time) AS total_seconds
+FROM {table}
+WHERE day >= date_format(current_date - interval '1' day, '%Y/%m/%d')
+  AND target_processing_time >= 0
+GROUP BY 1, 2
+HAVING count(*) >= 10
+ORDER BY p99_seconds DESC
+LIMIT 50""",
+    ),
+    "RequestRatePerTarget": (
+        "Requests per minute to each target today",
+        """SELECT target_ip,
+       date_trunc('minute', from_iso8601_timestamp(time)) AS minute,
+       count(*) AS requests,
+       approx_percentile(target_processing_time, 0.99) AS p99_seconds
+FROM {table}
+WHERE day = date_format(current_date, '%Y/%m/%d')
+  AND target_ip <> '-'
+GROUP BY 1, 2
+ORDER BY 2 DESC, 1""",
+    ),
+    "CacheCandidates": (
+        "Successful GET paths by total target time in the last week",
+        """SELECT url_extract_path(request_url) AS path,
+       count(*) AS requests,
+       sum(target_processing_time) AS total_seconds,
+       avg(sent_bytes) AS avg_bytes
+FROM {table}
+WHERE day >= date_format(current_date - interval '7' day, '%Y/%m/%d')
+  AND request_verb = 'GET'
+  AND elb_status_code = 200
+  AND target_processing_time >= 0
+GROUP BY 1
+ORDER BY total_seconds DESC
+LIMIT 50""",
+    ),
+}
+
 
 class ALBStack(Stack):
     def __init__(
@@ -21,6 +121,19 @@ class ALBStack(Stack):
           of `id`.
         - alb_security_groups: A list of security groups to associate with the
           load balancer. Must be passed as a list. Default is an empty list.
+        - idle_timeout: Seconds a connection may be idle before the load
+          balancer closes it. This must exceed the longest request, eg a big
+          query, and be shorter than the gunicorn keep-alive (see
+          DjangoServiceStack `keep_alive`). Default is 60.
+        - http2_enabled: Whether clients may use HTTP/2. Default is True.
+        - access_logs: Whether to write access logs to a new bucket and
+          define an Athena table with saved queries over them, eg for the
+          slowest paths. The stack must have a concrete region. Default is
+          False.
+        - access_logs_expiration: Days to keep the access logs and Athena
+          query results. Default is 30.
+        - access_logs_database_name: The Glue database of the access log
+          table. Default is derived from the stack name.
 
         :param scope: See VPCStack class docstring for more information.
         :type scope: core.Construct
@@ -55,6 +168,11 @@ class ALBStack(Stack):
         domain = kwargs.pop("domain_name", "my-domain.com")
         app_tag_name = kwargs.pop("app_tag_name", "app")
         app_tag_value = kwargs.pop("app_tag_value", "myapp")
+        idle_timeout = kwargs.pop("idle_timeout", 60)
+        http2_enabled = kwargs.pop("http2_enabled", True)
+        access_logs = kwargs.pop("access_logs", False)
+        access_logs_expiration = kwargs.pop("access_logs_expiration", 30)
+        access_logs_database_name = kwargs.pop("access_logs_database_name", None)
         # call the parent class constructor
         super().__init__(scope, id, **kwargs)
 
@@ -64,6 +182,8 @@ class ALBStack(Stack):
             vpc=vpc,
             internet_facing=True,
             security_group=alb_security_groups,
+            idle_timeout=Duration.seconds(idle_timeout),
+            http2_enabled=http2_enabled,
         )
 
         # Add an HTTP listener that redirects to HTTPS
@@ -103,8 +223,136 @@ class ALBStack(Stack):
             ),
         )
 
-        for resource in [self.alb]:
-            Tags.of(resource).add(app_tag_name, app_tag_value)
+        self.access_logs_bucket = None
+        self.access_logs_database = None
+        self.access_logs_table = None
+        self.access_logs_workgroup = None
+        self.access_logs_queries = {}
+        if access_logs:
+            self._add_access_logs(
+                access_logs_expiration,
+                access_logs_database_name
+                or self.stack_name.lower().replace("-", "_") + "_access_logs",
+            )
+
+        for resource in [self.alb, self.access_logs_bucket, self.access_logs_workgroup]:
+            if resource is not None:
+                Tags.of(resource).add(app_tag_name, app_tag_value)
 
         # Outputs
         CfnOutput(self, "LoadBalancerDNSName", value=self.alb.load_balancer_dns_name)
+
+    def _add_access_logs(self, expiration: int, database_name: str) -> None:
+        """Write the access logs to S3 and define an Athena table over them
+
+        The table is partitioned by the `day` of the log files (yyyy/MM/dd)
+        with partition projection, so new days need no crawler or
+        `MSCK REPAIR TABLE`.
+
+        :param expiration: Days to keep the logs and query results.
+        :type expiration: int
+        :param database_name: The name of the Glue database.
+        :type database_name: str
+        """
+        # ALB access logs only support SSE-S3
+        self.access_logs_bucket = aws_s3.Bucket(
+            self,
+            "AccessLogsBucket",
+            block_public_access=aws_s3.BlockPublicAccess.BLOCK_ALL,
+            encryption=aws_s3.BucketEncryption.S3_MANAGED,
+            enforce_ssl=True,
+            lifecycle_rules=[
+                aws_s3.LifecycleRule(
+                    id="ExpireAccessLogs", expiration=Duration.days(expiration)
+                )
+            ],
+            removal_policy=RemovalPolicy.RETAIN,
+        )
+        self.alb.log_access_logs(self.access_logs_bucket, prefix="alb")
+
+        self.access_logs_database = aws_glue.CfnDatabase(
+            self,
+            "AccessLogsDatabase",
+            catalog_id=self.account,
+            database_input=aws_glue.CfnDatabase.DatabaseInputProperty(
+                name=database_name
+            ),
+        )
+
+        location = (
+            f"s3://{self.access_logs_bucket.bucket_name}/alb/AWSLogs/"
+            f"{self.account}/elasticloadbalancing/{self.region}"
+        )
+        self.access_logs_table = aws_glue.CfnTable(
+            self,
+            "AccessLogsTable",
+            catalog_id=self.account,
+            database_name=database_name,
+            table_input=aws_glue.CfnTable.TableInputProperty(
+                name="alb_access_logs",
+                table_type="EXTERNAL_TABLE",
+                partition_keys=[
+                    aws_glue.CfnTable.ColumnProperty(name="day", type="string")
+                ],
+                parameters={
+                    "EXTERNAL": "TRUE",
+                    "projection.enabled": "true",
+                    "projection.day.type": "date",
+                    "projection.day.range": f"NOW-{expiration}DAYS,NOW",
+                    "projection.day.format": "yyyy/MM/dd",
+                    "projection.day.interval": "1",
+                    "projection.day.interval.unit": "DAYS",
+                    "storage.location.template": location + "/${day}",
+                },
+                storage_descriptor=aws_glue.CfnTable.StorageDescriptorProperty(
+                    columns=[
+                        aws_glue.CfnTable.ColumnProperty(name=name, type=type_)
+                        for name, type_ in ACCESS_LOG_COLUMNS
+                    ],
+                    location=location,
+                    input_format="org.apache.hadoop.mapred.TextInputFormat",
+                    output_format="org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat",
+                    serde_info=aws_glue.CfnTable.SerdeInfoProperty(
+                        serialization_library="org.apache.hadoop.hive.serde2.RegexSerDe",
+                        parameters={
+                            "serialization.format": "1",
+                            "input.regex": ACCESS_LOG_REGEX,
+                        },
+                    ),
+                ),
+            ),
+        )
+        self.access_logs_table.add_dependency(self.access_logs_database)
+
+        # Query results share the bucket and its expiry
+        self.access_logs_workgroup = aws_athena.CfnWorkGroup(
+            self,
+            "AccessLogsWorkGroup",
+            name=f"{self.stack_name}-access-logs",
+            recursive_delete_option=True,
+            work_group_configuration=aws_athena.CfnWorkGroup.WorkGroupConfigurationProperty(
+                enforce_work_group_configuration=True,
+                result_configuration=aws_athena.CfnWorkGroup.ResultConfigurationProperty(
+                    output_location=f"s3://{self.access_logs_bucket.bucket_name}/athena-results/"
+                ),
+            ),
+        )
+
+        for query_name, (description, query) in ACCESS_LOG_QUERIES.items():
+            named_query = aws_athena.CfnNamedQuery(
+                self,
+                query_name + "Query",
+                name=query_name,
+                description=description,
+                database=database_name,
+                work_group=self.access_logs_workgroup.ref,
+                query_string=query.format(table="alb_access_logs"),
+            )
+            named_query.add_dependency(self.access_logs_table)
+            self.access_logs_queries[query_name] = named_query
+
+        CfnOutput(
+            self,
+            "AccessLogsBucketName",
+            value=self.access_logs_bucket.bucket_name,
+        )
@@ -0,0 +1,389 @@
+import jsii
+from aws_cdk import (CfnOutput, Duration, Stack, Tags, aws_certificatemanager,
+                     aws_cloudfront, aws_cloudfront_origins,
+                     aws_elasticloadbalancingv2, aws_iam, aws_s3)
+from constructs import Construct
+
+
+@jsii.implements(aws_cloudfront.IOrigin)
+class _S3OriginAccessControlOrigin:
+    """An S3 bucket origin which CloudFront reads with an origin access control
+
+    `aws_cloudfront_origins.S3Origin` only supports origin access identities.
+    """
+
+    def __init__(
+        self,
+        bucket: aws_s3.IBucket,
+        origin_access_control: aws_cloudfront.CfnOriginAccessControl,
+        origin_shield_region: str,
+    ) -> None:
+        self.bucket = bucket
+        self.origin_access_control = origin_access_control
+        self.origin_shield_region = origin_shield_region
+
+    def bind(self, scope: Construct, *, origin_id: str) -> aws_cloudfront.OriginBindConfig:
+        return aws_cloudfront.OriginBindConfig(
+            origin_property=aws_cloudfront.CfnDistribution.OriginProperty(
+                id=origin_id,
+                domain_name=self.bucket.bucket_regional_domain_name,
+                # an empty origin access identity is required with an OAC
+                s3_origin_config=aws_cloudfront.CfnDistribution.S3OriginConfigProperty(
+                    origin_access_identity=""
+                ),
+                origin_access_control_id=self.origin_access_control.attr_id,
+                origin_shield=aws_cloudfront.CfnDistribution.OriginShieldProperty(
+                    enabled=True, origin_shield_region=self.origin_shield_region
+                ),
+            )
+        )
+
+
+class CDNStack(Stack):
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        alb: aws_elasticloadbalancingv2.ApplicationLoadBalancer,
+        **kwargs
+    ) -> None:
+        """Create a CloudFront distribution in front of the load balancer
+
+        The cache behaviors, in the order CloudFront evaluates them, are:
+
+        - `uncached_path_patterns` (eg auth and admin): never cached and every
+          viewer header, cookie and query string is forwarded.
+        - `static_path_patterns`: cached for a long time, keyed on the path
+          only. Served from `static_bucket` if it is provided, otherwise from
+          the load balancer.
+        - `media_path_patterns`: cached for `media_ttl`, keyed on the path
+          only and served from `media_bucket`. Uploaded files are private, so
+          viewers need a URL signed with the private key of
+          `media_public_key`. Only added if `media_bucket` is provided.
+        - `api_path_patterns`: GET and HEAD responses are cached for a short
+          time, keyed on the query string. The `Authorization` header and the
+          `sessionid` cookie are also part of the key, so authenticated
+          responses are only ever served back to the same user. Other methods
+          are not cached, and the `csrftoken` cookie is forwarded for them.
+        - everything else: not cached.
+
+        Responses are compressed with Brotli or gzip, and requests to the load
+        balancer go through Origin Shield. The viewer's Host header is
+        forwarded to the load balancer, and CloudFront verifies the load
+        balancer certificate against it. Viewers must therefore use one of the
+        `domain_names`, which the certificate of `ALBStack` must cover, rather
+        than the cloudfront.net domain of the distribution.
+
+        The policy of each bucket served here allows this distribution, and
+        no other, to read it. A bucket has a single policy, so the bucket must
+        not have one already, eg `StorageStack` with the bucket in
+        `cdn_served_buckets`. The policy also denies requests without SSL.
+
+        The following additional keyword arguments are configured:
+
+        - app_tag_name: The name of the tag to apply to all resources. Default
+            is "app".
+        - app_tag_value: The value of the tag to apply to all resources. Default
+            is "myapp".
+        - origin_domain_name: A domain name which resolves to the load
+            balancer, eg "origin.my-domain.com". Default is None, in which case
+            the load balancer DNS name is used.
+        - origin_shield_region: The Origin Shield region. Default is the region
+            of this stack.
+        - static_path_patterns: Default is ["/static/*"].
+        - static_ttl: The default TTL of static assets in seconds. Default is
+            86400 * 30.
+        - static_bucket: The bucket holding the static files, eg
+            `StorageStack.static_bucket`. The object keys must include the
+            path, eg "static/css/project.css". Default is None.
+        - media_path_patterns: Default is ["/media/*"].
+        - media_ttl: The default TTL of media files in seconds. Default is
+            86400 * 7.
+        - media_bucket: The bucket holding the media files, eg
+            `StorageStack.media_bucket`. Default is None.
+        - media_public_key: The PEM encoded public key of the key pair which
+            signs the media URLs. Required if `media_bucket` is provided.
+            Default is None.
+        - origin_access_control: The origin access control used to read
+            `static_bucket` and `media_bucket`, eg
+            `StorageStack.origin_access_control`. Required if either bucket is
+            provided. Default is None.
+        - api_path_patterns: Default is ["/api/*"].
+        - api_ttl: The default TTL of API responses in seconds. Default is 60.
+        - uncached_path_patterns: Default is ["/admin/*", "/accounts/*",
+            "/api/auth/*"].
+        - domain_names: Alternate domain names of the distribution, eg
+            ["yeastregulatorydb.org"]. Required.
+        - certificate_arn: The ARN of a certificate in us-east-1 for the
+            `domain_names`. Required.
+        - price_class: Default is aws_cloudfront.PriceClass.PRICE_CLASS_100.
+
+        :param scope: See VPCStack class docstring for more information.
+        :type scope: Construct
+        :param id: See VPCStack class docstring for more information.
+        :type id: str
+        :param alb: The load balancer to use as the origin. This will likely be
+            `ALBStack.alb`.
+        :type alb: aws_elasticloadbalancingv2.ApplicationLoadBalancer
+
+        :raises ValueError: If `domain_names` or `certificate_arn` is missing,
+            if a bucket is provided without `origin_access_control` or already
+            has a bucket policy, or if `media_bucket` is provided without
+            `media_public_key`.
+        """
+        # Extract custom kwargs for this local class
+        app_tag_name = kwargs.pop("app_tag_name", "app")
+        app_tag_value = kwargs.pop("app_tag_value", "myapp")
+        origin_domain_name = kwargs.pop("origin_domain_name", None)
+        origin_shield_region = kwargs.pop("origin_shield_region", None)
+        static_path_patterns = kwargs.pop("static_path_patterns", ["/static/*"])
+        static_ttl = kwargs.pop("static_ttl", 86400 * 30)
+        static_bucket = kwargs.pop("static_bucket", None)
+        media_path_patterns = kwargs.pop("media_path_patterns", ["/media/*"])
+        media_ttl = kwargs.pop("media_ttl", 86400 * 7)
+        media_bucket = kwargs.pop("media_bucket", None)
+        media_public_key = kwargs.pop("media_public_key", None)
+        origin_access_control = kwargs.pop("origin_access_control", None)
+        api_path_patterns = kwargs.pop("api_path_patterns", ["/api/*"])
+        api_ttl = kwargs.pop("api_ttl", 60)
+        uncached_path_patterns = kwargs.pop(
+            "uncached_path_patterns", ["/admin/*", "/accounts/*", "/api/auth/*"]
+        )
+        domain_names = kwargs.pop("domain_names", None)
+        certificate_arn = kwargs.pop("certificate_arn", None)
+        price_class = kwargs.pop(
+            "price_class", aws_cloudfront.PriceClass.PRICE_CLASS_100
+        )
+
+        # Call the parent constructor
+        super().__init__(scope, id, **kwargs)
+
+        # the load balancer certificate does not cover the cloudfront.net
+        # domain, so requests by that Host would fail with a 502
+        if not domain_names or certificate_arn is None:
+            raise ValueError(
+                "domain_names and certificate_arn are required, since the Host "
+                "header is forwarded to the load balancer."
+            )
+        if origin_access_control is None and (
+            static_bucket is not None or media_bucket is not None
+        ):
+            raise ValueError(
+                "origin_access_control is required to serve static_bucket or "
+                "media_bucket."
+            )
+        buckets = {
+            name: bucket
+            for name, bucket in [("Static", static_bucket), ("Media", media_bucket)]
+            if bucket is not None
+        }
+        for name, bucket in buckets.items():
+            if bucket.policy is not None:
+                raise ValueError(
+                    f"The {name.lower()} bucket has a bucket policy, which the "
+                    "policy of this stack would replace."
+                )
+        if media_bucket is not None and media_public_key is None:
+            raise ValueError("media_public_key is required to serve media_bucket.")
+        origin_shield_region = origin_shield_region or self.region
+
+        origin_kwargs = {
+            "protocol_policy": aws_cloudfront.OriginProtocolPolicy.HTTPS_ONLY,
+            "origin_shield_enabled": True,
+            "origin_shield_region": origin_shield_region,
+            # big genomic queries can take a while
+            "read_timeout": Duration.seconds(60),
+        }
+        if origin_domain_name is None:
+            origin = aws_cloudfront_origins.LoadBalancerV2Origin(alb, **origin_kwargs)
+        else:
+            origin = aws_cloudfront_origins.HttpOrigin(
+                origin_domain_name, **origin_kwargs
+            )
+
+        # Static files: long TTL, keyed on the path only
+        static_cache_policy = aws_cloudfront.CachePolicy(
+            self,
+            "StaticCachePolicy",
+            comment="Long TTL for static assets",
+            default_ttl=Duration.seconds(static_ttl),
+            min_ttl=Duration.seconds(0),
+            max_ttl=Duration.days(365),
+            cookie_behavior=aws_cloudfront.CacheCookieBehavior.none(),
+            header_behavior=aws_cloudfront.CacheHeaderBehavior.none(),
+            query_string_behavior=aws_cloudfront.CacheQueryStringBehavior.none(),
+            enable_accept_encoding_brotli=True,
+            enable_accept_encoding_gzip=True,
+        )
+
+        # Read-only API: short TTL, keyed on the query string and the user
+        api_cache_policy = aws_cloudfront.CachePolicy(
+            self,
+            "ApiCachePolicy",
+            comment="Short TTL for read-only API responses",
+            default_ttl=Duration.seconds(api_ttl),
+            min_ttl=Duration.seconds(0),
+            max_ttl=Duration.seconds(api_ttl * 5),
+            cookie_behavior=aws_cloudfront.CacheCookieBehavior.allow_list("sessionid"),
+            header_behavior=aws_cloudfront.CacheHeaderBehavior.allow_list(
+                "Authorization"
+            ),
+            query_string_behavior=aws_cloudfront.CacheQueryStringBehavior.all(),
+            enable_accept_encoding_brotli=True,
+            enable_accept_encoding_gzip=True,
+        )
+
+        # Forward the Host header so that django's ALLOWED_HOSTS and the ALB
+        # host header rules see the viewer's host, and the csrftoken cookie so
+        # that session authenticated writes pass django's CSRF check. The
+        # token is not part of the cache key. Anything in the cache key is
+        # forwarded as well
+        api_origin_request_policy = aws_cloudfront.OriginRequestPolicy(
+            self,
+            "ApiOriginRequestPolicy",
+            comment="Forward the Host header, the CSRF cookie and query strings",
+            header_behavior=aws_cloudfront.OriginRequestHeaderBehavior.allow_list(
+                "Host"
+            ),
+            cookie_behavior=aws_cloudfront.OriginRequestCookieBehavior.allow_list(
+                "csrftoken"
+            ),
+            query_string_behavior=aws_cloudfront.OriginRequestQueryStringBehavior.all(),
+        )
+
+        uncached_behavior = aws_cloudfront.BehaviorOptions(
+            origin=origin,
+            viewer_protocol_policy=aws_cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+            allowed_methods=aws_cloudfront.AllowedMethods.ALLOW_ALL,
+            cache_policy=aws_cloudfront.CachePolicy.CACHING_DISABLED,
+            origin_request_policy=aws_cloudfront.OriginRequestPolicy.ALL_VIEWER,
+            compress=True,
+        )
+        if static_bucket is None:
+            static_behavior = aws_cloudfront.BehaviorOptions(
+                origin=origin,
+                viewer_protocol_policy=aws_cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                allowed_methods=aws_cloudfront.AllowedMethods.ALLOW_GET_HEAD,
+                cache_policy=static_cache_policy,
+                origin_request_policy=api_origin_request_policy,
+                compress=True,
+            )
+        else:
+            # S3 rejects requests with a foreign Host header, so nothing is
+            # forwarded to the bucket origins
+            static_behavior = aws_cloudfront.BehaviorOptions(
+                origin=_S3OriginAccessControlOrigin(
+                    static_bucket, origin_access_control, origin_shield_region
+                ),
+                viewer_protocol_policy=aws_cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                allowed_methods=aws_cloudfront.AllowedMethods.ALLOW_GET_HEAD,
+                cache_policy=static_cache_policy,
+                # eg fonts loaded by pages on another domain
+                response_headers_policy=aws_cloudfront.ResponseHeadersPolicy.CORS_ALLOW_ALL_ORIGINS,
+                compress=True,
+            )
+        api_behavior = aws_cloudfront.BehaviorOptions(
+            origin=origin,
+            viewer_protocol_policy=aws_cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+            allowed_methods=aws_cloudfront.AllowedMethods.ALLOW_ALL,
+            cached_methods=aws_cloudfront.CachedMethods.CACHE_GET_HEAD,
+            cache_policy=api_cache_policy,
+            origin_request_policy=api_origin_request_policy,
+            compress=True,
+        )
+
+        # CloudFront evaluates the behaviors in this order
+        additional_behaviors = {}
+        for path_pattern in uncached_path_patterns:
+            additional_behaviors[path_pattern] = uncached_behavior
+        for path_pattern in static_path_patterns:
+            additional_behaviors[path_pattern] = static_behavior
+        if media_bucket is not None:
+            media_cache_policy = aws_cloudfront.CachePolicy(
+                self,
+                "MediaCachePolicy",
+                comment="TTL for uploaded media files",
+                default_ttl=Duration.seconds(media_ttl),
+                min_ttl=Duration.seconds(0),
+                max_ttl=Duration.days(365),
+                cookie_behavior=aws_cloudfront.CacheCookieBehavior.none(),
+                header_behavior=aws_cloudfront.CacheHeaderBehavior.none(),
+                query_string_behavior=aws_cloudfront.CacheQueryStringBehavior.none(),
+                enable_accept_encoding_brotli=True,
+                enable_accept_encoding_gzip=True,
+            )
+            media_behavior = aws_cloudfront.BehaviorOptions(
+                origin=_S3OriginAccessControlOrigin(
+                    media_bucket, origin_access_control, origin_shield_region
+                ),
+                viewer_protocol_policy=aws_cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                allowed_methods=aws_cloudfront.AllowedMethods.ALLOW_GET_HEAD,
+                cache_policy=media_cache_policy,
+                # genomic files are mostly compressed already
+                compress=False,
+                trusted_key_groups=[
+                    aws_cloudfront.KeyGroup(
+                        self,
+                        "MediaKeyGroup",
+                        items=[
+                            aws_cloudfront.PublicKey(
+                                self, "MediaPublicKey", encoded_key=media_public_key
+                            )
+                        ],
+                    )
+                ],
+            )
+            for path_pattern in media_path_patterns:
+                additional_behaviors[path_pattern] = media_behavior
+        for path_pattern in api_path_patterns:
+            additional_behaviors[path_pattern] = api_behavior
+
+        self.distribution = aws_cloudfront.Distribution(
+            self,
+            "DjangoDistribution",
+            default_behavior=uncached_behavior,
+            additional_behaviors=additional_behaviors,
+            domain_names=domain_names,
+            certificate=aws_certificatemanager.Certificate.from_certificate_arn(
+                self, "DistributionCertificate", certificate_arn
+            ),
+            price_class=price_class,
+            http_version=aws_cloudfront.HttpVersion.HTTP2_AND_3,
+        )
+
+        # Only this distribution may read the buckets
+        distribution_arn = self.format_arn(
+            service="cloudfront",
+            region="",
+            resource="distribution",
+            resource_name=self.distribution.distribution_id,
+        )
+        for name, bucket in buckets.items():
+            bucket_policy = aws_s3.BucketPolicy(
+                self, f"{name}BucketPolicy", bucket=bucket
+            )
+            bucket_policy.document.add_statements(
+                aws_iam.PolicyStatement(
+                    effect=aws_iam.Effect.DENY,
+                    actions=["s3:*"],
+                    resources=[bucket.bucket_arn, bucket.arn_for_objects("*")],
+                    principals=[aws_iam.AnyPrincipal()],
+                    conditions={"Bool": {"aws:SecureTransport": "false"}},
+                ),
+                aws_iam.PolicyStatement(
+                    actions=["s3:GetObject"],
+                    resources=[bucket.arn_for_objects("*")],
+                    principals=[aws_iam.ServicePrincipal("cloudfront.amazonaws.com")],
+                    conditions={"StringEquals": {"AWS:SourceArn": distribution_arn}},
+                ),
+            )
+
+        for resource in [self.distribution]:
+            Tags.of(resource).add(app_tag_name, app_tag_value)
+
+        # Outputs
+        CfnOutput(
+            self,
+            "DistributionDomainName",
+            value=self.distribution.distribution_domain_name,
+        )
@@ -0,0 +1,412 @@
+from aws_cdk import (Duration, Stack, Tags, aws_applicationautoscaling,
+                     aws_cloudwatch, aws_ec2, aws_ecs, aws_iam, aws_logs)
+from constructs import Construct
+
+from .capacity_providers import capacity_provider_strategies
+from .guardrails import suppress
+from .placement import (enable_az_rebalancing, record_subnet_count,
+                        service_placement)
+
+# Fargate stops a container at most this many seconds after SIGTERM
+FARGATE_MAX_STOP_TIMEOUT = 120
+
+# Publishes the length of each queue in CELERY_BACKLOG_QUEUES once a minute.
+# redis and boto3 are dependencies of the django image
+BACKLOG_PUBLISHER_SCRIPT = """\
+import os
+import time
+
+import boto3
+import redis
+
+queues = os.environ["CELERY_BACKLOG_QUEUES"].split(",")
+namespace = os.environ["CELERY_BACKLOG_METRIC_NAMESPACE"]
+broker = redis.Redis.from_url(os.environ["CELERY_BROKER_URL"])
+cloudwatch = boto3.client("cloudwatch")
+while True:
+    cloudwatch.put_metric_data(
+        Namespace=namespace,
+        MetricData=[
+            {
+                "MetricName": "QueueBacklog",
+                "Dimensions": [{"Name": "Queue", "Value": queue}],
+                "Value": broker.llen(queue),
+                "Unit": "Count",
+            }
+            for queue in queues
+        ],
+    )
+    time.sleep(60)
+"""
+
+# Settings applied to every worker pool unless overridden in `worker_pools`
+DEFAULT_WORKER_POOL = {
+    "queues": ["celery"],
+    "concurrency": 2,
+    "prefetch_multiplier": 1,
+    "cpu": 512,
+    "memory_limit_mib": 1024,
+    "min_capacity": 1,
+    "max_capacity": 4,
+    "backlog_scale_out_threshold": 100,
+    "scale_in_evaluation_periods": 15,
+    "stop_timeout": 120,
+    "on_demand_base": 0,
+    "on_demand_weight": 1,
+    "spot_weight": 0,
+}
+
+
+class CeleryWorkerServiceStack(Stack):
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        vpc: aws_ec2.Vpc,
+        cluster: aws_ecs.Cluster,
+        image_uri: str,
+        execution_role: aws_iam.Role,
+        task_role: aws_iam.Role,
+        secrets: dict,
+        env_vars: dict,
+        log_group: aws_logs.LogGroup,
+        security_group: aws_ec2.SecurityGroup,
+        **kwargs
+    ) -> None:
+        """Create one ECS service per named Celery worker pool
+
+        Each pool runs `celery worker` against its own list of queues with its
+        own concurrency and prefetch settings, and scales independently on the
+        backlog of those queues. The backlog is read from the CloudWatch
+        metric `QueueBacklog` in the `backlog_metric_namespace` namespace with
+        a `Queue` dimension. A single task service, `backlog_publisher`,
+        publishes it once a minute with `LLEN` on each queue of the broker
+        at `CELERY_BROKER_URL`. Without it, a pool with a `min_capacity` of 0
+        never starts a worker.
+
+        A pool scales out as soon as its queues have a backlog, and scales in
+        by one task only after the backlog has been empty for
+        `scale_in_evaluation_periods` minutes. The backlog does not count the
+        tasks which workers are running or have reserved, so the delay gives
+        them time to finish. A stopped worker gets `stop_timeout` seconds
+        after SIGTERM to finish its running tasks, at most the 120 which
+        Fargate allows.
+
+        The following additional keyword arguments are configured:
+
+        - app_tag_name: The name of the tag to apply to all resources. Default
+            is "app".
+        - app_tag_value: The value of the tag to apply to all resources. Default
+            is "myapp".
+        - worker_pools: A dictionary where the keys are the pool names and the
+            values are dictionaries of settings for that pool. Any setting not
+            provided is taken from `DEFAULT_WORKER_POOL`. The settings are:
+            `queues`, `concurrency`, `prefetch_multiplier`, `cpu`,
+            `memory_limit_mib`, `min_capacity`, `max_capacity`,
+            `backlog_scale_out_threshold`, `scale_in_evaluation_periods`,
+            `stop_timeout`, and the capacity provider mix
+            `on_demand_base`, `on_demand_weight` and `spot_weight` (see
+            `capacity_providers`). Default is a single pool named "default"
+            which consumes the "celery" queue.
+        - celery_app: The celery application passed to `celery -A`. Default is
+            "config.celery_app".
+        - backlog_metric_namespace: The CloudWatch namespace of the queue
+            backlog metric. Default is "YeastRegulatoryDB/Celery".
+        - environment_files: A list of environment files to add to the worker
+            containers. See `DjangoServiceStack.environment_file`. Default is
+            None.
+        - cpu_architecture: The CPU architecture of the workers. This must
+            match the image, which is shared with the django service. Default
+            is aws_ecs.CpuArchitecture.X86_64.
+        - placement: The subnets the workers run in. One of "public-subnet",
+            "private-spread" or "writer-az". See `placement`. Default is
+            "public-subnet".
+        - db_writer_availability_zone: The AZ of the RDS writer, eg
+            `RDSStack.db_writer_availability_zone`. Required for the
+            "writer-az" placement. Default is None.
+        - backlog_publisher: Whether to run the service which publishes the
+            backlog metric. Only disable it if the application publishes the
+            metric itself. Default is True.
+
+        :param scope: See VPCStack class docstring for more information.
+        :type scope: Construct
+        :param id: See VPCStack class docstring for more information.
+        :type id: str
+        :param vpc: See SecurityGroupStack class docstring for more information.
+        :type vpc: aws_ec2.Vpc
+        :param cluster: The ECS cluster to run the workers in. This will likely
+            be `DjangoServiceStack.cluster`.
+        :type cluster: aws_ecs.Cluster
+        :param image_uri: See DjangoServiceStack class docstring for more
+            information.
+        :type image_uri: str
+        :param execution_role: See DjangoServiceStack class docstring for more
+            information.
+        :type execution_role: aws_iam.Role
+        :param task_role: See DjangoServiceStack class docstring for more
+            information.
+        :type task_role: aws_iam.Role
+        :param secrets: The secrets to inject into the worker containers. This
+            will likely be `DjangoServiceStack.django_secrets`.
+        :type secrets: dict
+        :param env_vars: The environment variables to set in the worker
+            containers. This will likely be `DjangoServiceStack.django_env_vars`.
+        :type env_vars: dict
+        :param log_group: The log group for the worker services.
+        :type log_group: aws_logs.LogGroup
+        :param security_group: The security group for the worker services.
+        :type security_group: aws_ec2.SecurityGroup
+
+        :raises ValueError: If a worker pool has an unknown setting, no queues,
+            a `min_capacity` greater than its `max_capacity`, a `stop_timeout`
+            above 120, or an invalid capacity provider mix.
+        :raises ValueError: If the placement is invalid. See
+            `placement.service_placement`.
+        """
+        # Extract custom kwargs for this local class
+        app_tag_name = kwargs.pop("app_tag_name", "app")
+        app_tag_value = kwargs.pop("app_tag_value", "myapp")
+        worker_pools = kwargs.pop("worker_pools", {"default": {}})
+        celery_app = kwargs.pop("celery_app", "config.celery_app")
+        backlog_metric_namespace = kwargs.pop(
+            "backlog_metric_namespace", "YeastRegulatoryDB/Celery"
+        )
+        environment_files = kwargs.pop("environment_files", None)
+        cpu_architecture = kwargs.pop(
+            "cpu_architecture", aws_ecs.CpuArchitecture.X86_64
+        )
+        placement = kwargs.pop("placement", "public-subnet")
+        db_writer_availability_zone = kwargs.pop("db_writer_availability_zone", None)
+        backlog_publisher = kwargs.pop("backlog_publisher", True)
+
+        # Call the parent constructor
+        super().__init__(scope, id, **kwargs)
+
+        placement_kwargs = service_placement(
+            vpc, placement, db_writer_availability_zone
+        )
+
+        self.worker_pools = {}
+        for pool_name, pool_overrides in worker_pools.items():
+            unknown = set(pool_overrides) - set(DEFAULT_WORKER_POOL)
+            if unknown:
+                raise ValueError(
+                    f"Unknown settings for worker pool {pool_name}: {sorted(unknown)}"
+                )
+            pool = {**DEFAULT_WORKER_POOL, **pool_overrides}
+            if not pool["queues"]:
+                raise ValueError(f"Worker pool {pool_name} must consume a queue.")
+            if pool["min_capacity"] > pool["max_capacity"]:
+                raise ValueError(
+                    f"min_capacity of worker pool {pool_name} is greater "
+                    "than its max_capacity."
+                )
+            if pool["stop_timeout"] > FARGATE_MAX_STOP_TIMEOUT:
+                raise ValueError(
+                    f"stop_timeout of worker pool {pool_name} exceeds the "
+                    f"{FARGATE_MAX_STOP_TIMEOUT} seconds Fargate allows."
+                )
+            self.worker_pools[pool_name] = pool
+
+        # the backlog publisher sends the metric with the task role
+        task_role.add_to_principal_policy(
+            aws_iam.PolicyStatement(
+                actions=["cloudwatch:PutMetricData"],
+                resources=["*"],
+                conditions={
+                    "StringEquals": {"cloudwatch:namespace": backlog_metric_namespace}
+                },
+            )
+        )
+
+        self.services = {}
+        for pool_name, pool in self.worker_pools.items():
+            construct_id = "CeleryWorker" + pool_name.title().replace("-", "")
+            queues = ",".join(pool["queues"])
+
+            task_definition = aws_ecs.FargateTaskDefinition(
+                self,
+                construct_id + "TaskDefinition",
+                cpu=pool["cpu"],
+                memory_limit_mib=pool["memory_limit_mib"],
+                runtime_platform=aws_ecs.RuntimePlatform(
+                    cpu_architecture=cpu_architecture,
+                    operating_system_family=aws_ecs.OperatingSystemFamily.LINUX,
+                ),
+                execution_role=execution_role,
+                task_role=task_role,
+            )
+
+            task_definition.add_container(
+                "celeryworker",
+                image=aws_ecs.ContainerImage.from_registry(image_uri),
+                command=[
+                    "celery",
+                    "-A",
+                    celery_app,
+                    "worker",
+                    "-l",
+                    "INFO",
+                    "-n",
+                    pool_name + "@%h",
+                    "-Q",
+                    queues,
+                    "--concurrency",
+                    str(pool["concurrency"]),
+                    "--prefetch-multiplier",
+                    str(pool["prefetch_multiplier"]),
+                ],
+                environment={
+                    **env_vars,
+                    "CELERY_WORKER_POOL": pool_name,
+                    "CELERY_WORKER_QUEUES": queues,
+                    "CELERY_BACKLOG_METRIC_NAMESPACE": backlog_metric_namespace,
+                },
+                secrets=secrets,
+                environment_files=environment_files,
+                logging=aws_ecs.LogDriver.aws_logs(
+                    stream_prefix="celery-" + pool_name, log_group=log_group
+                ),
+                # celery finishes the running tasks on SIGTERM
+                stop_timeout=Duration.seconds(pool["stop_timeout"]),
+            )
+
+            service = aws_ecs.FargateService(
+                self,
+                construct_id + "Service",
+                cluster=cluster,
+                task_definition=task_definition,
+                capacity_provider_strategies=capacity_provider_strategies(
+                    pool["on_demand_base"],
+                    pool["on_demand_weight"],
+                    pool["spot_weight"],
+                ),
+                desired_count=pool["min_capacity"],
+                security_groups=[security_group],
+                **placement_kwargs,
+                task_definition_revision=aws_ecs.TaskDefinitionRevision.LATEST,
+                enable_execute_command=True,
+            )
+            record_subnet_count(service, vpc, placement_kwargs["vpc_subnets"])
+            if placement == "private-spread":
+                enable_az_rebalancing(service)
+
+            # Step scaling on the total backlog of the queues this pool consumes
+            backlog_metrics = {
+                f"q{i}": aws_cloudwatch.Metric(
+                    namespace=backlog_metric_namespace,
+                    metric_name="QueueBacklog",
+                    dimensions_map={"Queue": queue},
+                    statistic="Maximum",
+                    period=Duration.minutes(1),
+                )
+                for i, queue in enumerate(pool["queues"])
+            }
+            if len(backlog_metrics) == 1:
+                backlog_metric = backlog_metrics["q0"]
+            else:
+                backlog_metric = aws_cloudwatch.MathExpression(
+                    expression="+".join(backlog_metrics),
+                    using_metrics=backlog_metrics,
+                    label="QueueBacklog",
+                    period=Duration.minutes(1),
+                )
+
+            threshold = pool["backlog_scale_out_threshold"]
+            scaling = service.auto_scale_task_count(
+                min_capacity=pool["min_capacity"], max_capacity=pool["max_capacity"]
+            )
+            scaling.scale_on_metric(
+                construct_id + "BacklogScaling",
+                metric=backlog_metric,
+                scaling_steps=[
+                    aws_applicationautoscaling.ScalingInterval(upper=1, change=0),
+                    aws_applicationautoscaling.ScalingInterval(lower=1, change=+1),
+                    aws_applicationautoscaling.ScalingInterval(
+                        lower=threshold, change=+2
+                    ),
+                    aws_applicationautoscaling.ScalingInterval(
+                        lower=threshold * 5, change=+4
+                    ),
+                ],
+                adjustment_type=aws_applicationautoscaling.AdjustmentType.CHANGE_IN_CAPACITY,
+                cooldown=Duration.seconds(60),
+            )
+            # Scale in on its own alarm, which needs an empty backlog for
+            # several minutes, since workers may still run reserved tasks
+            scaling.scale_on_metric(
+                construct_id + "BacklogScaleIn",
+                metric=backlog_metric,
+                scaling_steps=[
+                    aws_applicationautoscaling.ScalingInterval(upper=0, change=-1),
+                    aws_applicationautoscaling.ScalingInterval(lower=1, change=0),
+                ],
+                adjustment_type=aws_applicationautoscaling.AdjustmentType.CHANGE_IN_CAPACITY,
+                evaluation_periods=pool["scale_in_evaluation_periods"],
+                cooldown=Duration.seconds(300),
+            )
+
+            self.services[pool_name] = service
+
+            for resource in [task_definition, service]:
+                Tags.of(resource).add(app_tag_name, app_tag_value)
+
+        # Publish the backlog the pools scale on
+        self.backlog_publisher = None
+        if backlog_publisher:
+            publisher_task_definition = aws_ecs.FargateTaskDefinition(
+                self,
+                "CeleryBacklogPublisherTaskDefinition",
+                cpu=256,
+                memory_limit_mib=512,
+                runtime_platform=aws_ecs.RuntimePlatform(
+                    cpu_architecture=cpu_architecture,
+                    operating_system_family=aws_ecs.OperatingSystemFamily.LINUX,
+                ),
+                execution_role=execution_role,
+                task_role=task_role,
+            )
+            publisher_task_definition.add_container(
+                "backlogpublisher",
+                image=aws_ecs.ContainerImage.from_registry(image_uri),
+                command=["python", "-c", BACKLOG_PUBLISHER_SCRIPT],
+                environment={
+                    **env_vars,
+                    "CELERY_BACKLOG_QUEUES": ",".join(
+                        sorted(
+                            {
+                                queue
+                                for pool in self.worker_pools.values()
+                                for queue in pool["queues"]
+                            }
+                        )
+                    ),
+                    "CELERY_BACKLOG_METRIC_NAMESPACE": backlog_metric_namespace,
+                },
+                secrets=secrets,
+                environment_files=environment_files,
+                logging=aws_ecs.LogDriver.aws_logs(
+                    stream_prefix="celery-backlog-publisher", log_group=log_group
+                ),
+            )
+            self.backlog_publisher = aws_ecs.FargateService(
+                self,
+                "CeleryBacklogPublisherService",
+                cluster=cluster,
+                task_definition=publisher_task_definition,
+                desired_count=1,
+                security_groups=[security_group],
+                **placement_kwargs,
+                task_definition_revision=aws_ecs.TaskDefinitionRevision.LATEST,
+            )
+            record_subnet_count(
+                self.backlog_publisher, vpc, placement_kwargs["vpc_subnets"]
+            )
+            suppress(
+                self.backlog_publisher,
+                "single-task-service",
+                "The publisher sends one datapoint a minute.",
+            )
+
+            for resource in [publisher_task_definition, self.backlog_publisher]:
+                Tags.of(resource).add(app_tag_name, app_tag_value)
@@ -1,8 +1,40 @@
-from aws_cdk import (Aws, Stack, Tags, aws_ec2, aws_ecs, aws_elasticache,
-                     aws_elasticloadbalancingv2, aws_iam, aws_logs, aws_rds,
-                     aws_s3, aws_secretsmanager)
+from typing import Union
+
+from aws_cdk import (Aws, Duration, Size, Stack, Tags, aws_ec2, aws_ecs,
+                     aws_elasticache, aws_elasticloadbalancingv2, aws_iam,
+                     aws_logs, aws_rds, aws_s3, aws_secretsmanager)
 from constructs import Construct
 
+from .capacity_providers import capacity_provider_strategies
+from .placement import (enable_az_rebalancing, record_subnet_count,
+                        service_placement)
+from .RedisStack import redis_endpoints
+
+# Memory a gunicorn worker process needs, including the django app
+GUNICORN_WORKER_MEMORY_MIB = 256
+
+
+def gunicorn_concurrency(cpu: int, memory_limit_mib: int, threads: int = 2) -> dict:
+    """Size the gunicorn workers of a task from its CPU and memory
+
+    gunicorn recommends (2 x vCPUs) + 1 worker processes, since a worker
+    spends much of a request waiting on the database. This is reduced if
+    the task does not have the memory for that many workers.
+
+    :param cpu: The CPU units of the task, where 1024 is one vCPU.
+    :type cpu: int
+    :param memory_limit_mib: The memory of the task.
+    :type memory_limit_mib: int
+    :param threads: The number of threads per worker. Default is 2.
+    :type threads: int
+
+    :return: A dictionary with the keys `web_concurrency` and `threads`.
+    :rtype: dict
+    """
+    workers = int(2 * cpu / 1024) + 1
+    workers = min(workers, memory_limit_mib // GUNICORN_WORKER_MEMORY_MIB)
+    return {"web_concurrency": max(workers, 1), "threads": threads}
+
 
 class DjangoServiceStack(Stack):
     def __init__(
@@ -14,12 +46,14 @@ class DjangoServiceStack(Stack):
         database_name: str,
         execution_role: aws_iam.Role,
         task_role: aws_iam.Role,
-        redis_instance: aws_elasticache.CfnCacheCluster,
+        redis_instance: Union[
+            aws_elasticache.CfnCacheCluster, aws_elasticache.CfnReplicationGroup
+        ],
         db_proxy: aws_rds.CfnDBProxy,
         db_secret: aws_secretsmanager.Secret,
         log_group: aws_logs.LogGroup,
         security_group: aws_ec2.SecurityGroup,
-        listener: aws_elasticloadbalancingv2.ApplicationListener,
+        target_group: aws_elasticloadbalancingv2.ApplicationTargetGroup,
         **kwargs
     ) -> None:
         """Create a Django ECS service
@@ -35,6 +69,126 @@ class DjangoServiceStack(Stack):
             None.
         - env_filename: The path to the environment file in the S3 bucket. Default
             is None.
+        - redis_broker_instance: The Elasticache Redis instance to use as the
+            celery broker, eg `RedisStack.broker_instance`. Default is
+            `redis_instance`.
+        - db_read_hosts: A list of read-only database endpoints, eg
+            `RDSStack.db_read_hosts`. The first is set as `POSTGRES_READ_HOST`
+            and all of them, comma separated, as `POSTGRES_READ_HOSTS` for a
+            django database router. Default is None, in which case both are
+            the `db_proxy` endpoint.
+        - static_bucket_name: The bucket for the static files
+            (`AWS_STORAGE_BUCKET_NAME`), eg
+            `StorageStack.static_bucket.bucket_name`. Default is
+            "yeastregulatorydb-strides-test".
+        - media_bucket_name: The bucket for uploaded files
+            (`DJANGO_AWS_STORAGE_BUCKET_NAME`), eg
+            `StorageStack.media_bucket.bucket_name`. Default is
+            "yeastregulatorydb-strides-tmp".
+        - cdn_domain_name: The domain which serves the static files, ie one
+            of the `CDNStack` domain_names. If set, it is passed as
+            `DJANGO_STATIC_CUSTOM_DOMAIN`, which the static files storage
+            should use as its custom domain, so that django links to the CDN
+            rather than serving the files itself. `DJANGO_AWS_S3_CUSTOM_DOMAIN`
+            is not set, since django-storages would apply it to the media
+            storage as well and link to uploaded files without presigned URLs.
+            Default is None.
+        - debug: The value of `DJANGO_DEBUG`. With DEBUG, django keeps every
+            SQL query of a request in memory. Default is True.
+        - on_demand_base: The number of tasks which always run on FARGATE.
+            Default is 0.
+        - on_demand_weight: The relative share of FARGATE for the tasks beyond
+            the base. Default is 1.
+        - spot_weight: The relative share of FARGATE_SPOT for the tasks beyond
+            the base. Default is 0, which does not use Spot. See
+            `capacity_providers`.
+        - placement: The subnets the tasks run in. One of "public-subnet",
+            "private-spread" or "writer-az". See `placement`. Default is
+            "public-subnet".
+        - db_writer_availability_zone: The AZ of the RDS writer, eg
+            `RDSStack.db_writer_availability_zone`. Required for the
+            "writer-az" placement. Default is None.
+        - cpu: The CPU units of the task. Default is 1024.
+        - memory_limit_mib: The memory of the task. Default is 2048.
+        - ephemeral_storage_gib: The ephemeral storage of the task, between 21
+            and 200. Default is None, which is 20 GiB.
+        - cpu_architecture: The CPU architecture of the task, eg
+            aws_ecs.CpuArchitecture.ARM64 for Graviton. The image must be built
+            for it. Default is aws_ecs.CpuArchitecture.X86_64.
+        - web_concurrency: The number of gunicorn worker processes per task
+            (`WEB_CONCURRENCY`). Default is None, in which case it is derived
+            from `cpu` and `memory_limit_mib`. See `gunicorn_concurrency`.
+        - threads: The number of threads per gunicorn worker, passed as
+            `--threads` in `GUNICORN_CMD_ARGS`. Default is None, in which case
+            it is 2.
+        - keep_alive: Seconds gunicorn keeps an idle connection open, passed
+            as `--keep-alive` in `GUNICORN_CMD_ARGS`. This must be longer than
+            the `idle_timeout` of the load balancer, otherwise gunicorn may
+            close a connection as the load balancer reuses it and the client
+            gets a 502. Default is 65.
+        - conn_max_age: Seconds django keeps a database connection open
+            (`CONN_MAX_AGE`). Default is 60.
+        - health_check_path: The path probed by the container health check.
+            This should match `TargetGroupStack` `health_check_path`. The
+            load balancer probes with the task IP as the Host header, so
+            django must answer the path whatever the host, eg by exempting it
+            from the ALLOWED_HOSTS check. Default is "/".
+        - container_health_check: Whether to add a health check to the django
+            container. It requests `health_check_path` with the python of the
+            image, since curl may not be installed. Only enable it once the
+            image serves `health_check_path`, or ECS replaces every task.
+            Default is False.
+        - health_check_host: The Host header of the container health check.
+            It must be in django's ALLOWED_HOSTS, or django answers 400.
+            Default is "localhost".
+        - health_check_interval: Seconds between container health checks.
+            Default is 30.
+        - health_check_timeout: Seconds to wait for a container health check.
+            Default is 5.
+        - health_check_retries: Consecutive failed container health checks
+            before the container is unhealthy. Default is 3.
+        - health_check_start_period: Seconds after the container starts during
+            which failed container health checks do not count, eg while
+            gunicorn loads django. Default is 60.
+        - health_check_grace_period: Seconds after a task starts during which
+            the service ignores failed load balancer health checks. Default is
+            60.
+        - cluster_name: The name of the ECS cluster, which is unique in an
+            account and region. Default is "DjangoAppCluster".
+        - container_insights: Whether to enable CloudWatch Container Insights
+            on the cluster. Default is False.
+        - tracing: Whether to add an AWS Distro for OpenTelemetry (ADOT)
+            collector sidecar which exports traces to X-Ray. The django
+            container receives the `OTEL_*` variables to send OTLP traces to
+            it, eg when started with `opentelemetry-instrument`. Default is
+            False.
+        - tracing_sample_rate: The fraction of requests traced when no
+            upstream sampling decision exists. Default is 0.05.
+        - adot_image: The image of the collector. Default is
+            "public.ecr.aws/aws-observability/aws-otel-collector:v0.36.0".
+        - log_mode: The delivery mode of the awslogs driver. In BLOCKING mode
+            a write to stdout waits when CloudWatch Logs is slow, which stalls
+            the request that logs. In NON_BLOCKING mode the lines are buffered
+            in memory and dropped once the buffer is full. Default is
+            aws_ecs.AwsLogDriverMode.BLOCKING.
+        - log_max_buffer_size_mib: The size of the NON_BLOCKING buffer in MiB.
+            Ignored in BLOCKING mode. Default is 25.
+        - min_capacity: The minimum number of tasks the service may scale in
+            to. This is also the initial desired count. Default is 1.
+        - max_capacity: The maximum number of tasks the service may scale out
+            to. Default is 4.
+        - cpu_target_utilization: The target average CPU utilization (percent)
+            for the CPU target tracking policy. Default is 70.
+        - memory_target_utilization: The target average memory utilization
+            (percent) for the memory target tracking policy. Default is 75.
+        - requests_per_target: The target number of ALB requests per task
+            (`RequestCountPerTarget`) for the request count target tracking
+            policy. Set to None to disable request count scaling. Default is
+            500.
+        - scale_in_cooldown: Seconds to wait after a scale in activity before
+            another can start. Default is 300.
+        - scale_out_cooldown: Seconds to wait after a scale out activity before
+            another can start. Default is 60.
 
         If s3_bucket and env_filename are passed, then an environment file will
         be used to set environment variables for the ECS service. If only one
@@ -60,7 +214,12 @@ class DjangoServiceStack(Stack):
             tasks.
         :type task_role: aws_iam.Role
         :param redis_instance: The Elasticache Redis instance to connect to.
-        :type redis_instance: aws_elasticache.CfnCacheCluster
+            This is either `RedisStack.cache_cluster` or
+            `RedisStack.replication_group`. If it has read replicas, the reader
+            endpoint is set as `REDIS_READ_HOST`. This is used as the django
+            cache (`CACHE_URL`).
+        :type redis_instance: Union[aws_elasticache.CfnCacheCluster,
+            aws_elasticache.CfnReplicationGroup]
         :param db_proxy: The RDS database proxy to connect to.
         :type db_proxy: aws_rds.CfnDBProxy
         :param db_secret: The RDS database secrets to connect to.
@@ -69,11 +228,19 @@ class DjangoServiceStack(Stack):
         :type log_group: aws_logs.LogGroup
         :param security_group: The security group for the ECS service.
         :type security_group: aws_ec2.SecurityGroup
-        :param listener: The listener for the ECS service.
-        :type listener: aws_elasticloadbalancingv2.ApplicationListener
+        :param target_group: The target group to register the ECS service
+            with. This will likely be `TargetGroupStack.django_target_group`,
+            which is the default action of `ALBStack.https_listener`.
+        :type target_group: aws_elasticloadbalancingv2.ApplicationTargetGroup
 
         :raises ValueError: If `env_filename` is provided without `s3_bucket` or
             vice versa.
+        :raises ValueError: If `min_capacity` is less than 1 or greater than
+            `max_capacity`.
+        :raises ValueError: If the placement is invalid. See
+            `placement.service_placement`.
+        :raises ValueError: If the capacity provider base or weights are
+            invalid. See `capacity_providers.capacity_provider_strategies`.
         """
         # Extract custom kwargs for this local class
         app_tag_name = kwargs.pop("app_tag_name", "app")
@@ -81,6 +248,55 @@ class DjangoServiceStack(Stack):
         postgres_port = kwargs.pop("postgres_port", "5432")
         s3_bucket = kwargs.pop("s3_bucket", None)
         env_filename = kwargs.pop("env_filename", None)
+        redis_broker_instance = kwargs.pop("redis_broker_instance", redis_instance)
+        db_read_hosts = kwargs.pop("db_read_hosts", None) or [db_proxy.endpoint]
+        static_bucket_name = kwargs.pop(
+            "static_bucket_name", "yeastregulatorydb-strides-test"
+        )
+        media_bucket_name = kwargs.pop(
+            "media_bucket_name", "yeastregulatorydb-strides-tmp"
+        )
+        cdn_domain_name = kwargs.pop("cdn_domain_name", None)
+        debug = kwargs.pop("debug", True)
+        on_demand_base = kwargs.pop("on_demand_base", 0)
+        on_demand_weight = kwargs.pop("on_demand_weight", 1)
+        spot_weight = kwargs.pop("spot_weight", 0)
+        placement = kwargs.pop("placement", "public-subnet")
+        db_writer_availability_zone = kwargs.pop("db_writer_availability_zone", None)
+        cpu = kwargs.pop("cpu", 1024)
+        memory_limit_mib = kwargs.pop("memory_limit_mib", 2048)
+        ephemeral_storage_gib = kwargs.pop("ephemeral_storage_gib", None)
+        cpu_architecture = kwargs.pop(
+            "cpu_architecture", aws_ecs.CpuArchitecture.X86_64
+        )
+        web_concurrency = kwargs.pop("web_concurrency", None)
+        threads = kwargs.pop("threads", None)
+        keep_alive = kwargs.pop("keep_alive", 65)
+        conn_max_age = kwargs.pop("conn_max_age", 60)
+        health_check_path = kwargs.pop("health_check_path", "/")
+        container_health_check = kwargs.pop("container_health_check", False)
+        health_check_host = kwargs.pop("health_check_host", "localhost")
+        health_check_interval = kwargs.pop("health_check_interval", 30)
+        health_check_timeout = kwargs.pop("health_check_timeout", 5)
+        health_check_retries = kwargs.pop("health_check_retries", 3)
+        health_check_start_period = kwargs.pop("health_check_start_period", 60)
+        health_check_grace_period = kwargs.pop("health_check_grace_period", 60)
+        cluster_name = kwargs.pop("cluster_name", "DjangoAppCluster")
+        container_insights = kwargs.pop("container_insights", False)
+        tracing = kwargs.pop("tracing", False)
+        tracing_sample_rate = kwargs.pop("tracing_sample_rate", 0.05)
+        adot_image = kwargs.pop(
+            "adot_image", "public.ecr.aws/aws-observability/aws-otel-collector:v0.36.0"
+        )
+        log_mode = kwargs.pop("log_mode", aws_ecs.AwsLogDriverMode.BLOCKING)
+        log_max_buffer_size_mib = kwargs.pop("log_max_buffer_size_mib", 25)
+        min_capacity = kwargs.pop("min_capacity", 1)
+        max_capacity = kwargs.pop("max_capacity", 4)
+        cpu_target_utilization = kwargs.pop("cpu_target_utilization", 70)
+        memory_target_utilization = kwargs.pop("memory_target_utilization", 75)
+        requests_per_target = kwargs.pop("requests_per_target", 500)
+        scale_in_cooldown = kwargs.pop("scale_in_cooldown", 300)
+        scale_out_cooldown = kwargs.pop("scale_out_cooldown", 60)
 
         # Call the parent constructor
         super().__init__(scope, id, **kwargs)
@@ -94,6 +310,15 @@ class DjangoServiceStack(Stack):
             raise ValueError(
                 "If you provide an S3 bucket, you must also provide an environment file path."
             )
+        if min_capacity < 1 or min_capacity > max_capacity:
+            raise ValueError(
+                "min_capacity must be at least 1 and no greater than max_capacity."
+            )
+
+        placement_kwargs = service_placement(
+            vpc, placement, db_writer_availability_zone
+        )
+
         if env_filename is not None and s3_bucket is not None:
             # Get a reference to the S3 bucket
             s3_bucket_obj = aws_s3.Bucket.from_bucket_name(
@@ -106,6 +331,15 @@ class DjangoServiceStack(Stack):
             ]
         else:
             environment_file = None
+        self.environment_file = environment_file
+
+        # Fill in the gunicorn settings which are not given
+        concurrency = gunicorn_concurrency(cpu, memory_limit_mib)
+        self.web_concurrency = web_concurrency or concurrency["web_concurrency"]
+        self.threads = threads or concurrency["threads"]
+
+        redis = redis_endpoints(redis_instance)
+        broker = redis_endpoints(redis_broker_instance)
 
         # These environmental variables may be used to the celery services
         # these take precedence over the environment file
@@ -115,17 +349,38 @@ class DjangoServiceStack(Stack):
         self.django_env_vars = {
             "AWS_DEFAULT_REGION": Aws.REGION,
             "AWS_S3_REGION_NAME": Aws.REGION,
-            "REDIS_HOST": redis_instance.attr_redis_endpoint_address,
-            "REDIS_PORT": str(redis_instance.attr_redis_endpoint_port),
+            "REDIS_HOST": redis["host"],
+            "REDIS_PORT": redis["port"],
+            "REDIS_READ_HOST": redis["read_host"],
+            "CACHE_URL": f"redis://{redis['host']}:{redis['port']}/0",
+            "CELERY_BROKER_URL": f"redis://{broker['host']}:{broker['port']}/0",
             "POSTGRES_HOST": db_proxy.endpoint,
+            "POSTGRES_READ_HOST": db_read_hosts[0],
+            "POSTGRES_READ_HOSTS": ",".join(db_read_hosts),
             "POSTGRES_PORT": postgres_port,
             "POSTGRES_DB": database_name,
-            "DJANGO_DEBUG": "true",
-            "WEB_CONCURRENCY": "1",
+            "DJANGO_DEBUG": "true" if debug else "false",
+            "WEB_CONCURRENCY": str(self.web_concurrency),
+            "GUNICORN_CMD_ARGS": (
+                f"--threads {self.threads} --keep-alive {keep_alive}"
+            ),
             "DJANGO_SECURE_SSL_REDIRECT": "False",
-            "DJANGO_AWS_STORAGE_BUCKET_NAME": "yeastregulatorydb-strides-tmp",
-            "AWS_STORAGE_BUCKET_NAME": "yeastregulatorydb-strides-test",
-            "CONN_MAX_AGE": "60",
+            "DJANGO_AWS_STORAGE_BUCKET_NAME": media_bucket_name,
+            "AWS_STORAGE_BUCKET_NAME": static_bucket_name,
+            "CONN_MAX_AGE": str(conn_max_age),
+        }
+        if cdn_domain_name is not None:
+            self.django_env_vars["DJANGO_STATIC_CUSTOM_DOMAIN"] = cdn_domain_name
+
+        # Database credentials injected into the django container. These are
+        # exposed so that the celery services can reuse them
+        self.django_secrets = {
+            "POSTGRES_USER": aws_ecs.Secret.from_secrets_manager(
+                db_secret, field="username"
+            ),
+            "POSTGRES_PASSWORD": aws_ecs.Secret.from_secrets_manager(
+                db_secret, field="password"
+            ),
         }
 
         # Define the ECS Cluster
@@ -133,38 +388,83 @@ class DjangoServiceStack(Stack):
             self,
             "DjangoAppEcsCluster",
             vpc=vpc,
-            cluster_name="DjangoAppCluster",
+            cluster_name=cluster_name,
             enable_fargate_capacity_providers=True,
+            container_insights=container_insights,
         )
 
         # Define the Task Definition
         task_definition = aws_ecs.FargateTaskDefinition(
             self,
             "DjangoTaskDefinition",
-            cpu=1024,  # Example CPU units
-            memory_limit_mib=2048,  # Example Memory
+            cpu=cpu,
+            memory_limit_mib=memory_limit_mib,
+            ephemeral_storage_gib=ephemeral_storage_gib,
+            runtime_platform=aws_ecs.RuntimePlatform(
+                cpu_architecture=cpu_architecture,
+                operating_system_family=aws_ecs.OperatingSystemFamily.LINUX,
+            ),
             execution_role=execution_role,
             task_role=task_role,
         )
 
+        # Probe the container from inside the task, so that ECS replaces a
+        # hung container even if it is not registered with the load balancer
+        if container_health_check:
+            health_check = aws_ecs.HealthCheck(
+                command=[
+                    "CMD-SHELL",
+                    "python -c \"import urllib.request; urllib.request.urlopen("
+                    "urllib.request.Request("
+                    f"'http://localhost:5000{health_check_path}', "
+                    f"headers={{'Host': '{health_check_host}'}}), "
+                    f"timeout={health_check_timeout})\" || exit 1",
+                ],
+                interval=Duration.seconds(health_check_interval),
+                timeout=Duration.seconds(health_check_timeout),
+                retries=health_check_retries,
+                start_period=Duration.seconds(health_check_start_period),
+            )
+        else:
+            health_check = None
+
+        # The OTEL variables are not part of django_env_vars, since the celery
+        # and Flower tasks have no collector to send traces to
+        container_env_vars = dict(self.django_env_vars)
+        if tracing:
+            container_env_vars.update(
+                {
+                    "OTEL_SERVICE_NAME": "django",
+                    "OTEL_EXPORTER_OTLP_ENDPOINT": "http://localhost:4317",
+                    "OTEL_EXPORTER_OTLP_PROTOCOL": "grpc",
+                    "OTEL_PROPAGATORS": "xray,tracecontext",
+                    "OTEL_PYTHON_ID_GENERATOR": "xray",
+                    "OTEL_TRACES_SAMPLER": "parentbased_traceidratio",
+                    "OTEL_TRACES_SAMPLER_ARG": str(tracing_sample_rate),
+                    "OTEL_METRICS_EXPORTER": "none",
+                }
+            )
+
+        def log_driver(stream_prefix: str) -> aws_ecs.LogDriver:
+            return aws_ecs.LogDriver.aws_logs(
+                stream_prefix=stream_prefix,
+                log_group=log_group,
+                mode=log_mode,
+                max_buffer_size=Size.mebibytes(log_max_buffer_size_mib)
+                if log_mode == aws_ecs.AwsLogDriverMode.NON_BLOCKING
+                else None,
+            )
+
         # Add container to the task definition
         container = task_definition.add_container(
             "django",
             image=aws_ecs.ContainerImage.from_registry(image_uri),
             command=["/start"],
-            environment=self.django_env_vars,
-            secrets={
-                "POSTGRES_USER": aws_ecs.Secret.from_secrets_manager(
-                    db_secret, field="username"
-                ),
-                "POSTGRES_PASSWORD": aws_ecs.Secret.from_secrets_manager(
-                    db_secret, field="password"
-                ),
-            },
+            environment=container_env_vars,
+            secrets=self.django_secrets,
             environment_files=environment_file,
-            logging=aws_ecs.LogDriver.aws_logs(
-                stream_prefix="ecs", log_group=log_group
-            ),
+            health_check=health_check,
+            logging=log_driver("ecs"),
         )
 
         # Add port mappings if necessary
@@ -172,39 +472,88 @@ class DjangoServiceStack(Stack):
             aws_ecs.PortMapping(container_port=5000, protocol=aws_ecs.Protocol.TCP)
         )
 
+        # ADOT collector sidecar. The default config receives OTLP on 4317
+        # and 4318 and exports traces to X-Ray
+        self.otel_collector = None
+        if tracing:
+            self.otel_collector = task_definition.add_container(
+                "aws-otel-collector",
+                image=aws_ecs.ContainerImage.from_registry(adot_image),
+                command=["--config=/etc/ecs/ecs-default-config.yaml"],
+                essential=False,
+                memory_reservation_mib=128,
+                logging=log_driver("otel"),
+            )
+            container.add_container_dependencies(
+                aws_ecs.ContainerDependency(
+                    container=self.otel_collector,
+                    condition=aws_ecs.ContainerDependencyCondition.START,
+                )
+            )
+            task_role.add_to_principal_policy(
+                aws_iam.PolicyStatement(
+                    actions=[
+                        "xray:PutTraceSegments",
+                        "xray:PutTelemetryRecords",
+                        "xray:GetSamplingRules",
+                        "xray:GetSamplingTargets",
+                        "xray:GetSamplingStatisticSummaries",
+                    ],
+                    resources=["*"],
+                )
+            )
+
         # Define the ECS Service
         service = aws_ecs.FargateService(
             self,
             "DjangoService",
             cluster=cluster,
             task_definition=task_definition,
-            capacity_provider_strategies=[
-                aws_ecs.CapacityProviderStrategy(capacity_provider="FARGATE", weight=1)
-            ],
-            desired_count=1,
-            security_groups=[security_group],
-            assign_public_ip=True,
-            vpc_subnets=aws_ec2.SubnetSelection(
-                subnets=[
-                    vpc.select_subnets(subnet_type=aws_ec2.SubnetType.PUBLIC).subnets[0]
-                ]
+            capacity_provider_strategies=capacity_provider_strategies(
+                on_demand_base, on_demand_weight, spot_weight
             ),
+            desired_count=min_capacity,
+            health_check_grace_period=Duration.seconds(health_check_grace_period),
+            security_groups=[security_group],
+            **placement_kwargs,
             task_definition_revision=aws_ecs.TaskDefinitionRevision.LATEST,
             enable_execute_command=True,
         )
+        record_subnet_count(service, vpc, placement_kwargs["vpc_subnets"])
+        if placement == "private-spread":
+            enable_az_rebalancing(service)
 
-        # Register the service with the HTTPS listener
-        listener.add_targets(
-            "DjangoTargets",
-            priority=10,
-            port=5000,
-            protocol=aws_elasticloadbalancingv2.ApplicationProtocol.HTTP,
-            targets=[service],
-            conditions=[
-                aws_elasticloadbalancingv2.ListenerCondition.path_patterns(["/*"])
-            ],
-            health_check={"path": "/"},
+        # Register the service with the Django target group
+        service.attach_to_application_target_group(target_group)
+        self.django_target_group = target_group
+
+        # Target tracking autoscaling on CPU, memory and ALB requests per task
+        self.scalable_task_count = service.auto_scale_task_count(
+            min_capacity=min_capacity, max_capacity=max_capacity
+        )
+        self.scalable_task_count.scale_on_cpu_utilization(
+            "DjangoCpuScaling",
+            target_utilization_percent=cpu_target_utilization,
+            scale_in_cooldown=Duration.seconds(scale_in_cooldown),
+            scale_out_cooldown=Duration.seconds(scale_out_cooldown),
+        )
+        self.scalable_task_count.scale_on_memory_utilization(
+            "DjangoMemoryScaling",
+            target_utilization_percent=memory_target_utilization,
+            scale_in_cooldown=Duration.seconds(scale_in_cooldown),
+            scale_out_cooldown=Duration.seconds(scale_out_cooldown),
         )
+        if requests_per_target is not None:
+            self.scalable_task_count.scale_on_request_count(
+                "DjangoRequestCountScaling",
+                requests_per_target=requests_per_target,
+                target_group=self.django_target_group,
+                scale_in_cooldown=Duration.seconds(scale_in_cooldown),
+                scale_out_cooldown=Duration.seconds(scale_out_cooldown),
+            )
+
+        self.cluster = cluster
+        self.service = service
 
         # Add tags to resources
         for resource in [cluster, task_definition, service]:
@@ -0,0 +1,177 @@
+from aws_cdk import (Stack, Tags, aws_ec2, aws_ecs, aws_elasticloadbalancingv2,
+                     aws_iam, aws_logs)
+from constructs import Construct
+
+from .capacity_providers import capacity_provider_strategies
+from .placement import (enable_az_rebalancing, record_subnet_count,
+                        service_placement)
+
+
+class FlowerServiceStack(Stack):
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        vpc: aws_ec2.Vpc,
+        cluster: aws_ecs.Cluster,
+        image_uri: str,
+        execution_role: aws_iam.Role,
+        task_role: aws_iam.Role,
+        secrets: dict,
+        env_vars: dict,
+        log_group: aws_logs.LogGroup,
+        security_group: aws_ec2.SecurityGroup,
+        target_group: aws_elasticloadbalancingv2.ApplicationTargetGroup,
+        **kwargs
+    ) -> None:
+        """Create a Flower ECS service registered to the Flower target group
+
+        Flower reads the same Redis broker as the django and celery services
+        because it receives the same environment variables.
+
+        The following additional keyword arguments are configured:
+
+        - app_tag_name: The name of the tag to apply to all resources. Default
+            is "app".
+        - app_tag_value: The value of the tag to apply to all resources. Default
+            is "myapp".
+        - cpu: The CPU units of the Flower task. Default is 256.
+        - memory_limit_mib: The memory of the Flower task. Default is 512.
+        - flower_port: The port Flower listens on. This must match the port of
+            `target_group`. Default is 5555.
+        - command: The container command. Default is ["/start-flower"].
+        - environment_files: A list of environment files to add to the Flower
+            container. See `DjangoServiceStack.environment_file`. Default is
+            None.
+        - cpu_architecture: The CPU architecture of the Flower task. This must
+            match the image, which is shared with the django service. Default
+            is aws_ecs.CpuArchitecture.X86_64.
+        - on_demand_base: The number of tasks which always run on FARGATE.
+            Default is 0.
+        - on_demand_weight: The relative share of FARGATE for the tasks beyond
+            the base. Default is 1.
+        - spot_weight: The relative share of FARGATE_SPOT for the tasks beyond
+            the base. Default is 0, which does not use Spot. See
+            `capacity_providers`.
+        - placement: The subnets the Flower task runs in. One of "public-subnet",
+            "private-spread" or "writer-az". See `placement`. Default is
+            "public-subnet".
+        - db_writer_availability_zone: The AZ of the RDS writer, eg
+            `RDSStack.db_writer_availability_zone`. Required for the
+            "writer-az" placement. Default is None.
+
+        :param scope: See VPCStack class docstring for more information.
+        :type scope: Construct
+        :param id: See VPCStack class docstring for more information.
+        :type id: str
+        :param vpc: See SecurityGroupStack class docstring for more information.
+        :type vpc: aws_ec2.Vpc
+        :param cluster: See CeleryWorkerServiceStack class docstring for more
+            information.
+        :type cluster: aws_ecs.Cluster
+        :param image_uri: See DjangoServiceStack class docstring for more
+            information.
+        :type image_uri: str
+        :param execution_role: See DjangoServiceStack class docstring for more
+            information.
+        :type execution_role: aws_iam.Role
+        :param task_role: See DjangoServiceStack class docstring for more
+            information.
+        :type task_role: aws_iam.Role
+        :param secrets: See CeleryWorkerServiceStack class docstring for more
+            information.
+        :type secrets: dict
+        :param env_vars: See CeleryWorkerServiceStack class docstring for more
+            information.
+        :type env_vars: dict
+        :param log_group: The log group for the Flower service.
+        :type log_group: aws_logs.LogGroup
+        :param security_group: The security group for the Flower service.
+        :type security_group: aws_ec2.SecurityGroup
+        :param target_group: The target group to register the Flower service
+            with. This will likely be `TargetGroupStack.flower_target_group`.
+        :type target_group: aws_elasticloadbalancingv2.ApplicationTargetGroup
+
+        :raises ValueError: If the placement is invalid. See
+            `placement.service_placement`.
+        :raises ValueError: If the capacity provider base or weights are
+            invalid. See `capacity_providers.capacity_provider_strategies`.
+        """
+        # Extract custom kwargs for this local class
+        app_tag_name = kwargs.pop("app_tag_name", "app")
+        app_tag_value = kwargs.pop("app_tag_value", "myapp")
+        cpu = kwargs.pop("cpu", 256)
+        memory_limit_mib = kwargs.pop("memory_limit_mib", 512)
+        flower_port = kwargs.pop("flower_port", 5555)
+        command = kwargs.pop("command", ["/start-flower"])
+        environment_files = kwargs.pop("environment_files", None)
+        cpu_architecture = kwargs.pop(
+            "cpu_architecture", aws_ecs.CpuArchitecture.X86_64
+        )
+        on_demand_base = kwargs.pop("on_demand_base", 0)
+        on_demand_weight = kwargs.pop("on_demand_weight", 1)
+        spot_weight = kwargs.pop("spot_weight", 0)
+        placement = kwargs.pop("placement", "public-subnet")
+        db_writer_availability_zone = kwargs.pop("db_writer_availability_zone", None)
+
+        # Call the parent constructor
+        super().__init__(scope, id, **kwargs)
+
+        placement_kwargs = service_placement(
+            vpc, placement, db_writer_availability_zone
+        )
+
+        # Define the Task Definition
+        task_definition = aws_ecs.FargateTaskDefinition(
+            self,
+            "FlowerTaskDefinition",
+            cpu=cpu,
+            memory_limit_mib=memory_limit_mib,
+            runtime_platform=aws_ecs.RuntimePlatform(
+                cpu_architecture=cpu_architecture,
+                operating_system_family=aws_ecs.OperatingSystemFamily.LINUX,
+            ),
+            execution_role=execution_role,
+            task_role=task_role,
+        )
+
+        container = task_definition.add_container(
+            "flower",
+            image=aws_ecs.ContainerImage.from_registry(image_uri),
+            command=command,
+            environment=env_vars,
+            secrets=secrets,
+            environment_files=environment_files,
+            logging=aws_ecs.LogDriver.aws_logs(
+                stream_prefix="flower", log_group=log_group
+            ),
+        )
+
+        container.add_port_mappings(
+            aws_ecs.PortMapping(container_port=flower_port, protocol=aws_ecs.Protocol.TCP)
+        )
+
+        # Define the ECS Service
+        self.service = aws_ecs.FargateService(
+            self,
+            "FlowerService",
+            cluster=cluster,
+            task_definition=task_definition,
+            capacity_provider_strategies=capacity_provider_strategies(
+                on_demand_base, on_demand_weight, spot_weight
+            ),
+            desired_count=1,
+            security_groups=[security_group],
+            **placement_kwargs,
+            task_definition_revision=aws_ecs.TaskDefinitionRevision.LATEST,
+            enable_execute_command=True,
+        )
+        record_subnet_count(self.service, vpc, placement_kwargs["vpc_subnets"])
+        if placement == "private-spread":
+            enable_az_rebalancing(self.service)
+
+        # Register the service with the Flower target group
+        self.service.attach_to_application_target_group(target_group)
+
+        for resource in [task_definition, self.service]:
+            Tags.of(resource).add(app_tag_name, app_tag_value)
@@ -1,4 +1,4 @@
-from aws_cdk import RemovalPolicy, Stack, Tags, aws_logs
+from aws_cdk import RemovalPolicy, Stack, Tags, aws_cloudwatch, aws_logs
 from constructs import Construct
 
 
@@ -11,8 +11,54 @@ class LogGroupStack(Stack):
         retention: aws_logs.RetentionDays = aws_logs.RetentionDays.ONE_WEEK,
         **kwargs
     ):
+        """Create the log group of the ECS services
+
+        With `access_log_metrics`, metric filters turn JSON access log lines,
+        eg `{"view": "api:genome-list", "status": 200, "duration_ms": 41.2}`,
+        into CloudWatch metrics in `access_log_metrics_namespace`:
+
+        - RequestDuration: The value of the duration field in milliseconds,
+            with the dimension View. Use the p95 and p99 statistics for the
+            latency of each view.
+        - RequestCount: 1 per request, with the dimensions View and Status.
+
+        The view must be a string and the status and duration numbers. Other
+        lines are ignored, so the filters may share the log group with other output.
+
+        The following additional keyword arguments are configured:
+
+        - app_tag_name: The name of the tag to apply to all resources. Default
+            is "app".
+        - app_tag_value: The value of the tag to apply to all resources. Default
+            is "myapp".
+        - access_log_metrics: Whether to create the metric filters. Default is
+            False.
+        - access_log_metrics_namespace: Default is "Django".
+        - access_log_view_field: The JSON field with the view name. Default is
+            "view".
+        - access_log_status_field: The JSON field with the response status.
+            Default is "status".
+        - access_log_duration_field: The JSON field with the request duration
+            in milliseconds. Default is "duration_ms".
+
+        :param scope: See VPCStack class docstring for more information.
+        :type scope: Construct
+        :param id: See VPCStack class docstring for more information.
+        :type id: str
+        :param log_group_name: The name of the log group.
+        :type log_group_name: str
+        :param retention: Default is one week.
+        :type retention: aws_logs.RetentionDays
+        """
         app_tag_name = kwargs.pop("app_tag_name", "app")
         app_tag_value = kwargs.pop("app_tag_value", "myapp")
+        access_log_metrics = kwargs.pop("access_log_metrics", False)
+        access_log_metrics_namespace = kwargs.pop(
+            "access_log_metrics_namespace", "Django"
+        )
+        view_field = "$." + kwargs.pop("access_log_view_field", "view")
+        status_field = "$." + kwargs.pop("access_log_status_field", "status")
+        duration_field = "$." + kwargs.pop("access_log_duration_field", "duration_ms")
         super().__init__(scope, id, **kwargs)
 
         # Create the CloudWatch Log Group
@@ -27,3 +73,59 @@ class LogGroupStack(Stack):
 
         # Apply tags to the log group
         Tags.of(self.log_group).add(app_tag_name, app_tag_value)
+
+        # Metric filters on the JSON access log lines. A filter with
+        # dimensions cannot have a default value, so the metrics have no
+        # datapoints while there is no traffic
+        self.request_duration_filter = None
+        self.request_count_filter = None
+        if access_log_metrics:
+            self.request_duration_filter = aws_logs.MetricFilter(
+                self,
+                "RequestDurationFilter",
+                log_group=self.log_group,
+                filter_pattern=aws_logs.FilterPattern.all(
+                    aws_logs.FilterPattern.exists(view_field),
+                    aws_logs.FilterPattern.number_value(duration_field, ">=", 0),
+                ),
+                metric_namespace=access_log_metrics_namespace,
+                metric_name="RequestDuration",
+                metric_value=duration_field,
+                dimensions={"View": view_field},
+                unit=aws_cloudwatch.Unit.MILLISECONDS,
+            )
+            self.request_count_filter = aws_logs.MetricFilter(
+                self,
+                "RequestCountFilter",
+                log_group=self.log_group,
+                filter_pattern=aws_logs.FilterPattern.all(
+                    aws_logs.FilterPattern.exists(view_field),
+                    aws_logs.FilterPattern.number_value(status_field, ">", 0),
+                ),
+                metric_namespace=access_log_metrics_namespace,
+                metric_name="RequestCount",
+                metric_value="1",
+                dimensions={"View": view_field, "Status": status_field},
+                unit=aws_cloudwatch.Unit.COUNT,
+            )
+
+    def request_duration_metric(
+        self, view: str, statistic: str = "p99"
+    ) -> aws_cloudwatch.Metric:
+        """Get the RequestDuration metric of one view
+
+        :param view: The view name, as logged.
+        :type view: str
+        :param statistic: Eg "p95" or "p99". Default is "p99".
+        :type statistic: str
+
+        :return: The metric, eg for a dashboard widget or an alarm.
+        :rtype: aws_cloudwatch.Metric
+
+        :raises ValueError: If the stack has no access log metrics.
+        """
+        if self.request_duration_filter is None:
+            raise ValueError("The log group has no access log metrics.")
+        return self.request_duration_filter.metric(
+            statistic=statistic, dimensions_map={"View": view}
+        )
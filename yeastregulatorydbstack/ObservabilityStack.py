@@ -0,0 +1,343 @@
+from typing import Union
+
+from aws_cdk import (Duration, Stack, Tags, aws_cloudwatch,
+                     aws_cloudwatch_actions, aws_elasticloadbalancingv2,
+                     aws_rds, aws_sns, aws_sns_subscriptions)
+from constructs import Construct
+
+from .RedisStack import redis_node_ids
+
+
+class ObservabilityStack(Stack):
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        alb: aws_elasticloadbalancingv2.ApplicationLoadBalancer,
+        target_group: aws_elasticloadbalancingv2.ApplicationTargetGroup,
+        services: dict,
+        database: Union[aws_rds.DatabaseInstance, aws_rds.DatabaseCluster],
+        db_proxy: aws_rds.DatabaseProxy,
+        redis_instances: dict,
+        **kwargs
+    ) -> None:
+        """Create a performance dashboard and alarms for the application
+
+        The dashboard has a row each for the load balancer (target response
+        time percentiles, request count and 5xx rate), the ECS services (CPU
+        and memory), the database (CPU, freeable memory, read and write
+        latency, connections), the RDS Proxy (borrow latency and client
+        connections) and Redis (engine CPU, memory and evictions).
+
+        An alarm is created for each threshold below and stored in `alarms`,
+        keyed on the construct id. The alarms notify `alarm_topic`.
+
+        The following additional keyword arguments are configured:
+
+        - app_tag_name: The name of the tag to apply to all resources. Default
+            is "app".
+        - app_tag_value: The value of the tag to apply to all resources. Default
+            is "myapp".
+        - dashboard_name: Default is None, in which case CloudFormation
+            generates the name.
+        - alarm_emails: Email addresses subscribed to `alarm_topic`. Default is
+            None.
+        - period: The period of the metrics in seconds. Default is 60.
+        - evaluation_periods: The number of periods an alarm looks at. Default
+            is 5.
+        - datapoints_to_alarm: The number of breaching periods, out of
+            `evaluation_periods`, which trigger an alarm. Default is 3.
+        - p99_latency_threshold: Seconds of p99 target response time. Default
+            is 2.
+        - error_rate_threshold: Percent of requests answered with a 5xx by the
+            targets or the load balancer. Default is 1.
+        - service_cpu_threshold: Percent CPU utilization of each service.
+            Default is 85.
+        - service_memory_threshold: Percent memory utilization of each service.
+            Default is 85.
+        - db_cpu_threshold: Percent CPU utilization of the database. Default
+            is 80.
+        - db_freeable_memory_threshold_mib: Default is 100.
+        - db_connections_threshold: Database connections, eg
+            `RDSStack.connection_budget["available_connections"]`. Default is
+            None, which creates no alarm.
+        - proxy_borrow_latency_threshold: Milliseconds a client waits for a
+            connection from the RDS Proxy pool (p99). Default is 100.
+        - redis_cpu_threshold: Percent engine CPU utilization of each Redis
+            node. Default is 80.
+        - redis_memory_threshold: Percent of `maxmemory` used by each Redis
+            node. Default is 85.
+
+        :param scope: See VPCStack class docstring for more information.
+        :type scope: Construct
+        :param id: See VPCStack class docstring for more information.
+        :type id: str
+        :param alb: The load balancer. This will likely be `ALBStack.alb`.
+        :type alb: aws_elasticloadbalancingv2.ApplicationLoadBalancer
+        :param target_group: The target group of the django service. This will
+            likely be `TargetGroupStack.django_target_group`.
+        :type target_group: aws_elasticloadbalancingv2.ApplicationTargetGroup
+        :param services: A dictionary of name to ECS service, eg
+            `{"django": DjangoServiceStack.service}` and the services of
+            `CeleryWorkerServiceStack.services`.
+        :type services: dict
+        :param database: The database. This will likely be
+            `RDSStack.db_instance` or `RDSStack.db_cluster`.
+        :type database: Union[aws_rds.DatabaseInstance, aws_rds.DatabaseCluster]
+        :param db_proxy: The RDS Proxy. This will likely be `RDSStack.db_proxy`.
+        :type db_proxy: aws_rds.DatabaseProxy
+        :param redis_instances: A dictionary of name to Redis instance, eg
+            `{"cache": RedisStack.redis_instance}`. An instance which appears
+            more than once is only monitored once.
+        :type redis_instances: dict
+        """
+        # Extract custom kwargs for this local class
+        app_tag_name = kwargs.pop("app_tag_name", "app")
+        app_tag_value = kwargs.pop("app_tag_value", "myapp")
+        dashboard_name = kwargs.pop("dashboard_name", None)
+        alarm_emails = kwargs.pop("alarm_emails", None) or []
+        period = Duration.seconds(kwargs.pop("period", 60))
+        evaluation_periods = kwargs.pop("evaluation_periods", 5)
+        datapoints_to_alarm = kwargs.pop("datapoints_to_alarm", 3)
+        p99_latency_threshold = kwargs.pop("p99_latency_threshold", 2)
+        error_rate_threshold = kwargs.pop("error_rate_threshold", 1)
+        service_cpu_threshold = kwargs.pop("service_cpu_threshold", 85)
+        service_memory_threshold = kwargs.pop("service_memory_threshold", 85)
+        db_cpu_threshold = kwargs.pop("db_cpu_threshold", 80)
+        db_freeable_memory_threshold_mib = kwargs.pop(
+            "db_freeable_memory_threshold_mib", 100
+        )
+        db_connections_threshold = kwargs.pop("db_connections_threshold", None)
+        proxy_borrow_latency_threshold = kwargs.pop(
+            "proxy_borrow_latency_threshold", 100
+        )
+        redis_cpu_threshold = kwargs.pop("redis_cpu_threshold", 80)
+        redis_memory_threshold = kwargs.pop("redis_memory_threshold", 85)
+
+        # Call the parent constructor
+        super().__init__(scope, id, **kwargs)
+
+        self.alarm_topic = aws_sns.Topic(self, "AlarmTopic")
+        for email in alarm_emails:
+            self.alarm_topic.add_subscription(
+                aws_sns_subscriptions.EmailSubscription(email)
+            )
+        alarm_action = aws_cloudwatch_actions.SnsAction(self.alarm_topic)
+        self.alarms = {}
+
+        def add_alarm(construct_id, metric, threshold, comparison_operator):
+            alarm = metric.create_alarm(
+                self,
+                construct_id,
+                threshold=threshold,
+                comparison_operator=comparison_operator,
+                evaluation_periods=evaluation_periods,
+                datapoints_to_alarm=datapoints_to_alarm,
+                treat_missing_data=aws_cloudwatch.TreatMissingData.NOT_BREACHING,
+            )
+            alarm.add_alarm_action(alarm_action)
+            alarm.add_ok_action(alarm_action)
+            self.alarms[construct_id] = alarm
+            return alarm
+
+        above = aws_cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD
+        below = aws_cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD
+
+        # Load balancer
+        alb_dimensions = {
+            "LoadBalancer": alb.load_balancer_full_name,
+            "TargetGroup": target_group.target_group_full_name,
+        }
+
+        def alb_metric(metric_name, statistic, dimensions=alb_dimensions):
+            return aws_cloudwatch.Metric(
+                namespace="AWS/ApplicationELB",
+                metric_name=metric_name,
+                dimensions_map=dimensions,
+                statistic=statistic,
+                period=period,
+            )
+
+        latency = {
+            percentile: alb_metric("TargetResponseTime", percentile)
+            for percentile in ["p50", "p95", "p99"]
+        }
+        requests = alb_metric("RequestCount", "Sum")
+        error_rate = aws_cloudwatch.MathExpression(
+            expression="100 * (FILL(target5xx, 0) + FILL(elb5xx, 0)) / requests",
+            using_metrics={
+                "target5xx": alb_metric("HTTPCode_Target_5XX_Count", "Sum"),
+                "elb5xx": alb_metric(
+                    "HTTPCode_ELB_5XX_Count",
+                    "Sum",
+                    {"LoadBalancer": alb.load_balancer_full_name},
+                ),
+                "requests": requests,
+            },
+            label="5xx rate (%)",
+            period=period,
+        )
+        add_alarm("DjangoP99LatencyAlarm", latency["p99"], p99_latency_threshold, above)
+        add_alarm("DjangoErrorRateAlarm", error_rate, error_rate_threshold, above)
+
+        # ECS services
+        service_cpu = {}
+        service_memory = {}
+        for name, service in services.items():
+            construct_name = name.title().replace("-", "")
+            service_cpu[name] = service.metric_cpu_utilization(
+                period=period, label=name
+            )
+            service_memory[name] = service.metric_memory_utilization(
+                period=period, label=name
+            )
+            add_alarm(
+                construct_name + "CpuAlarm",
+                service_cpu[name],
+                service_cpu_threshold,
+                above,
+            )
+            add_alarm(
+                construct_name + "MemoryAlarm",
+                service_memory[name],
+                service_memory_threshold,
+                above,
+            )
+
+        # Database
+        def db_metric(metric_name, statistic="Average"):
+            return database.metric(metric_name, statistic=statistic, period=period)
+
+        db_cpu = db_metric("CPUUtilization")
+        db_freeable_memory = db_metric("FreeableMemory", "Minimum")
+        db_connections = db_metric("DatabaseConnections", "Maximum")
+        add_alarm("DatabaseCpuAlarm", db_cpu, db_cpu_threshold, above)
+        add_alarm(
+            "DatabaseFreeableMemoryAlarm",
+            db_freeable_memory,
+            db_freeable_memory_threshold_mib * 1024 * 1024,
+            below,
+        )
+        if db_connections_threshold is not None:
+            add_alarm(
+                "DatabaseConnectionsAlarm",
+                db_connections,
+                db_connections_threshold,
+                above,
+            )
+
+        # RDS Proxy. The borrow latency is in microseconds
+        def proxy_metric(metric_name, statistic):
+            return aws_cloudwatch.Metric(
+                namespace="AWS/RDS",
+                metric_name=metric_name,
+                dimensions_map={"ProxyName": db_proxy.db_proxy_name},
+                statistic=statistic,
+                period=period,
+            )
+
+        borrow_latency = proxy_metric("DatabaseConnectionsBorrowLatency", "p99")
+        add_alarm(
+            "ProxyBorrowLatencyAlarm",
+            borrow_latency,
+            proxy_borrow_latency_threshold * 1000,
+            above,
+        )
+
+        # Redis, per node
+        def redis_metric(node_id, label, metric_name, statistic):
+            return aws_cloudwatch.Metric(
+                namespace="AWS/ElastiCache",
+                metric_name=metric_name,
+                dimensions_map={"CacheClusterId": node_id},
+                statistic=statistic,
+                period=period,
+                label=label,
+            )
+
+        redis_cpu = []
+        redis_memory = []
+        redis_evictions = []
+        monitored = []
+        for name, redis_instance in redis_instances.items():
+            if any(redis_instance is instance for instance in monitored):
+                continue
+            monitored.append(redis_instance)
+            for i, node_id in enumerate(redis_node_ids(redis_instance), start=1):
+                label = f"{name} {i}"
+                construct_name = f"Redis{name.title()}{i}"
+                redis_cpu.append(
+                    redis_metric(node_id, label, "EngineCPUUtilization", "Average")
+                )
+                redis_memory.append(
+                    redis_metric(
+                        node_id, label, "DatabaseMemoryUsagePercentage", "Maximum"
+                    )
+                )
+                redis_evictions.append(
+                    redis_metric(node_id, label, "Evictions", "Sum")
+                )
+                add_alarm(
+                    construct_name + "CpuAlarm",
+                    redis_cpu[-1],
+                    redis_cpu_threshold,
+                    above,
+                )
+                add_alarm(
+                    construct_name + "MemoryAlarm",
+                    redis_memory[-1],
+                    redis_memory_threshold,
+                    above,
+                )
+
+        def graph(title, left, right=None, width=8):
+            return aws_cloudwatch.GraphWidget(
+                title=title, left=left, right=right or [], width=width
+            )
+
+        self.dashboard = aws_cloudwatch.Dashboard(
+            self,
+            "PerformanceDashboard",
+            dashboard_name=dashboard_name,
+            widgets=[
+                [
+                    graph("Target response time", list(latency.values())),
+                    graph("Requests and 5xx rate", [requests], [error_rate]),
+                    aws_cloudwatch.AlarmStatusWidget(
+                        title="Alarms", alarms=list(self.alarms.values()), width=8
+                    ),
+                ],
+                [
+                    graph("Service CPU (%)", list(service_cpu.values()), width=12),
+                    graph(
+                        "Service memory (%)", list(service_memory.values()), width=12
+                    ),
+                ],
+                [
+                    graph("Database CPU (%)", [db_cpu], width=6),
+                    graph("Database freeable memory", [db_freeable_memory], width=6),
+                    graph(
+                        "Database latency",
+                        [db_metric("ReadLatency"), db_metric("WriteLatency")],
+                        width=6,
+                    ),
+                    graph("Database connections", [db_connections], width=6),
+                ],
+                [
+                    graph("Proxy borrow latency (us)", [borrow_latency], width=12),
+                    graph(
+                        "Proxy client connections",
+                        [proxy_metric("ClientConnections", "Maximum")],
+                        width=12,
+                    ),
+                ],
+                [
+                    graph("Redis engine CPU (%)", redis_cpu),
+                    graph("Redis memory (%)", redis_memory),
+                    graph("Redis evictions", redis_evictions),
+                ],
+            ],
+        )
+
+        for resource in [self.alarm_topic, self.dashboard]:
+            Tags.of(resource).add(app_tag_name, app_tag_value)
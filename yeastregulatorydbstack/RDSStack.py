@@ -1,7 +1,10 @@
-from aws_cdk import (CfnOutput, Stack, Tags, aws_ec2, aws_iam, aws_rds,
-                     aws_secretsmanager)
+from aws_cdk import (CfnOutput, Duration, Stack, Tags, aws_ec2, aws_iam,
+                     aws_rds, aws_secretsmanager)
 from constructs import Construct
 
+from .connection_budget import proxy_pool_settings
+from .postgres_parameters import ACU_PER_VCPU, GIB_PER_ACU, postgres_parameters
+
 
 class RDSStack(Stack):
     def __init__(
@@ -12,7 +15,24 @@ class RDSStack(Stack):
         postgres_sg: aws_ec2.SecurityGroup,
         **kwargs
     ):
-        """Create a PostgreSQL RDS instance and RDS Proxy
+        """Create a PostgreSQL RDS instance or Aurora cluster and RDS Proxy
+
+        With `engine_mode` "instance" (the default), a `DatabaseInstance` is
+        created and stored in `db_instance`. Optionally, read replicas of the
+        instance are created. RDS Proxy only supports read-only endpoints for
+        Aurora, so the replicas are reached directly.
+
+        With `engine_mode` "aurora-serverless-v2", an Aurora PostgreSQL
+        `DatabaseCluster` with a Serverless v2 writer and `num_read_replicas`
+        Serverless v2 readers is created and stored in `db_cluster`. If there
+        are readers, a read-only proxy endpoint is added and stored in
+        `db_proxy_read_endpoint`.
+
+        In both modes, the proxy is stored in `db_proxy` and the credentials in
+        `db_secret`. The read-only endpoints are stored in `db_read_hosts` and
+        the first is stored in `db_read_host`. With no replicas or readers,
+        `db_read_host` is the proxy endpoint so that reads still go through
+        the proxy.
 
         The following additional keyword arguments are configured:
 
@@ -20,8 +40,71 @@ class RDSStack(Stack):
             is "app".
         - app_tag_value: The value of the tag to apply to all resources. Default
             is "myapp".
+        - engine_mode: Either "instance" or "aurora-serverless-v2". Default is
+            "instance".
+        - serverless_v2_min_capacity: The minimum Aurora capacity units of
+            each Serverless v2 instance. Default is 0.5.
+        - serverless_v2_max_capacity: The maximum Aurora capacity units of
+            each Serverless v2 instance. The parameter profile is sized for
+            this capacity. Default is 4.
+        - instance_class: The instance class of the database. Only used if
+            `engine_mode` is "instance". Default is
+            aws_ec2.InstanceClass.BURSTABLE3.
+        - instance_size: The instance size of the database. Default is
+            aws_ec2.InstanceSize.MICRO.
+        - availability_zone: The AZ of the instance, so that services using
+            the "writer-az" placement can run next to it. Stored in
+            `db_writer_availability_zone`. Only used if `engine_mode` is
+            "instance". Default is None, in which case RDS chooses.
+        - allocated_storage: The allocated storage in GiB. This and the other
+            storage settings below are only used if `engine_mode` is
+            "instance". Default is 20.
+        - storage_type: The storage type, eg aws_rds.StorageType.GP3. Default
+            is None, the CDK default (gp2).
+        - iops: The provisioned IOPS. Only allowed for gp3 and io1 storage,
+            and for gp3 only with at least 400 GiB of allocated storage.
+            Default is None.
+        - storage_throughput: The gp3 storage throughput in MiB/s. This is only
+            allowed with at least 400 GiB of allocated storage. Default is
+            None.
+        - max_allocated_storage: The upper limit in GiB to which storage
+            autoscaling may grow the storage. Default is None, which disables
+            storage autoscaling.
+        - enable_performance_insights: Whether to enable Performance Insights.
+            Default is False.
+        - performance_insights_retention: The Performance Insights retention.
+            Default is aws_rds.PerformanceInsightRetention.DEFAULT (7 days).
+        - monitoring_interval: The enhanced monitoring interval in seconds.
+            One of 0, 1, 5, 10, 15, 30 or 60, where 0 disables enhanced
+            monitoring. Default is 0.
         - max_connections: The maximum number of connections to the database.
-            Default is "200".
+            Default is None, in which case it is derived from the instance
+            class by the parameter profile.
+        - parameter_profile: The tuning profile used to derive the database
+            parameters from the instance class. One of "oltp" or "analytics".
+            See `postgres_parameters`. Default is "oltp".
+        - parameter_overrides: A dictionary of database parameters which
+            replace the values derived by the parameter profile. Default is
+            None.
+        - num_read_replicas: The number of read replicas of the instance, or
+            readers of the Aurora cluster. Default is 0.
+        - connection_demands: A dictionary of service name to the number of
+            database connections it holds at full scale. See
+            `connection_budget.connection_demand`. The total is checked
+            against the share of `max_connections` the proxy may use, which
+            is fixed by `reserved_connections_percent`.
+            Default is None, which is treated as no demand.
+        - reserved_connections_percent: The percent of `max_connections` the
+            proxy may not use, kept for migrations and admin sessions.
+            Default is 10.
+        - db_proxy_name: The name of the proxy, which is unique in an account
+            and region. A read-only endpoint of an Aurora cluster is named
+            after it. Default is "mydbproxy".
+        - borrow_timeout: Seconds a client waits for a connection from the
+            proxy pool before the proxy returns an error. Default is 30.
+        - session_pinning_filters: The proxy session pinning filters. Default
+            is [aws_rds.SessionPinningFilter.EXCLUDE_VARIABLE_SETS], since
+            django sets the time zone on every new connection.
 
         :param scope: See VPCStack class docstring for more information.
         :type scope: Construct
@@ -31,14 +114,109 @@ class RDSStack(Stack):
         :type vpc: aws_ec2.Vpc
         :param postgres_sg: The security group for the RDS instance.
         :type postgres_sg: aws_ec2.SecurityGroup
+
+        :raises ValueError: If the `connection_demands` exceed the connections
+            available to the services.
+        :raises ValueError: If `engine_mode` is unknown.
+        :raises ValueError: If `iops` or `storage_throughput` is set for a
+            storage type which does not support it, or for gp3 storage under
+            400 GiB, `max_allocated_storage` is less than
+            `allocated_storage`, or `monitoring_interval` is not allowed.
         """
 
         app_tag_name = kwargs.pop("app_tag_name", "app")
         app_tag_value = kwargs.pop("app_tag_value", "myapp")
-        max_connections = kwargs.pop("max_connections", "200")
+        engine_mode = kwargs.pop("engine_mode", "instance")
+        serverless_v2_min_capacity = kwargs.pop("serverless_v2_min_capacity", 0.5)
+        serverless_v2_max_capacity = kwargs.pop("serverless_v2_max_capacity", 4)
+        instance_class = kwargs.pop("instance_class", aws_ec2.InstanceClass.BURSTABLE3)
+        instance_size = kwargs.pop("instance_size", aws_ec2.InstanceSize.MICRO)
+        availability_zone = kwargs.pop("availability_zone", None)
+        allocated_storage = kwargs.pop("allocated_storage", 20)
+        storage_type = kwargs.pop("storage_type", None)
+        iops = kwargs.pop("iops", None)
+        storage_throughput = kwargs.pop("storage_throughput", None)
+        max_allocated_storage = kwargs.pop("max_allocated_storage", None)
+        enable_performance_insights = kwargs.pop("enable_performance_insights", False)
+        performance_insights_retention = kwargs.pop(
+            "performance_insights_retention",
+            aws_rds.PerformanceInsightRetention.DEFAULT,
+        )
+        monitoring_interval = kwargs.pop("monitoring_interval", 0)
+        max_connections = kwargs.pop("max_connections", None)
+        parameter_profile = kwargs.pop("parameter_profile", "oltp")
+        parameter_overrides = kwargs.pop("parameter_overrides", None) or {}
+        num_read_replicas = kwargs.pop("num_read_replicas", 0)
+        connection_demands = kwargs.pop("connection_demands", None) or {}
+        reserved_connections_percent = kwargs.pop("reserved_connections_percent", 10)
+        db_proxy_name = kwargs.pop("db_proxy_name", "mydbproxy")
+        borrow_timeout = kwargs.pop("borrow_timeout", 30)
+        session_pinning_filters = kwargs.pop(
+            "session_pinning_filters",
+            [aws_rds.SessionPinningFilter.EXCLUDE_VARIABLE_SETS],
+        )
 
         super().__init__(scope, id, **kwargs)
 
+        if engine_mode not in ("instance", "aurora-serverless-v2"):
+            raise ValueError(
+                'engine_mode must be either "instance" or "aurora-serverless-v2".'
+            )
+        if iops is not None and storage_type not in (
+            aws_rds.StorageType.GP3,
+            aws_rds.StorageType.IO1,
+        ):
+            raise ValueError("iops can only be provisioned for gp3 or io1 storage.")
+        if (
+            storage_throughput is not None
+            and storage_type != aws_rds.StorageType.GP3
+        ):
+            raise ValueError(
+                "storage_throughput can only be provisioned for gp3 storage."
+            )
+        if (
+            storage_type == aws_rds.StorageType.GP3
+            and (iops is not None or storage_throughput is not None)
+            and allocated_storage < 400
+        ):
+            raise ValueError(
+                "gp3 IOPS and throughput can only be provisioned with at least "
+                "400 GiB of allocated storage."
+            )
+        if (
+            max_allocated_storage is not None
+            and max_allocated_storage < allocated_storage
+        ):
+            raise ValueError(
+                "max_allocated_storage must be at least allocated_storage."
+            )
+        if monitoring_interval not in (0, 1, 5, 10, 15, 30, 60):
+            raise ValueError(
+                "monitoring_interval must be one of 0, 1, 5, 10, 15, 30 or 60."
+            )
+
+        # Storage, monitoring and Performance Insights settings shared by the
+        # instance and its read replicas
+        performance_kwargs = {
+            "storage_type": storage_type,
+            "iops": iops,
+            "storage_throughput": storage_throughput,
+            "max_allocated_storage": max_allocated_storage,
+            "enable_performance_insights": enable_performance_insights,
+            "performance_insight_retention": (
+                performance_insights_retention if enable_performance_insights else None
+            ),
+            "monitoring_interval": (
+                Duration.seconds(monitoring_interval) if monitoring_interval else None
+            ),
+        }
+        cluster_instance_kwargs = {
+            "enable_performance_insights": enable_performance_insights,
+            "performance_insight_retention": performance_kwargs[
+                "performance_insight_retention"
+            ],
+        }
+
         # MyDBProxyRole
         self.db_proxy_role = aws_iam.Role(
             self,
@@ -74,14 +252,40 @@ class RDSStack(Stack):
             ),
         )
 
-        # Custom Parameter Group
+        # Custom Parameter Group with memory settings sized for the instance
+        if max_connections is not None:
+            parameter_overrides = {
+                "max_connections": max_connections,
+                **parameter_overrides,
+            }
+        if engine_mode == "aurora-serverless-v2":
+            engine = aws_rds.DatabaseClusterEngine.aurora_postgres(
+                version=aws_rds.AuroraPostgresEngineVersion.VER_15_2
+            )
+            # size the parameters for the largest the writer can scale to.
+            # Aurora sizes the buffer cache itself as the ACUs change
+            self.db_parameters = postgres_parameters(
+                profile=parameter_profile,
+                overrides=parameter_overrides,
+                vcpus=max(int(serverless_v2_max_capacity / ACU_PER_VCPU), 1),
+                memory_gib=serverless_v2_max_capacity * GIB_PER_ACU,
+            )
+            for aurora_managed in ["shared_buffers", "effective_cache_size"]:
+                if aurora_managed not in parameter_overrides:
+                    del self.db_parameters[aurora_managed]
+        else:
+            engine = aws_rds.DatabaseInstanceEngine.postgres(
+                version=aws_rds.PostgresEngineVersion.VER_15_2
+            )
+            instance_type = aws_ec2.InstanceType.of(instance_class, instance_size)
+            self.db_parameters = postgres_parameters(
+                instance_type.to_string(), parameter_profile, parameter_overrides
+            )
         custom_parameter_group = aws_rds.ParameterGroup(
             self,
             "MyCustomParameterGroup",
-            engine=aws_rds.DatabaseInstanceEngine.postgres(
-                version=aws_rds.PostgresEngineVersion.VER_15_2
-            ),
-            parameters={"max_connections": max_connections},
+            engine=engine,
+            parameters=self.db_parameters,
         )
 
         # DB Subnet Group
@@ -95,47 +299,143 @@ class RDSStack(Stack):
             ),
         )
 
-        # RDS Database Instance
-        db_instance = aws_rds.DatabaseInstance(
-            self,
-            "MyDBInstance",
-            engine=aws_rds.DatabaseInstanceEngine.postgres(
-                version=aws_rds.PostgresEngineVersion.VER_15_2
-            ),
-            instance_type=aws_ec2.InstanceType.of(
-                aws_ec2.InstanceClass.BURSTABLE3, aws_ec2.InstanceSize.MICRO
-            ),
-            vpc=vpc,
-            credentials=aws_rds.Credentials.from_secret(self.db_secret),
-            parameter_group=custom_parameter_group,
-            subnet_group=db_subnet_group,
-            allocated_storage=20,
+        # The proxy pool settings. This fails synth if the services can open
+        # more connections than the proxy may use
+        self.connection_budget = proxy_pool_settings(
+            int(self.db_parameters["max_connections"]),
+            connection_demands,
+            reserved_connections_percent,
         )
 
+        self.db_instance = None
+        self.db_cluster = None
+        self.db_writer_availability_zone = (
+            availability_zone if engine_mode == "instance" else None
+        )
+        self.db_read_replicas = []
+        if engine_mode == "aurora-serverless-v2":
+            # Aurora PostgreSQL cluster with a Serverless v2 writer and
+            # readers. Readers in promotion tier 0-1 scale with the writer
+            self.db_cluster = aws_rds.DatabaseCluster(
+                self,
+                "MyDBCluster",
+                engine=engine,
+                writer=aws_rds.ClusterInstance.serverless_v2(
+                    "writer", **cluster_instance_kwargs
+                ),
+                readers=[
+                    aws_rds.ClusterInstance.serverless_v2(
+                        f"reader{i}", scale_with_writer=True, **cluster_instance_kwargs
+                    )
+                    for i in range(1, num_read_replicas + 1)
+                ],
+                serverless_v2_min_capacity=serverless_v2_min_capacity,
+                serverless_v2_max_capacity=serverless_v2_max_capacity,
+                vpc=vpc,
+                credentials=aws_rds.Credentials.from_secret(self.db_secret),
+                parameter_group=custom_parameter_group,
+                subnet_group=db_subnet_group,
+                monitoring_interval=performance_kwargs["monitoring_interval"],
+            )
+            proxy_target = aws_rds.ProxyTarget.from_cluster(self.db_cluster)
+            db_resources = [self.db_cluster]
+            writer_endpoint = self.db_cluster.cluster_endpoint.hostname
+        else:
+            # RDS Database Instance
+            self.db_instance = aws_rds.DatabaseInstance(
+                self,
+                "MyDBInstance",
+                engine=engine,
+                instance_type=instance_type,
+                vpc=vpc,
+                credentials=aws_rds.Credentials.from_secret(self.db_secret),
+                parameter_group=custom_parameter_group,
+                subnet_group=db_subnet_group,
+                availability_zone=availability_zone,
+                allocated_storage=allocated_storage,
+                **performance_kwargs,
+            )
+            proxy_target = aws_rds.ProxyTarget.from_instance(self.db_instance)
+            db_resources = [self.db_instance]
+            writer_endpoint = self.db_instance.db_instance_endpoint_address
+
         # RDS Proxy
         self.db_proxy = aws_rds.DatabaseProxy(
             self,
             "MyDBProxy",
-            proxy_target=aws_rds.ProxyTarget.from_instance(db_instance),
+            proxy_target=proxy_target,
             secrets=[self.db_secret],
             vpc=vpc,
             role=self.db_proxy_role,
-            db_proxy_name="mydbproxy",
+            db_proxy_name=db_proxy_name,
             require_tls=False,
-            security_groups=[postgres_sg]
+            security_groups=[postgres_sg],
+            max_connections_percent=self.connection_budget["max_connections_percent"],
+            max_idle_connections_percent=self.connection_budget[
+                "max_idle_connections_percent"
+            ],
+            borrow_timeout=Duration.seconds(borrow_timeout),
+            session_pinning_filters=session_pinning_filters,
+        )
+
+        if self.db_cluster is not None:
+            # Read-only proxy endpoint which balances over the Aurora readers
+            self.db_proxy_read_endpoint = None
+            if num_read_replicas:
+                self.db_proxy_read_endpoint = aws_rds.CfnDBProxyEndpoint(
+                    self,
+                    "MyDBProxyReadOnlyEndpoint",
+                    db_proxy_endpoint_name=f"{db_proxy_name}-read-only",
+                    db_proxy_name=self.db_proxy.db_proxy_name,
+                    vpc_subnet_ids=vpc.select_subnets(
+                        subnet_type=aws_ec2.SubnetType.PRIVATE_WITH_EGRESS
+                    ).subnet_ids,
+                    vpc_security_group_ids=[postgres_sg.security_group_id],
+                    target_role="READ_ONLY",
+                )
+                db_resources.append(self.db_proxy_read_endpoint)
+            self.db_read_hosts = (
+                [self.db_proxy_read_endpoint.attr_endpoint]
+                if self.db_proxy_read_endpoint is not None
+                else []
+            )
+        else:
+            # Read replicas. These are in the postgres security group, which
+            # allows the django services to connect to them directly
+            self.db_read_replicas = [
+                aws_rds.DatabaseInstanceReadReplica(
+                    self,
+                    f"MyDBReadReplica{i}",
+                    source_database_instance=self.db_instance,
+                    instance_type=instance_type,
+                    vpc=vpc,
+                    parameter_group=custom_parameter_group,
+                    subnet_group=db_subnet_group,
+                    security_groups=[postgres_sg],
+                    **performance_kwargs,
+                )
+                for i in range(1, num_read_replicas + 1)
+            ]
+            self.db_read_hosts = [
+                replica.db_instance_endpoint_address
+                for replica in self.db_read_replicas
+            ]
+        self.db_read_host = (
+            self.db_read_hosts[0] if self.db_read_hosts else self.db_proxy.endpoint
         )
 
         for resource in [
             self.db_secret,
             custom_parameter_group,
             db_subnet_group,
-            db_instance,
             self.db_proxy,
+            *db_resources,
+            *self.db_read_replicas,
         ]:
             Tags.of(resource).add(app_tag_name, app_tag_value)
 
         # Outputs
-        CfnOutput(
-            self, "RDSInstanceEndpoint", value=db_instance.db_instance_endpoint_address
-        )
+        CfnOutput(self, "RDSInstanceEndpoint", value=writer_endpoint)
         CfnOutput(self, "RDSProxyEndpoint", value=self.db_proxy.endpoint)
+        for i, read_host in enumerate(self.db_read_hosts, start=1):
+            CfnOutput(self, f"RDSReadReplica{i}Endpoint", value=read_host)
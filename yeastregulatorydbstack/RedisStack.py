@@ -1,7 +1,107 @@
+from typing import Optional, Union
+
 from aws_cdk import CfnOutput, Stack, Tags, aws_ec2, aws_elasticache
 from constructs import Construct
 
 
+def redis_endpoints(
+    redis_instance: Union[
+        aws_elasticache.CfnCacheCluster, aws_elasticache.CfnReplicationGroup
+    ],
+) -> dict:
+    """Get the endpoints of a Redis cache cluster or replication group
+
+    A single node cache cluster and a cluster mode replication group have no
+    separate reader endpoint, so the read host is the same as the host.
+
+    :param redis_instance: The Redis resource, eg `RedisStack.cache_cluster`
+        or `RedisStack.replication_group`.
+    :type redis_instance: Union[aws_elasticache.CfnCacheCluster,
+        aws_elasticache.CfnReplicationGroup]
+
+    :return: A dictionary with the keys `host`, `port` and `read_host`.
+    :rtype: dict
+    """
+    if isinstance(redis_instance, aws_elasticache.CfnCacheCluster):
+        return {
+            "host": redis_instance.attr_redis_endpoint_address,
+            "port": str(redis_instance.attr_redis_endpoint_port),
+            "read_host": redis_instance.attr_redis_endpoint_address,
+        }
+    if redis_instance.cluster_mode == "enabled":
+        return {
+            "host": redis_instance.attr_configuration_end_point_address,
+            "port": str(redis_instance.attr_configuration_end_point_port),
+            "read_host": redis_instance.attr_configuration_end_point_address,
+        }
+    return {
+        "host": redis_instance.attr_primary_end_point_address,
+        "port": str(redis_instance.attr_primary_end_point_port),
+        "read_host": redis_instance.attr_reader_end_point_address,
+    }
+
+
+def redis_node_ids(
+    redis_instance: Union[
+        aws_elasticache.CfnCacheCluster, aws_elasticache.CfnReplicationGroup
+    ],
+) -> list:
+    """Get the cache cluster ids of the nodes of a Redis instance
+
+    ElastiCache publishes its host and engine metrics per node, with the
+    `CacheClusterId` dimension. The nodes of a replication group are named
+    after the group, eg "<group>-001" or, in cluster mode,
+    "<group>-0001-001".
+
+    :param redis_instance: The Redis resource, eg `RedisStack.redis_instance`.
+    :type redis_instance: Union[aws_elasticache.CfnCacheCluster,
+        aws_elasticache.CfnReplicationGroup]
+
+    :return: The `CacheClusterId` of each node.
+    :rtype: list
+    """
+    if isinstance(redis_instance, aws_elasticache.CfnCacheCluster):
+        return [redis_instance.ref]
+    if redis_instance.cluster_mode == "enabled":
+        return [
+            f"{redis_instance.ref}-{shard:04d}-{node:03d}"
+            for shard in range(1, redis_instance.num_node_groups + 1)
+            for node in range(1, redis_instance.replicas_per_node_group + 2)
+        ]
+    return [
+        f"{redis_instance.ref}-{node:03d}"
+        for node in range(1, redis_instance.num_cache_clusters + 1)
+    ]
+
+
+# ElastiCache parameters for each role a Redis instance can play. A shared
+# instance only evicts keys with a TTL (eg django cache keys), never the
+# celery queues, as with the default parameter group. The broker never evicts
+# and never closes idle connections.
+REDIS_PARAMETERS = {
+    "shared": {
+        "maxmemory-policy": "volatile-lru",
+        "timeout": "0",
+        "tcp-keepalive": "60",
+    },
+    "cache": {
+        "maxmemory-policy": "allkeys-lru",
+        "timeout": "300",
+        "tcp-keepalive": "60",
+    },
+    "broker": {
+        "maxmemory-policy": "noeviction",
+        "timeout": "0",
+        "tcp-keepalive": "60",
+    },
+}
+
+
+# The engine version pinned when a parameter group is created and no
+# `engine_version` is given. The parameter group family must match it.
+DEFAULT_ENGINE_VERSION = "7.1"
+
+
 class RedisStack(Stack):
     def __init__(
         self,
@@ -9,33 +109,216 @@ class RedisStack(Stack):
         id: str,
         vpc: aws_ec2.Vpc,
         redis_security_group_id: aws_ec2.SecurityGroup,
-        **kwargs
+        **kwargs,
     ) -> None:
+        """Create ElastiCache Redis for the django cache and the celery broker
+
+        By default a single node `CfnCacheCluster` is created and stored in
+        `cache_cluster`. If `replication_group` is True, a
+        `CfnReplicationGroup` with a primary and `num_replicas` read replicas
+        is created instead and stored in `replication_group`. In either case,
+        the resource is also stored in `redis_instance` and the endpoints are
+        stored in `redis_host`, `redis_port` and `redis_read_host`.
+
+        If `separate_broker` is True, a second Redis instance is created for
+        the celery broker so that cache evictions can never drop queued tasks.
+        It is stored in `broker_instance` with endpoints in `broker_host` and
+        `broker_port`. Otherwise, these refer to the shared `redis_instance`.
+
+        The shared instance uses the ElastiCache default parameter group and
+        engine version unless `cache_parameters` is given or cluster mode is
+        enabled. With `separate_broker`, each instance has its own parameter
+        group. See `REDIS_PARAMETERS`. An instance with its own parameter group
+        runs `DEFAULT_ENGINE_VERSION` unless `engine_version` is given.
+
+        The following additional keyword arguments are configured:
+
+        - app_tag_name: The name of the tag to apply to all resources. Default
+            is "app".
+        - app_tag_value: The value of the tag to apply to all resources. Default
+            is "myapp".
+        - cache_node_type: The ElastiCache node type. Default is
+            "cache.t2.micro".
+        - replication_group: Whether to create a replication group rather than
+            a single node cache cluster. Default is False.
+        - num_replicas: The number of read replicas (per shard in cluster
+            mode). Only used if `replication_group` is True. Default is 1.
+        - num_shards: The number of shards. If set, cluster mode is enabled.
+            Note that celery does not support Redis in cluster mode, so do not
+            use a cluster mode replication group as the celery broker. Only
+            used if `replication_group` is True. Default is None.
+        - multi_az: Whether to enable Multi-AZ with automatic failover. This
+            requires at least one replica. Only used if `replication_group` is
+            True. Default is False.
+        - engine_version: The Redis engine version. Default is None, the
+            ElastiCache default, or `DEFAULT_ENGINE_VERSION` for an instance
+            with its own parameter group.
+        - cache_parameters: ElastiCache parameters which override the defaults
+            in `REDIS_PARAMETERS` for `redis_instance`. Default is None.
+        - separate_broker: Whether to create a separate Redis instance for the
+            celery broker. Default is False.
+        - broker_options: A dictionary of the keyword arguments above which
+            override the settings of the broker instance, eg
+            `{"cache_node_type": "cache.m7g.large"}`. `num_shards` is not
+            allowed. Only used if `separate_broker` is True. Default is None.
+        - broker_parameters: ElastiCache parameters which override the defaults
+            in `REDIS_PARAMETERS` for the broker. Only used if
+            `separate_broker` is True. Default is None.
+
+        :param scope: See VPCStack class docstring for more information.
+        :type scope: Construct
+        :param id: See VPCStack class docstring for more information.
+        :type id: str
+        :param vpc: See SecurityGroupStack class docstring for more information.
+        :type vpc: aws_ec2.Vpc
+        :param redis_security_group_id: The security group for the Redis
+            nodes.
+        :type redis_security_group_id: aws_ec2.SecurityGroup
+
+        :raises ValueError: If `multi_az` is True and `num_replicas` is less
+            than 1, or if `broker_options` has an unknown key or `num_shards`.
+        """
 
         app_tag_name = kwargs.pop("app_tag_name", "app")
         app_tag_value = kwargs.pop("app_tag_value", "myapp")
+        redis_options = {
+            "cache_node_type": kwargs.pop("cache_node_type", "cache.t2.micro"),
+            "replication_group": kwargs.pop("replication_group", False),
+            "num_replicas": kwargs.pop("num_replicas", 1),
+            "num_shards": kwargs.pop("num_shards", None),
+            "multi_az": kwargs.pop("multi_az", False),
+            "engine_version": kwargs.pop("engine_version", None),
+        }
+        cache_parameters = kwargs.pop("cache_parameters", None)
+        separate_broker = kwargs.pop("separate_broker", False)
+        broker_options = kwargs.pop("broker_options", None) or {}
+        broker_parameters = kwargs.pop("broker_parameters", None) or {}
 
         super().__init__(scope, id, **kwargs)
 
+        unknown = set(broker_options) - set(redis_options)
+        if unknown:
+            raise ValueError(f"Unknown broker_options: {sorted(unknown)}")
+        if broker_options.get("num_shards") is not None:
+            raise ValueError("Celery does not support Redis in cluster mode.")
+
         # Assuming the VPC and subnets are passed as arguments
-        subnet_group = aws_elasticache.CfnSubnetGroup(
+        self.subnet_group = aws_elasticache.CfnSubnetGroup(
             self,
             "MyElastiCacheSubnetGroup",
             description="Subnet group for ElastiCache",
             subnet_ids=[subnet.subnet_id for subnet in vpc.private_subnets],
         )
+        self.security_group = redis_security_group_id
 
-        self.cache_cluster = aws_elasticache.CfnCacheCluster(
-            self,
-            "MyElastiCacheRedis",
-            cache_node_type="cache.t2.micro",
-            engine="redis",
-            num_cache_nodes=1,
-            cache_subnet_group_name=subnet_group.ref,
-            vpc_security_group_ids=[redis_security_group_id.security_group_id],
+        # only replace the default parameter group if asked to
+        redis_parameters = None
+        if separate_broker or cache_parameters:
+            redis_parameters = {
+                **REDIS_PARAMETERS["cache" if separate_broker else "shared"],
+                **(cache_parameters or {}),
+            }
+        self.redis_instance = self._add_redis(
+            "MyElastiCacheRedis", redis_parameters, **redis_options
         )
+        if isinstance(self.redis_instance, aws_elasticache.CfnReplicationGroup):
+            self.cache_cluster = None
+            self.replication_group = self.redis_instance
+        else:
+            self.cache_cluster = self.redis_instance
+            self.replication_group = None
+
+        if separate_broker:
+            self.broker_instance = self._add_redis(
+                "MyElastiCacheRedisBroker",
+                {**REDIS_PARAMETERS["broker"], **broker_parameters},
+                **{**redis_options, "num_shards": None, **broker_options},
+            )
+        else:
+            self.broker_instance = self.redis_instance
+
+        endpoints = redis_endpoints(self.redis_instance)
+        self.redis_host = endpoints["host"]
+        self.redis_port = endpoints["port"]
+        self.redis_read_host = endpoints["read_host"]
 
-        for resource in [self.cache_cluster, subnet_group]:
+        broker_endpoints = redis_endpoints(self.broker_instance)
+        self.broker_host = broker_endpoints["host"]
+        self.broker_port = broker_endpoints["port"]
+
+        for resource in [self.redis_instance, self.broker_instance, self.subnet_group]:
             Tags.of(resource).add(app_tag_name, app_tag_value)
 
-        CfnOutput(self, "RedisClusterId", value=self.cache_cluster.ref)
+        CfnOutput(self, "RedisClusterId", value=self.redis_instance.ref)
+        CfnOutput(self, "RedisReadHost", value=self.redis_read_host)
+        if separate_broker:
+            CfnOutput(self, "RedisBrokerId", value=self.broker_instance.ref)
+
+    def _add_redis(
+        self,
+        construct_id: str,
+        parameters: Optional[dict],
+        cache_node_type: str,
+        replication_group: bool,
+        num_replicas: int,
+        num_shards: int,
+        multi_az: bool,
+        engine_version: Optional[str],
+    ) -> Union[aws_elasticache.CfnCacheCluster, aws_elasticache.CfnReplicationGroup]:
+        """Create a Redis cache cluster or replication group
+
+        See the class docstring for a description of the arguments. If
+        `parameters` is None and cluster mode is disabled, the ElastiCache
+        default parameter group is used.
+
+        :raises ValueError: If `multi_az` is True and `num_replicas` is less
+            than 1.
+        """
+        if replication_group and multi_az and num_replicas < 1:
+            raise ValueError("Multi-AZ requires at least one read replica.")
+
+        cluster_mode = replication_group and num_shards is not None
+        if cluster_mode:
+            parameters = {**(parameters or {}), "cluster-enabled": "yes"}
+
+        parameter_group_name = None
+        if parameters is not None:
+            engine_version = engine_version or DEFAULT_ENGINE_VERSION
+            parameter_group_name = aws_elasticache.CfnParameterGroup(
+                self,
+                construct_id + "ParameterGroup",
+                cache_parameter_group_family="redis" + engine_version.split(".")[0],
+                description=f"Parameters for {construct_id}",
+                properties=parameters,
+            ).ref
+
+        if replication_group:
+            return aws_elasticache.CfnReplicationGroup(
+                self,
+                construct_id + "ReplicationGroup",
+                replication_group_description="Redis replication group",
+                cache_node_type=cache_node_type,
+                engine="redis",
+                engine_version=engine_version,
+                cluster_mode="enabled" if cluster_mode else "disabled",
+                cache_parameter_group_name=parameter_group_name,
+                # num_cache_clusters counts the primary
+                num_cache_clusters=None if cluster_mode else num_replicas + 1,
+                num_node_groups=num_shards,
+                replicas_per_node_group=num_replicas if cluster_mode else None,
+                automatic_failover_enabled=multi_az or cluster_mode,
+                multi_az_enabled=multi_az,
+                cache_subnet_group_name=self.subnet_group.ref,
+                security_group_ids=[self.security_group.security_group_id],
+            )
+        return aws_elasticache.CfnCacheCluster(
+            self,
+            construct_id,
+            cache_node_type=cache_node_type,
+            engine="redis",
+            engine_version=engine_version,
+            num_cache_nodes=1,
+            cache_parameter_group_name=parameter_group_name,
+            cache_subnet_group_name=self.subnet_group.ref,
+            vpc_security_group_ids=[self.security_group.security_group_id],
+        )
@@ -0,0 +1,149 @@
+from aws_cdk import (CfnOutput, Duration, RemovalPolicy, Stack, Tags,
+                     aws_cloudfront, aws_s3)
+from constructs import Construct
+
+
+class StorageStack(Stack):
+    def __init__(self, scope: Construct, id: str, **kwargs) -> None:
+        """Create the S3 buckets for django static and media files
+
+        The static bucket holds the output of `collectstatic`
+        (`AWS_STORAGE_BUCKET_NAME`) and the media bucket holds uploaded files,
+        eg genomic data (`DJANGO_AWS_STORAGE_BUCKET_NAME`). Both buckets block
+        public access. CloudFront reads them through `origin_access_control`,
+        so that `CDNStack` serves these files instead of the django workers.
+
+        The policy of a bucket which CloudFront reads must name the
+        distribution, which this stack cannot reference since `CDNStack`
+        depends on it. The buckets in `cdn_served_buckets` therefore get no
+        bucket policy here, and `CDNStack` creates it. The other buckets get a
+        policy which only enforces SSL.
+
+        Media objects larger than `intelligent_tiering_min_size` move to
+        S3 Intelligent-Tiering immediately. Only the frequent and infrequent
+        access tiers are used, so objects are always readable without a
+        restore.
+
+        The following additional keyword arguments are configured:
+
+        - app_tag_name: The name of the tag to apply to all resources. Default
+            is "app".
+        - app_tag_value: The value of the tag to apply to all resources. Default
+            is "myapp".
+        - static_bucket_name: Default is None, in which case CloudFormation
+            generates the name.
+        - media_bucket_name: Default is None, in which case CloudFormation
+            generates the name.
+        - intelligent_tiering_min_size: The minimum size in bytes of media
+            objects moved to Intelligent-Tiering. Smaller objects are not
+            monitored by S3, so there is no point in moving them. Default is
+            128 * 1024.
+        - media_noncurrent_version_expiration: Days to keep a replaced or
+            deleted media object. Default is 30.
+        - abort_incomplete_multipart_upload_after: Days after which the
+            parts of unfinished multipart uploads are deleted. Default is 7.
+        - removal_policy: Default is RemovalPolicy.RETAIN.
+        - cdn_served_buckets: The buckets which `CDNStack` serves, out of
+            "static" and "media". Default is [].
+
+        :param scope: See VPCStack class docstring for more information.
+        :type scope: Construct
+        :param id: See VPCStack class docstring for more information.
+        :type id: str
+
+        :raises ValueError: If `cdn_served_buckets` names an unknown bucket.
+        """
+        # Extract custom kwargs for this local class
+        app_tag_name = kwargs.pop("app_tag_name", "app")
+        app_tag_value = kwargs.pop("app_tag_value", "myapp")
+        static_bucket_name = kwargs.pop("static_bucket_name", None)
+        media_bucket_name = kwargs.pop("media_bucket_name", None)
+        intelligent_tiering_min_size = kwargs.pop(
+            "intelligent_tiering_min_size", 128 * 1024
+        )
+        media_noncurrent_version_expiration = kwargs.pop(
+            "media_noncurrent_version_expiration", 30
+        )
+        abort_incomplete_multipart_upload_after = kwargs.pop(
+            "abort_incomplete_multipart_upload_after", 7
+        )
+        removal_policy = kwargs.pop("removal_policy", RemovalPolicy.RETAIN)
+        cdn_served_buckets = kwargs.pop("cdn_served_buckets", [])
+
+        # Call the parent constructor
+        super().__init__(scope, id, **kwargs)
+
+        unknown = set(cdn_served_buckets) - {"static", "media"}
+        if unknown:
+            raise ValueError(
+                f"Unknown cdn_served_buckets {sorted(unknown)}. Choose from "
+                "static and media."
+            )
+
+        abort_incomplete_uploads = aws_s3.LifecycleRule(
+            id="AbortIncompleteMultipartUploads",
+            abort_incomplete_multipart_upload_after=Duration.days(
+                abort_incomplete_multipart_upload_after
+            ),
+        )
+
+        self.static_bucket = aws_s3.Bucket(
+            self,
+            "StaticBucket",
+            bucket_name=static_bucket_name,
+            block_public_access=aws_s3.BlockPublicAccess.BLOCK_ALL,
+            encryption=aws_s3.BucketEncryption.S3_MANAGED,
+            enforce_ssl="static" not in cdn_served_buckets,
+            lifecycle_rules=[abort_incomplete_uploads],
+            removal_policy=removal_policy,
+        )
+
+        self.media_bucket = aws_s3.Bucket(
+            self,
+            "MediaBucket",
+            bucket_name=media_bucket_name,
+            block_public_access=aws_s3.BlockPublicAccess.BLOCK_ALL,
+            encryption=aws_s3.BucketEncryption.S3_MANAGED,
+            enforce_ssl="media" not in cdn_served_buckets,
+            versioned=True,
+            lifecycle_rules=[
+                abort_incomplete_uploads,
+                aws_s3.LifecycleRule(
+                    id="IntelligentTiering",
+                    object_size_greater_than=intelligent_tiering_min_size,
+                    transitions=[
+                        aws_s3.Transition(
+                            storage_class=aws_s3.StorageClass.INTELLIGENT_TIERING,
+                            transition_after=Duration.days(0),
+                        )
+                    ],
+                ),
+                aws_s3.LifecycleRule(
+                    id="ExpireNoncurrentVersions",
+                    noncurrent_version_expiration=Duration.days(
+                        media_noncurrent_version_expiration
+                    ),
+                    expired_object_delete_marker=True,
+                ),
+            ],
+            removal_policy=removal_policy,
+        )
+
+        self.origin_access_control = aws_cloudfront.CfnOriginAccessControl(
+            self,
+            "OriginAccessControl",
+            origin_access_control_config=aws_cloudfront.CfnOriginAccessControl.OriginAccessControlConfigProperty(
+                name=f"{self.stack_name}-s3",
+                description="CloudFront access to the static and media buckets",
+                origin_access_control_origin_type="s3",
+                signing_behavior="always",
+                signing_protocol="sigv4",
+            ),
+        )
+
+        for resource in [self.static_bucket, self.media_bucket]:
+            Tags.of(resource).add(app_tag_name, app_tag_value)
+
+        # Outputs
+        CfnOutput(self, "StaticBucketName", value=self.static_bucket.bucket_name)
+        CfnOutput(self, "MediaBucketName", value=self.media_bucket.bucket_name)
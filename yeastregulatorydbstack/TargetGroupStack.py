@@ -1,4 +1,4 @@
-from aws_cdk import Stack, Tags, aws_ec2, aws_elasticloadbalancingv2
+from aws_cdk import Duration, Stack, Tags, aws_ec2, aws_elasticloadbalancingv2
 from constructs import Construct
 
 
@@ -6,6 +6,40 @@ class TargetGroupStack(Stack):
     def __init__(self, scope: Construct, id: str, vpc: aws_ec2.Vpc, **kwargs):
         """Create target groups
 
+        The Django service registers itself with `django_target_group`, which
+        is the default action of the HTTPS listener. The following additional
+        keyword arguments tune how the load balancer sends traffic to it:
+
+        - app_tag_name: The name of the tag to apply to all resources. Default
+            is "app".
+        - app_tag_value: The value of the tag to apply to all resources. Default
+            is "myapp".
+        - load_balancing_algorithm: Default is
+            aws_elasticloadbalancingv2.TargetGroupLoadBalancingAlgorithmType.ROUND_ROBIN.
+            LEAST_OUTSTANDING_REQUESTS sends new requests to the task with the
+            fewest requests in flight, so slow queries do not pile up on one
+            task.
+        - deregistration_delay: Seconds the load balancer lets in flight
+            requests finish on a deregistering task. Default is 300.
+        - slow_start: Seconds during which a new task receives a linearly
+            increasing share of the requests, eg while its caches warm up.
+            Between 30 and 900, or 0 to disable. Not supported with least
+            outstanding requests. Default is 0.
+        - stickiness_cookie_duration: Seconds a client sticks to one task. Default
+            is None, which disables stickiness.
+        - health_check_path: The path of the health check. This should be a
+            view which neither renders templates nor queries the database, since
+            every load balancer node probes every task. Default is "/".
+        - health_check_interval: Seconds between health checks. Default is 30.
+        - health_check_timeout: Seconds to wait for a health check response.
+            Must be less than `health_check_interval`. Default is 5.
+        - health_check_matcher: The HTTP codes of a healthy response, eg
+            "200" or "200-299". Default is "200".
+        - healthy_threshold_count: Consecutive successful health checks before
+            a task is healthy. Default is 5.
+        - unhealthy_threshold_count: Consecutive failed health checks before a
+            task is unhealthy. Default is 2.
+
         :param scope: See VPCStack class docstring for more information.
         :type scope: Construct
         :param id: See VPCStack class docstring for more information.
@@ -15,6 +49,10 @@ class TargetGroupStack(Stack):
             instance of VPCStack.
         :type vpc: aws_ec2.Vpc
 
+        :raises ValueError: If `slow_start` is used with least outstanding
+            requests, or `health_check_timeout` is not less than
+            `health_check_interval`.
+
         Example:
 
         .. code-block:: python
@@ -32,10 +70,36 @@ class TargetGroupStack(Stack):
         # extract custom kwargs for this local class
         app_tag_name = kwargs.pop("app_tag_name", "app")
         app_tag_value = kwargs.pop("app_tag_value", "myapp")
+        load_balancing_algorithm = kwargs.pop(
+            "load_balancing_algorithm",
+            aws_elasticloadbalancingv2.TargetGroupLoadBalancingAlgorithmType.ROUND_ROBIN,
+        )
+        deregistration_delay = kwargs.pop("deregistration_delay", 300)
+        slow_start = kwargs.pop("slow_start", 0)
+        stickiness_cookie_duration = kwargs.pop("stickiness_cookie_duration", None)
+        health_check_path = kwargs.pop("health_check_path", "/")
+        health_check_interval = kwargs.pop("health_check_interval", 30)
+        health_check_timeout = kwargs.pop("health_check_timeout", 5)
+        health_check_matcher = kwargs.pop("health_check_matcher", "200")
+        healthy_threshold_count = kwargs.pop("healthy_threshold_count", 5)
+        unhealthy_threshold_count = kwargs.pop("unhealthy_threshold_count", 2)
 
         # call the parent constructor
         super().__init__(scope, id, **kwargs)
 
+        if (
+            slow_start
+            and load_balancing_algorithm
+            == aws_elasticloadbalancingv2.TargetGroupLoadBalancingAlgorithmType.LEAST_OUTSTANDING_REQUESTS
+        ):
+            raise ValueError(
+                "slow_start is not supported with least outstanding requests."
+            )
+        if health_check_timeout >= health_check_interval:
+            raise ValueError(
+                "health_check_timeout must be less than health_check_interval."
+            )
+
         # Django Target Group
         self.django_target_group = aws_elasticloadbalancingv2.ApplicationTargetGroup(
             self,
@@ -44,9 +108,22 @@ class TargetGroupStack(Stack):
             port=5000,
             protocol=aws_elasticloadbalancingv2.ApplicationProtocol.HTTP,
             target_type=aws_elasticloadbalancingv2.TargetType.IP,
+            load_balancing_algorithm_type=load_balancing_algorithm,
+            deregistration_delay=Duration.seconds(deregistration_delay),
+            slow_start=Duration.seconds(slow_start) if slow_start else None,
+            stickiness_cookie_duration=(
+                Duration.seconds(stickiness_cookie_duration)
+                if stickiness_cookie_duration
+                else None
+            ),
             health_check=aws_elasticloadbalancingv2.HealthCheck(
                 protocol=aws_elasticloadbalancingv2.Protocol.HTTP,
-                path="/",
+                path=health_check_path,
+                interval=Duration.seconds(health_check_interval),
+                timeout=Duration.seconds(health_check_timeout),
+                healthy_http_codes=health_check_matcher,
+                healthy_threshold_count=healthy_threshold_count,
+                unhealthy_threshold_count=unhealthy_threshold_count,
             ),
         )
 
@@ -58,9 +135,10 @@ class TargetGroupStack(Stack):
             port=5555,  # Assuming default port for Flower is 5555
             protocol=aws_elasticloadbalancingv2.ApplicationProtocol.HTTP,
             target_type=aws_elasticloadbalancingv2.TargetType.IP,
+            # "/" is behind Flower's basic auth and would return a 401
             health_check=aws_elasticloadbalancingv2.HealthCheck(
                 protocol=aws_elasticloadbalancingv2.Protocol.HTTP,
-                path="/",
+                path="/healthcheck",
             ),
         )
 
@@ -2,14 +2,32 @@ from aws_cdk import CfnOutput, Stack, Tags
 from aws_cdk import aws_ec2 as ec2
 from constructs import Construct
 
+# Interface endpoints which keep ECS task startup (image pull, secrets, logs)
+# and ECS exec traffic off the NAT gateway. ECR image layers are served from
+# S3, which uses the gateway endpoint
+INTERFACE_ENDPOINTS = {
+    "EcrApi": ec2.InterfaceVpcEndpointAwsService.ECR,
+    "EcrDocker": ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER,
+    "SecretsManager": ec2.InterfaceVpcEndpointAwsService.SECRETS_MANAGER,
+    "CloudWatchLogs": ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS,
+    "SsmMessages": ec2.InterfaceVpcEndpointAwsService.SSM_MESSAGES,
+}
+
 
 class VPCStack(Stack):
     def __init__(self, scope: Construct, id: str, **kwargs) -> None:
         """
         Create a VPC with public and private subnets in all AZs.
 
-        Note: There is 1 NAT gateway that is set up in one of the subnets
-        and serves all private subnets.
+        Note: By default, there is 1 NAT gateway that is set up in one of the
+        subnets and serves all private subnets. Set `nat_gateway_per_az` to
+        create one in each AZ, so that losing an AZ does not cut off the
+        others and the NAT throughput scales with the number of AZs.
+
+        Traffic to S3 goes through a free gateway endpoint. Optionally,
+        interface endpoints for the services in `INTERFACE_ENDPOINTS` are
+        created in the private subnets, with private DNS so that the AWS SDKs
+        use them without configuration.
 
         The following additional keyword arguments are configured:
 
@@ -20,6 +38,13 @@ class VPCStack(Stack):
           is "app".
         - app_tag_value: The value of the tag to apply to all resources. Default
           is "myapp".
+        - nat_gateway_per_az: Whether to create a NAT gateway in each AZ.
+          Default is False.
+        - s3_gateway_endpoint: Whether to create the S3 gateway endpoint.
+          Default is True.
+        - interface_endpoints: Whether to create the interface endpoints in
+          `INTERFACE_ENDPOINTS`. Each costs an hourly fee per AZ. Default is
+          False.
 
         :param scope: The scope in which to define this construct. This is the
           construct within which the new construct will be defined. Its purpose
@@ -57,6 +82,9 @@ class VPCStack(Stack):
         app_tag_value = kwargs.pop("app_tag_value", "myapp")
         max_azs = kwargs.pop("max_azs", 99)
         vpc_name = kwargs.pop("vpc_name", "MyVPC")
+        nat_gateway_per_az = kwargs.pop("nat_gateway_per_az", False)
+        s3_gateway_endpoint = kwargs.pop("s3_gateway_endpoint", True)
+        interface_endpoints = kwargs.pop("interface_endpoints", False)
 
         # call the parent constructor
         super().__init__(scope, id, **kwargs)
@@ -79,9 +107,29 @@ class VPCStack(Stack):
                     cidr_mask=20,
                 ),
             ],
-            nat_gateways=1,
+            # None creates one NAT gateway per AZ
+            nat_gateways=None if nat_gateway_per_az else 1,
         )
 
+        self.s3_gateway_endpoint = None
+        if s3_gateway_endpoint:
+            self.s3_gateway_endpoint = self.vpc.add_gateway_endpoint(
+                "S3GatewayEndpoint",
+                service=ec2.GatewayVpcEndpointAwsService.S3,
+            )
+
+        self.interface_endpoints = {}
+        if interface_endpoints:
+            for name, service in INTERFACE_ENDPOINTS.items():
+                self.interface_endpoints[name] = self.vpc.add_interface_endpoint(
+                    name + "Endpoint",
+                    service=service,
+                    private_dns_enabled=True,
+                    subnets=ec2.SubnetSelection(
+                        subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+                    ),
+                )
+
         # Tag all VPC resources
         Tags.of(self.vpc).add(app_tag_name, app_tag_value)
 
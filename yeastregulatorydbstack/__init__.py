@@ -1,21 +1,31 @@
 from .ALBStack import ALBStack
+from .CDNStack import CDNStack
+from .CeleryWorkerServiceStack import CeleryWorkerServiceStack
 from .DjangoServiceStack import DjangoServiceStack
+from .FlowerServiceStack import FlowerServiceStack
 from .LogGroupStack import LogGroupStack
+from .ObservabilityStack import ObservabilityStack
 from .RDSStack import RDSStack
 from .RedisStack import RedisStack
 from .RolesStack import RolesStack
 from .SecurityGroupStack import SecurityGroupStack
+from .StorageStack import StorageStack
 from .TargetGroupStack import TargetGroupStack
 from .VPCStack import VPCStack
 
 __all__ = [
     "ALBStack",
+    "CDNStack",
+    "CeleryWorkerServiceStack",
     "DjangoServiceStack",
+    "FlowerServiceStack",
     "LogGroupStack",
+    "ObservabilityStack",
     "RDSStack",
     "RedisStack",
     "RolesStack",
     "SecurityGroupStack",
+    "StorageStack",
     "TargetGroupStack",
     "VPCStack",
 ]
@@ -0,0 +1,51 @@
+"""Mix FARGATE and FARGATE_SPOT capacity for an ECS service
+
+ECS first places `on_demand_base` tasks on FARGATE. Tasks beyond the base are
+split between FARGATE and FARGATE_SPOT in the ratio of `on_demand_weight` to
+`spot_weight`. Spot tasks may be stopped with two minutes notice, so only
+burst capacity should run on Spot, and celery tasks on Spot workers should be
+acknowledged late so that an interrupted task is redelivered.
+"""
+from typing import List
+
+from aws_cdk import aws_ecs
+
+
+def capacity_provider_strategies(
+    on_demand_base: int = 0, on_demand_weight: int = 1, spot_weight: int = 0
+) -> List[aws_ecs.CapacityProviderStrategy]:
+    """Build the capacity provider strategies of a service
+
+    :param on_demand_base: The number of tasks which always run on FARGATE.
+        Default is 0.
+    :type on_demand_base: int
+    :param on_demand_weight: The relative share of FARGATE for the tasks
+        beyond the base. Default is 1.
+    :type on_demand_weight: int
+    :param spot_weight: The relative share of FARGATE_SPOT for the tasks
+        beyond the base. Default is 0, which does not use Spot.
+    :type spot_weight: int
+
+    :return: The strategies for `aws_ecs.FargateService`.
+    :rtype: List[aws_ecs.CapacityProviderStrategy]
+
+    :raises ValueError: If a value is negative, or if both weights are 0.
+    """
+    if min(on_demand_base, on_demand_weight, spot_weight) < 0:
+        raise ValueError("The capacity provider base and weights cannot be negative.")
+    if on_demand_weight == 0 and spot_weight == 0:
+        raise ValueError("At least one capacity provider weight must be positive.")
+    strategies = [
+        aws_ecs.CapacityProviderStrategy(
+            capacity_provider="FARGATE",
+            base=on_demand_base or None,
+            weight=on_demand_weight,
+        )
+    ]
+    if spot_weight:
+        strategies.append(
+            aws_ecs.CapacityProviderStrategy(
+                capacity_provider="FARGATE_SPOT", weight=spot_weight
+            )
+        )
+    return strategies
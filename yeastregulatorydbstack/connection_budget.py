@@ -0,0 +1,98 @@
+"""Check that the services cannot open more connections than the database holds
+
+Every django process keeps one persistent connection per thread (see
+`CONN_MAX_AGE`), and every celery worker process keeps one. The demand of a
+service at full scale is therefore tasks x processes x threads. The RDS Proxy
+multiplexes these client connections onto the database, but a session that is
+pinned holds its database connection, so in the worst case every client
+connection needs one on the database. Read replicas are reached directly and
+receive the same demand.
+"""
+from .CeleryWorkerServiceStack import DEFAULT_WORKER_POOL
+
+
+def connection_demand(tasks: int, processes: int = 1, threads: int = 1) -> int:
+    """Count the database connections a service holds at full scale
+
+    :param tasks: The maximum number of tasks of the service.
+    :type tasks: int
+    :param processes: The number of processes per task, eg `WEB_CONCURRENCY`
+        or the celery worker concurrency. Default is 1.
+    :type processes: int
+    :param threads: The number of threads per process. Default is 1.
+    :type threads: int
+
+    :return: The number of connections.
+    :rtype: int
+    """
+    return tasks * processes * threads
+
+
+def celery_connection_demands(worker_pools: dict) -> dict:
+    """Count the database connections of each celery worker pool at full scale
+
+    :param worker_pools: See `CeleryWorkerServiceStack` class docstring for
+        more information.
+    :type worker_pools: dict
+
+    :return: A dictionary of "celery-<pool name>" to number of connections.
+    :rtype: dict
+    """
+    demands = {}
+    for pool_name, pool_overrides in worker_pools.items():
+        pool = {**DEFAULT_WORKER_POOL, **pool_overrides}
+        demands["celery-" + pool_name] = connection_demand(
+            pool["max_capacity"], pool["concurrency"]
+        )
+    return demands
+
+
+def proxy_pool_settings(
+    max_connections: int,
+    connection_demands: dict,
+    reserved_connections_percent: int = 10,
+) -> dict:
+    """Check the connection budget and get the RDS Proxy pool settings
+
+    The pool does not depend on the demands: the proxy may always use all of
+    `max_connections` except the reserved share, which is kept for
+    migrations, `psql` sessions and RDS itself, and half of the proxy's share
+    may be kept open while idle. The demands are only checked against it.
+
+    :param max_connections: The `max_connections` of the database.
+    :type max_connections: int
+    :param connection_demands: A dictionary of service name to the number of
+        connections it holds at full scale. See `connection_demand`.
+    :type connection_demands: dict
+    :param reserved_connections_percent: The percent of `max_connections`
+        which the services may not use. Default is 10.
+    :type reserved_connections_percent: int
+
+    :return: A dictionary with the keys `max_connections_percent`,
+        `max_idle_connections_percent`, `available_connections` and
+        `required_connections`.
+    :rtype: dict
+
+    :raises ValueError: If the services need more connections than are
+        available to them.
+    """
+    max_connections_percent = 100 - reserved_connections_percent
+    available_connections = max_connections * max_connections_percent // 100
+    required_connections = sum(connection_demands.values())
+    if required_connections > available_connections:
+        demands = ", ".join(
+            f"{name}: {demand}" for name, demand in connection_demands.items()
+        )
+        raise ValueError(
+            f"The services need {required_connections} database connections "
+            f"at full scale ({demands}), but only {available_connections} of "
+            f"max_connections={max_connections} are available after reserving "
+            f"{reserved_connections_percent}%. Reduce the tasks, processes or "
+            "threads, or use a larger database instance."
+        )
+    return {
+        "max_connections_percent": max_connections_percent,
+        "max_idle_connections_percent": max_connections_percent // 2,
+        "available_connections": available_connections,
+        "required_connections": required_connections,
+    }
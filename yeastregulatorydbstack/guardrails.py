@@ -0,0 +1,200 @@
+"""Flag settings which are known to hurt throughput when the app is synthesized
+
+`PerformanceGuardrails` is a CDK Aspect. It visits every CloudFormation
+resource of the app and reports these rules as warnings, or as errors which
+fail `cdk synth`:
+
+- django-debug: A container runs with DEBUG enabled. django then keeps every
+  SQL query of a request in memory.
+- burstable-instance: A database or cache runs on a burstable (t) class,
+  which is throttled to its baseline once the CPU credits are spent.
+- single-task-service: An ECS service runs one task and does not scale, so
+  one slow request or a task replacement stalls all traffic.
+- root-health-check: A target group probes "/", which usually renders a
+  page and queries the database on every health check.
+- single-subnet: An ECS service is pinned to one subnet, ie one AZ, so most
+  calls to the database and cache cross AZs.
+
+Suppress a rule for a construct and everything below it with `suppress`.
+The rules read the resource properties before tokens are resolved across
+stacks, so they only see values known at synth. The subnets of an ECS service
+are read from the metadata of `placement.record_subnet_count`.
+"""
+from typing import Any
+
+import jsii
+from aws_cdk import (Annotations, IAspect, Stack, aws_applicationautoscaling,
+                     aws_ecs, aws_elasticache, aws_elasticloadbalancingv2,
+                     aws_rds)
+from constructs import IConstruct
+
+from .placement import SUBNET_COUNT_METADATA
+
+RULES = (
+    "django-debug",
+    "burstable-instance",
+    "single-task-service",
+    "root-health-check",
+    "single-subnet",
+)
+
+SUPPRESS_METADATA = "performance-guardrails:suppress"
+
+DEBUG_VARIABLES = ("DEBUG", "DJANGO_DEBUG")
+
+
+def suppress(construct: IConstruct, rule: str, reason: str) -> None:
+    """Suppress a guardrail rule for a construct and its children
+
+    :param construct: The construct, eg a stack or a service.
+    :type construct: IConstruct
+    :param rule: One of `RULES`.
+    :type rule: str
+    :param reason: Why the setting is acceptable here. Recorded in the cloud
+        assembly.
+    :type reason: str
+
+    :raises ValueError: If the rule is unknown.
+    """
+    if rule not in RULES:
+        raise ValueError(f"Unknown rule {rule}. Choose one of {RULES}.")
+    construct.node.add_metadata(SUPPRESS_METADATA, {"rule": rule, "reason": reason})
+
+
+@jsii.implements(IAspect)
+class PerformanceGuardrails:
+    def __init__(self, errors: bool = False) -> None:
+        """Report the performance rules of the module docstring
+
+        Apply it to the app, eg
+        `Aspects.of(app).add(PerformanceGuardrails())`.
+
+        :param errors: Whether to report errors, which fail `cdk synth`,
+            rather than warnings. Default is False.
+        :type errors: bool
+        """
+        self.errors = errors
+
+    def visit(self, node: IConstruct) -> None:
+        if isinstance(node, aws_ecs.CfnTaskDefinition):
+            self._check_task_definition(node)
+        elif isinstance(node, aws_ecs.CfnService):
+            self._check_service(node)
+        elif isinstance(node, aws_rds.CfnDBInstance):
+            self._check_instance_class(node, node.db_instance_class, "db.t")
+        elif isinstance(
+            node, (aws_elasticache.CfnCacheCluster, aws_elasticache.CfnReplicationGroup)
+        ):
+            self._check_instance_class(node, node.cache_node_type, "cache.t")
+        elif isinstance(node, aws_elasticloadbalancingv2.CfnTargetGroup):
+            self._check_target_group(node)
+
+    def _check_task_definition(self, node: aws_ecs.CfnTaskDefinition) -> None:
+        for container in _resolve(node, node.container_definitions) or []:
+            for variable in container.get("environment") or []:
+                value = variable.get("value")
+                if (
+                    variable.get("name") in DEBUG_VARIABLES
+                    and isinstance(value, str)
+                    and value.lower() in ("true", "1", "yes", "on")
+                ):
+                    self._report(
+                        node,
+                        "django-debug",
+                        f"Container {container.get('name')} sets "
+                        f"{variable['name']}={value}.",
+                    )
+
+    def _check_service(self, node: aws_ecs.CfnService) -> None:
+        desired_count = _resolve(node, node.desired_count)
+        # ECS runs one task if the desired count is not set
+        if desired_count in (None, 1) and not _is_scaled(node):
+            self._report(
+                node,
+                "single-task-service",
+                "The service runs a single task without auto scaling.",
+            )
+        if _subnet_count(node) == 1:
+            self._report(
+                node, "single-subnet", "The service's tasks run in one subnet."
+            )
+
+    def _check_instance_class(
+        self, node: IConstruct, instance_class: Any, burstable_prefix: str
+    ) -> None:
+        instance_class = _resolve(node, instance_class)
+        if isinstance(instance_class, str) and instance_class.startswith(
+            burstable_prefix
+        ):
+            self._report(
+                node,
+                "burstable-instance",
+                f"{instance_class} is a burstable class.",
+            )
+
+    def _check_target_group(
+        self, node: aws_elasticloadbalancingv2.CfnTargetGroup
+    ) -> None:
+        if _resolve(node, node.health_check_enabled) is False:
+            return
+        protocol = _resolve(node, node.health_check_protocol) or _resolve(
+            node, node.protocol
+        )
+        path = _resolve(node, node.health_check_path)
+        # ELB probes "/" if an HTTP health check has no path
+        if path == "/" or (path is None and protocol in ("HTTP", "HTTPS")):
+            self._report(
+                node,
+                "root-health-check",
+                "The health check probes /. Use a path which does not query "
+                "the database or render a page.",
+            )
+
+    def _report(self, node: IConstruct, rule: str, message: str) -> None:
+        if _is_suppressed(node, rule):
+            return
+        message = f"[{rule}] {message} Suppress with guardrails.suppress if intended."
+        if self.errors:
+            Annotations.of(node).add_error(message)
+        else:
+            Annotations.of(node).add_warning(message)
+
+
+def _resolve(node: IConstruct, value: Any) -> Any:
+    """Resolve a property of a CloudFormation resource within its stack"""
+    return Stack.of(node).resolve(value)
+
+
+def _subnet_count(node: aws_ecs.CfnService) -> Any:
+    """Get the number of subnets of a service, or None if it is unknown"""
+    network_configuration = _resolve(node, node.network_configuration) or {}
+    subnets = network_configuration.get("awsvpcConfiguration", {}).get("subnets")
+    if isinstance(subnets, list):
+        return len(subnets)
+    # set by the FargateService which owns the node, see placement
+    for scope in reversed(node.node.scopes):
+        for entry in scope.node.metadata:
+            if entry.type == SUBNET_COUNT_METADATA:
+                return entry.data
+    return None
+
+
+def _is_scaled(node: aws_ecs.CfnService) -> bool:
+    """Whether a scalable target in the stack of a service refers to it"""
+    stack = Stack.of(node)
+    logical_id = stack.resolve(stack.get_logical_id(node))
+    for construct in stack.node.find_all():
+        if isinstance(
+            construct, aws_applicationautoscaling.CfnScalableTarget
+        ) and logical_id in str(stack.resolve(construct.resource_id)):
+            return True
+    return False
+
+
+def _is_suppressed(node: IConstruct, rule: str) -> bool:
+    """Whether a rule is suppressed for a construct or one of its scopes"""
+    for scope in node.node.scopes:
+        for entry in scope.node.metadata:
+            if entry.type == SUPPRESS_METADATA and entry.data.get("rule") == rule:
+                return True
+    return False
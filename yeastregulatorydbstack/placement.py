@@ -0,0 +1,115 @@
+"""Choose the subnets an ECS service runs in
+
+The placements are:
+
+- public-subnet: The first public subnet, with a public IP. All tasks land in
+  one AZ, and every call to RDS or Redis in another AZ pays the cross-AZ
+  latency.
+- private-spread: All private subnets, without a public IP. ECS spreads the
+  tasks evenly over the AZs and, with AZ rebalancing, moves tasks back to an
+  AZ after it recovers.
+- writer-az: The private subnets in the AZ of the RDS writer, so that every
+  query stays in one AZ. Fargate has no soft placement preferences, so this
+  gives up the AZ spread of private-spread. Prefer it for latency sensitive
+  services whose capacity is also available elsewhere.
+"""
+from typing import Optional
+
+from aws_cdk import aws_ec2, aws_ecs
+
+PLACEMENTS = ("public-subnet", "private-spread", "writer-az")
+
+SUBNET_COUNT_METADATA = "placement:subnet-count"
+
+
+def service_placement(
+    vpc: aws_ec2.IVpc,
+    placement: str = "public-subnet",
+    availability_zone: Optional[str] = None,
+) -> dict:
+    """Get the subnet keyword arguments of a `FargateService` for a placement
+
+    :param vpc: The VPC of the service.
+    :type vpc: aws_ec2.IVpc
+    :param placement: One of `PLACEMENTS`. Default is "public-subnet".
+    :type placement: str
+    :param availability_zone: The AZ of the RDS writer, eg
+        `RDSStack.db_writer_availability_zone`. Required for "writer-az".
+        Default is None.
+    :type availability_zone: str
+
+    :return: A dictionary with the keys `vpc_subnets` and `assign_public_ip`.
+    :rtype: dict
+
+    :raises ValueError: If the placement is unknown, or if "writer-az" is
+        chosen without `availability_zone` or the VPC has no private subnet in
+        it.
+    """
+    if placement not in PLACEMENTS:
+        raise ValueError(f"Unknown placement {placement}. Choose one of {PLACEMENTS}.")
+    if placement == "public-subnet":
+        return {
+            "vpc_subnets": aws_ec2.SubnetSelection(
+                subnets=[
+                    vpc.select_subnets(subnet_type=aws_ec2.SubnetType.PUBLIC).subnets[0]
+                ]
+            ),
+            "assign_public_ip": True,
+        }
+    if placement == "private-spread":
+        return {
+            "vpc_subnets": aws_ec2.SubnetSelection(
+                subnet_type=aws_ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ),
+            "assign_public_ip": False,
+        }
+    if availability_zone is None:
+        raise ValueError("The writer-az placement requires the writer's AZ.")
+    subnets = vpc.select_subnets(
+        subnet_type=aws_ec2.SubnetType.PRIVATE_WITH_EGRESS,
+        availability_zones=[availability_zone],
+    ).subnets
+    if not subnets:
+        raise ValueError(f"The VPC has no private subnet in {availability_zone}.")
+    return {
+        "vpc_subnets": aws_ec2.SubnetSelection(subnets=subnets),
+        "assign_public_ip": False,
+    }
+
+
+def enable_az_rebalancing(service: aws_ecs.FargateService) -> None:
+    """Turn on AZ rebalancing of a service spread over several AZs
+
+    `aws_ecs.FargateService` does not expose the property yet.
+
+    :param service: The service.
+    :type service: aws_ecs.FargateService
+    """
+    service.node.default_child.add_property_override(
+        "AvailabilityZoneRebalancing", "ENABLED"
+    )
+
+
+def record_subnet_count(
+    service: aws_ecs.FargateService,
+    vpc: aws_ec2.IVpc,
+    vpc_subnets: aws_ec2.SubnetSelection,
+) -> None:
+    """Record the number of subnets of a service in its metadata
+
+    `aws_ecs.FargateService` sets the subnets of its `CfnService` lazily,
+    which the Python runtime cannot read, so the guardrails read the count
+    from here.
+
+    :param service: The service.
+    :type service: aws_ecs.FargateService
+    :param vpc: The VPC of the service.
+    :type vpc: aws_ec2.IVpc
+    :param vpc_subnets: The subnets of the service, see `service_placement`.
+    :type vpc_subnets: aws_ec2.SubnetSelection
+    """
+    # service_placement selects by subnet type or by subnets only
+    subnets = vpc.select_subnets(
+        subnet_type=vpc_subnets.subnet_type, subnets=vpc_subnets.subnets
+    ).subnets
+    service.node.add_metadata(SUBNET_COUNT_METADATA, len(subnets))
@@ -0,0 +1,152 @@
+"""Generate PostgreSQL parameters from the instance class of the database
+
+The memory settings follow the usual rules of thumb (eg shared_buffers at a
+quarter of memory, effective_cache_size at three quarters) and are expressed
+in the units RDS expects: 8kB pages for shared_buffers and
+effective_cache_size, and kB for work_mem and maintenance_work_mem.
+"""
+
+from typing import Optional, Tuple
+
+# vCPUs and memory (GiB) of the burstable (t) instance sizes
+BURSTABLE_SIZES = {
+    "micro": (2, 1),
+    "small": (2, 2),
+    "medium": (2, 4),
+    "large": (2, 8),
+    "xlarge": (4, 16),
+    "2xlarge": (8, 32),
+}
+
+# vCPUs of the general purpose (m) and memory optimized (r) instance sizes
+SIZE_VCPUS = {
+    "large": 2,
+    "xlarge": 4,
+    "2xlarge": 8,
+    "4xlarge": 16,
+    "8xlarge": 32,
+    "12xlarge": 48,
+    "16xlarge": 64,
+    "24xlarge": 96,
+}
+
+# memory (GiB) per vCPU of the general purpose and memory optimized classes
+MEMORY_PER_VCPU = {"m": 4, "r": 8}
+
+PROFILES = ("oltp", "analytics")
+
+KIB = 1024
+MIB = 1024 * KIB
+GIB = 1024 * MIB
+PAGE = 8 * KIB
+
+# Each Aurora capacity unit has 2 GiB of memory. Assume the CPU to memory ratio
+# of the memory optimized classes, ie 4 ACUs per vCPU
+GIB_PER_ACU = 2
+ACU_PER_VCPU = 4
+
+# RDS sizes the default max_connections as DBInstanceClassMemory / 9531392
+RDS_BYTES_PER_CONNECTION = 9531392
+
+
+def instance_resources(instance_type: str) -> Tuple[int, int]:
+    """Look up the vCPUs and memory of an RDS instance type
+
+    :param instance_type: The instance type, eg "t3.micro" or "db.r6g.xlarge".
+    :type instance_type: str
+
+    :return: The number of vCPUs and the memory in GiB.
+    :rtype: Tuple[int, int]
+
+    :raises ValueError: If the instance type is not known. In that case, pass
+        `vcpus` and `memory_gib` to `postgres_parameters` directly.
+    """
+    instance_class, _, size = instance_type.removeprefix("db.").partition(".")
+    family = instance_class[:1]
+    if family == "t" and size in BURSTABLE_SIZES:
+        return BURSTABLE_SIZES[size]
+    if family in MEMORY_PER_VCPU and size in SIZE_VCPUS:
+        return SIZE_VCPUS[size], SIZE_VCPUS[size] * MEMORY_PER_VCPU[family]
+    raise ValueError(
+        f"Unknown instance type {instance_type}. Provide vcpus and memory_gib."
+    )
+
+
+def postgres_parameters(
+    instance_type: Optional[str] = None,
+    profile: str = "oltp",
+    overrides: Optional[dict] = None,
+    vcpus: Optional[int] = None,
+    memory_gib: Optional[float] = None,
+) -> dict:
+    """Derive PostgreSQL parameters for a tuning profile and instance class
+
+    The profiles are:
+
+    - oltp: Many short transactions. max_connections follows the RDS
+      default for the memory, and work_mem is small enough that every
+      connection can use a few sorts at once.
+    - analytics: Few connections running large joins and aggregates.
+      max_connections is limited so that work_mem and maintenance_work_mem
+      can be much larger, and more parallel workers are allowed per gather.
+
+    :param instance_type: The instance type, eg "t3.micro". Used to look up
+        `vcpus` and `memory_gib` when they are not provided.
+    :type instance_type: str
+    :param profile: One of `PROFILES`. Default is "oltp".
+    :type profile: str
+    :param overrides: Parameters which replace the derived values. Values
+        are converted to strings. Default is None.
+    :type overrides: dict
+    :param vcpus: The number of vCPUs of the instance. Default is None.
+    :type vcpus: int
+    :param memory_gib: The memory of the instance in GiB. Default is None.
+    :type memory_gib: float
+
+    :return: A dictionary of parameter names to string values, suitable for
+        `aws_rds.ParameterGroup`.
+    :rtype: dict
+
+    :raises ValueError: If the profile is unknown, or if neither
+        `instance_type` nor both of `vcpus` and `memory_gib` are provided.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile}. Choose one of {PROFILES}.")
+    if vcpus is None or memory_gib is None:
+        if instance_type is None:
+            raise ValueError("Provide either instance_type or vcpus and memory_gib.")
+        looked_up_vcpus, looked_up_memory_gib = instance_resources(instance_type)
+        vcpus = vcpus if vcpus is not None else looked_up_vcpus
+        memory_gib = memory_gib if memory_gib is not None else looked_up_memory_gib
+
+    memory = int(memory_gib * GIB)
+    shared_buffers = memory // 4
+
+    if profile == "oltp":
+        max_connections = min(max(memory // RDS_BYTES_PER_CONNECTION, 20), 5000)
+        sorts_per_connection = 3
+        maintenance_work_mem = memory // 16
+        max_parallel_workers_per_gather = min(max(vcpus // 2, 1), 2)
+    else:
+        max_connections = min(max(int(memory_gib * 10), 20), 500)
+        sorts_per_connection = 2
+        maintenance_work_mem = memory // 8
+        max_parallel_workers_per_gather = min(max(vcpus // 2, 1), 8)
+
+    work_mem = max(
+        (memory - shared_buffers) // (max_connections * sorts_per_connection),
+        4 * MIB,
+    )
+
+    parameters = {
+        "max_connections": max_connections,
+        "shared_buffers": shared_buffers // PAGE,
+        "effective_cache_size": memory * 3 // 4 // PAGE,
+        "work_mem": work_mem // KIB,
+        "maintenance_work_mem": min(maintenance_work_mem, 2 * GIB) // KIB,
+        # RDS storage is SSD backed
+        "random_page_cost": 1.1,
+        "max_parallel_workers_per_gather": max_parallel_workers_per_gather,
+        **(overrides or {}),
+    }
+    return {key: str(value) for key, value in parameters.items()}
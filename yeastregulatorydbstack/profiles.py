@@ -0,0 +1,367 @@
+"""Size every stack of the app from one capacity profile
+
+A profile holds the sizing choices which differ between environments: the
+NAT gateways, the database and cache instances, the ECS task sizes and
+capacities, and whether the performance guardrails (see `guardrails`) fail
+the synth. `app.py` selects one by name from the CDK context, either from
+`cdk.json` or on the command line:
+
+    cdk synth -c profile=load-test
+
+The fields of the selected profile may also be overridden in the context,
+eg in `cdk.json`:
+
+    "capacity_profiles": {"load-test": {"django_max_capacity": 20}}
+
+Enum fields take the member name, eg `"db_instance_class": "MEMORY6_GRAVITON"`.
+
+A profile with a `stack_prefix` prepends it to the stack IDs and to the
+resource names which must be unique in an account and region, so that it can
+be deployed next to another profile. The account, region, certificate and
+image of a profile are read with `context_value`, eg
+
+    "deployments": {"load-test": {"account": "123456789012"}}
+
+Profiles are checked for consistency when created. The database connection
+budget is not checked here, since it depends on the celery worker pools and
+gunicorn concurrency; `RDSStack` checks it at synth from the
+`connection_demands` that `app.py` derives from the profile.
+"""
+import dataclasses
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping, Optional
+
+from aws_cdk import aws_ec2, aws_rds
+from constructs import Node
+
+from .CeleryWorkerServiceStack import DEFAULT_WORKER_POOL
+
+# The memory sizes (MiB) Fargate allows for each task CPU size
+FARGATE_MEMORY_MIB = {
+    256: range(512, 2048 + 1, 512),
+    512: range(1024, 4096 + 1, 1024),
+    1024: range(2048, 8192 + 1, 1024),
+    2048: range(4096, 16384 + 1, 1024),
+    4096: range(8192, 30720 + 1, 1024),
+    8192: range(16384, 61440 + 1, 4096),
+    16384: range(32768, 122880 + 1, 8192),
+}
+
+
+def check_fargate_size(cpu: int, memory_limit_mib: int, label: str) -> None:
+    """Check that Fargate supports a task size
+
+    :param cpu: The task CPU units.
+    :type cpu: int
+    :param memory_limit_mib: The task memory in MiB.
+    :type memory_limit_mib: int
+    :param label: The name of the task in the error message.
+    :type label: str
+
+    :raises ValueError: If Fargate does not support the combination.
+    """
+    if memory_limit_mib not in FARGATE_MEMORY_MIB.get(cpu, ()):
+        raise ValueError(
+            f"Fargate does not support {label} tasks with {cpu} CPU units and "
+            f"{memory_limit_mib} MiB of memory."
+        )
+
+
+@dataclass(frozen=True)
+class CapacityProfile:
+    """The sizing of the stacks in one environment
+
+    See the stacks' class docstrings for the meaning of each setting. The
+    `celery_pool_overrides` are merged into the worker pools defined in
+    `app.py`, by pool name, so that the profile only sets their capacity.
+
+    :raises ValueError: If a task size is not supported by Fargate, or if the
+        settings are inconsistent.
+    """
+
+    name: str
+    # Prepended to the stack IDs and the fixed resource names
+    stack_prefix: str = ""
+    # Whether the guardrails report errors rather than warnings
+    guardrail_errors: bool = False
+    # VPCStack
+    nat_gateway_per_az: bool = False
+    # RDSStack
+    db_instance_class: aws_ec2.InstanceClass = aws_ec2.InstanceClass.BURSTABLE3
+    db_instance_size: aws_ec2.InstanceSize = aws_ec2.InstanceSize.MICRO
+    db_allocated_storage: int = 20
+    db_max_allocated_storage: Optional[int] = 100
+    db_storage_type: Optional[aws_rds.StorageType] = None
+    db_num_read_replicas: int = 0
+    db_performance_insights: bool = False
+    # RedisStack
+    cache_node_type: str = "cache.t2.micro"
+    cache_replication_group: bool = False
+    cache_multi_az: bool = False
+    # DjangoServiceStack
+    django_debug: bool = True
+    django_cpu: int = 1024
+    django_memory_limit_mib: int = 2048
+    django_min_capacity: int = 1
+    django_max_capacity: int = 4
+    django_on_demand_base: int = 1
+    django_spot_weight: int = 1
+    # CeleryWorkerServiceStack
+    celery_pool_overrides: Mapping[str, Mapping[str, int]] = field(
+        default_factory=dict
+    )
+    # FlowerServiceStack
+    flower_cpu: int = 256
+    flower_memory_limit_mib: int = 512
+
+    def __post_init__(self):
+        check_fargate_size(self.django_cpu, self.django_memory_limit_mib, "django")
+        check_fargate_size(self.flower_cpu, self.flower_memory_limit_mib, "Flower")
+        if not 1 <= self.django_min_capacity <= self.django_max_capacity:
+            raise ValueError(
+                f"Profile {self.name}: django_min_capacity must be at least 1 "
+                "and no greater than django_max_capacity."
+            )
+        if self.django_on_demand_base > self.django_min_capacity:
+            raise ValueError(
+                f"Profile {self.name}: django_on_demand_base cannot exceed "
+                "django_min_capacity, or the minimum capacity may run on Spot."
+            )
+        if (
+            self.db_max_allocated_storage is not None
+            and self.db_max_allocated_storage < self.db_allocated_storage
+        ):
+            raise ValueError(
+                f"Profile {self.name}: db_max_allocated_storage is less than "
+                "db_allocated_storage."
+            )
+        if self.cache_multi_az and not self.cache_replication_group:
+            raise ValueError(
+                f"Profile {self.name}: cache_multi_az requires "
+                "cache_replication_group."
+            )
+        # A data tier which survives the loss of an AZ is wasted if the
+        # tasks lose their egress with the AZ of a single NAT gateway
+        if (self.cache_multi_az or self.db_num_read_replicas) and not (
+            self.nat_gateway_per_az
+        ):
+            raise ValueError(
+                f"Profile {self.name}: a Multi-AZ cache or read replicas "
+                "require nat_gateway_per_az."
+            )
+        for pool_name, overrides in self.celery_pool_overrides.items():
+            unknown = set(overrides) - set(DEFAULT_WORKER_POOL)
+            if unknown:
+                raise ValueError(
+                    f"Profile {self.name}: unknown settings {sorted(unknown)} "
+                    f"for worker pool {pool_name}."
+                )
+
+    def prefixed(self, name: str) -> str:
+        """Prepend the `stack_prefix` of the profile to a name
+
+        :param name: A stack ID or a resource name, eg "VPCStack".
+        :type name: str
+
+        :return: The name to use for the profile, eg "LoadTest-VPCStack".
+        :rtype: str
+        """
+        return self.stack_prefix + name
+
+    def vpc_kwargs(self) -> dict:
+        """Get the `VPCStack` keyword arguments of the profile"""
+        return {"nat_gateway_per_az": self.nat_gateway_per_az}
+
+    def rds_kwargs(self) -> dict:
+        """Get the `RDSStack` keyword arguments of the profile"""
+        return {
+            "instance_class": self.db_instance_class,
+            "instance_size": self.db_instance_size,
+            "allocated_storage": self.db_allocated_storage,
+            "max_allocated_storage": self.db_max_allocated_storage,
+            "storage_type": self.db_storage_type,
+            "num_read_replicas": self.db_num_read_replicas,
+            "enable_performance_insights": self.db_performance_insights,
+        }
+
+    def redis_kwargs(self) -> dict:
+        """Get the `RedisStack` keyword arguments of the profile"""
+        return {
+            "cache_node_type": self.cache_node_type,
+            "replication_group": self.cache_replication_group,
+            "multi_az": self.cache_multi_az,
+        }
+
+    def django_kwargs(self) -> dict:
+        """Get the `DjangoServiceStack` keyword arguments of the profile"""
+        return {
+            "debug": self.django_debug,
+            "cpu": self.django_cpu,
+            "memory_limit_mib": self.django_memory_limit_mib,
+            "min_capacity": self.django_min_capacity,
+            "max_capacity": self.django_max_capacity,
+            "on_demand_base": self.django_on_demand_base,
+            "on_demand_weight": 1,
+            "spot_weight": self.django_spot_weight,
+        }
+
+    def celery_worker_pools(self, worker_pools: dict) -> dict:
+        """Apply the profile to the celery worker pools
+
+        :param worker_pools: See `CeleryWorkerServiceStack` class docstring
+            for more information.
+        :type worker_pools: dict
+
+        :return: The worker pools with the profile's overrides.
+        :rtype: dict
+
+        :raises ValueError: If the profile overrides an unknown pool, or if a
+            pool's task size is not supported by Fargate.
+        """
+        unknown = set(self.celery_pool_overrides) - set(worker_pools)
+        if unknown:
+            raise ValueError(
+                f"Profile {self.name} overrides unknown worker pools "
+                f"{sorted(unknown)}."
+            )
+        pools = {}
+        for pool_name, pool in worker_pools.items():
+            pools[pool_name] = {
+                **pool,
+                **self.celery_pool_overrides.get(pool_name, {}),
+            }
+            merged = {**DEFAULT_WORKER_POOL, **pools[pool_name]}
+            check_fargate_size(
+                merged["cpu"], merged["memory_limit_mib"], f"celery-{pool_name}"
+            )
+        return pools
+
+    def flower_kwargs(self) -> dict:
+        """Get the `FlowerServiceStack` keyword arguments of the profile"""
+        return {
+            "cpu": self.flower_cpu,
+            "memory_limit_mib": self.flower_memory_limit_mib,
+        }
+
+
+DEV = CapacityProfile(name="dev")
+
+STAGING = CapacityProfile(
+    name="staging",
+    django_debug=False,
+    db_instance_size=aws_ec2.InstanceSize.SMALL,
+    db_allocated_storage=50,
+    db_max_allocated_storage=200,
+    db_storage_type=aws_rds.StorageType.GP3,
+    cache_node_type="cache.t3.small",
+    django_min_capacity=2,
+    django_max_capacity=6,
+    django_on_demand_base=1,
+    celery_pool_overrides={"default": {"max_capacity": 6}},
+)
+
+PROD = CapacityProfile(
+    name="prod",
+    guardrail_errors=True,
+    django_debug=False,
+    nat_gateway_per_az=True,
+    db_instance_class=aws_ec2.InstanceClass.MEMORY6_GRAVITON,
+    db_instance_size=aws_ec2.InstanceSize.LARGE,
+    db_allocated_storage=100,
+    db_max_allocated_storage=500,
+    db_storage_type=aws_rds.StorageType.GP3,
+    db_num_read_replicas=1,
+    db_performance_insights=True,
+    cache_node_type="cache.m6g.large",
+    cache_replication_group=True,
+    cache_multi_az=True,
+    django_cpu=2048,
+    django_memory_limit_mib=4096,
+    django_min_capacity=2,
+    django_max_capacity=10,
+    django_on_demand_base=2,
+    celery_pool_overrides={
+        "default": {"min_capacity": 2, "max_capacity": 6},
+        "ingest": {"max_capacity": 12},
+        "rankresponse": {"max_capacity": 12},
+    },
+)
+
+# The production sizes, so that load tests measure what production would do.
+# The prefix keeps its stacks and resource names apart from production's
+LOAD_TEST = dataclasses.replace(PROD, name="load-test", stack_prefix="LoadTest-")
+
+PROFILES: Dict[str, CapacityProfile] = {
+    profile.name: profile for profile in [DEV, STAGING, PROD, LOAD_TEST]
+}
+
+_ENUM_FIELDS = {
+    "db_instance_class": aws_ec2.InstanceClass,
+    "db_instance_size": aws_ec2.InstanceSize,
+    "db_storage_type": aws_rds.StorageType,
+}
+
+
+def profile_from_context(node: Node, default: str = "dev") -> CapacityProfile:
+    """Get the capacity profile selected in the CDK context
+
+    The context key `profile` names the profile, and the context key
+    `capacity_profiles` may hold overrides of its fields, by profile name.
+
+    :param node: The node to read the context from, eg `app.node`.
+    :type node: Node
+    :param default: The profile used if the context names none. Default is
+        "dev".
+    :type default: str
+
+    :return: The profile.
+    :rtype: CapacityProfile
+
+    :raises ValueError: If the profile is unknown, an override names an
+        unknown field, or the resulting profile is inconsistent.
+    """
+    name = node.try_get_context("profile") or default
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile {name}. Choose one of {sorted(PROFILES)}.")
+    overrides = dict((node.try_get_context("capacity_profiles") or {}).get(name, {}))
+    unknown = set(overrides) - {
+        profile_field.name for profile_field in dataclasses.fields(CapacityProfile)
+    }
+    if unknown:
+        raise ValueError(f"Unknown capacity profile fields {sorted(unknown)}.")
+    for field_name, enum in _ENUM_FIELDS.items():
+        if field_name in overrides:
+            try:
+                overrides[field_name] = enum[overrides[field_name]]
+            except KeyError:
+                raise ValueError(
+                    f"Unknown {field_name} {overrides[field_name]}."
+                ) from None
+    return dataclasses.replace(PROFILES[name], **overrides)
+
+
+def context_value(
+    node: Node, profile: CapacityProfile, key: str, default: Any = None
+) -> Any:
+    """Get a context value of the deployment of a profile
+
+    The context key `deployments` may hold the values of each profile, by
+    profile name. Values missing there are read from the context key itself.
+
+    :param node: The node to read the context from, eg `app.node`.
+    :type node: Node
+    :param profile: The selected profile.
+    :type profile: CapacityProfile
+    :param key: The context key, eg "ssl_certificate_arn".
+    :type key: str
+    :param default: The value if the context has none. Default is None.
+    :type default: Any
+
+    :return: The value.
+    :rtype: Any
+    """
+    deployment = (node.try_get_context("deployments") or {}).get(profile.name, {})
+    if key in deployment:
+        return deployment[key]
+    value = node.try_get_context(key)
+    return default if value is None else value